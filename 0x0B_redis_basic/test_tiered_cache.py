@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+'''
+Unit tests for the tiered_cache module.
+Redis is mocked with a dictionary, so the tiers can be watched without
+a server: the L1 at your desk, the well down the road.
+'''
+import unittest
+from typing import Any, Dict, Optional
+from unittest.mock import MagicMock, patch
+
+from exercise import Cache
+from tiered_cache import TieredCache
+
+
+class DictCache:
+    '''
+    DictCache is an unbounded L1 with the put / get / delete contract.
+    '''
+
+    def __init__(self) -> None:
+        '''
+        Start empty.
+        '''
+        self.cache_data: Dict[str, Any] = {}
+
+    def put(self, key: str, item: Any) -> None:
+        '''
+        Add an item.
+        '''
+        self.cache_data[key] = item
+
+    def get(self, key: str) -> Optional[Any]:
+        '''
+        Retrieve an item, None if there is none.
+        '''
+        return self.cache_data.get(key)
+
+    def delete(self, key: str) -> bool:
+        '''
+        Remove key, return whether it was cached.
+        '''
+        return self.cache_data.pop(key, None) is not None
+
+    def stats(self) -> Dict[str, int]:
+        '''
+        Return the number of items.
+        '''
+        return {"items": len(self.cache_data)}
+
+
+def mock_redis() -> MagicMock:
+    '''
+    Return a Redis client mock keeping its keys in a dictionary, which
+    it hands back in bytes like Redis.
+    '''
+    client = MagicMock()
+    client.data = {}
+    client.get.side_effect = client.data.get
+    client.set.side_effect = lambda key, data: client.data.__setitem__(
+        key, TieredCache._encode(data))
+    client.delete.side_effect = lambda key: client.data.pop(key, None)
+    return client
+
+
+class TestTieredCache(unittest.TestCase):
+    '''
+    Test cases for the TieredCache class.
+    '''
+
+    def setUp(self) -> None:
+        '''
+        Build a TieredCache over a mocked Redis, without a listener.
+        '''
+        self.redis = mock_redis()
+        with patch('exercise.redis.Redis', return_value=self.redis):
+            self.l2 = Cache()
+        self.l1 = DictCache()
+        self.cache = TieredCache(self.l1, self.l2, listen=False)
+
+    def test_read_through(self) -> None:
+        '''
+        A miss in the L1 reads Redis and keeps the value in the L1, the
+        next read does not go to Redis.
+        '''
+        self.redis.data["A"] = b"42"
+        self.assertEqual(self.cache.get_int("A"), 42)
+        self.assertEqual(self.l1.cache_data, {"A": b"42"})
+        self.assertEqual(self.cache.get_str("A"), "42")
+        self.assertEqual(self.redis.get.call_count, 1)
+        self.assertIsNone(self.cache.get("B"))
+        self.assertNotIn("B", self.l1.cache_data)
+
+    def test_write_through(self) -> None:
+        '''
+        A write goes to Redis and to the L1, and is announced to the
+        other processes.
+        '''
+        self.cache.put("A", 1)
+        self.assertEqual(self.redis.data["A"], b"1")
+        self.assertEqual(self.l1.cache_data["A"], b"1")
+        self.redis.publish.assert_called_once_with(
+            "tiered_cache:invalidate", "{}:A".format(self.cache.origin))
+        key = self.cache.store("Hello")
+        self.assertEqual(self.l1.cache_data[key], b"Hello")
+        self.assertEqual(self.cache.get(key), b"Hello")
+        self.cache.delete("A")
+        self.assertNotIn("A", self.redis.data)
+        self.assertNotIn("A", self.l1.cache_data)
+        self.assertEqual(self.redis.publish.call_count, 2)
+
+    def test_write_around(self) -> None:
+        '''
+        Without write_through, a write drops the L1 copy and the next
+        read loads the new value from Redis.
+        '''
+        cache = TieredCache(self.l1, self.l2, write_through=False,
+                            listen=False)
+        cache.put("A", 1)
+        self.assertEqual(cache.get_int("A"), 1)
+        cache.put("A", 2)
+        self.assertNotIn("A", self.l1.cache_data)
+        key = cache.store(b"x")
+        self.assertNotIn(key, self.l1.cache_data)
+        self.assertEqual(cache.get_int("A"), 2)
+        self.assertEqual(self.redis.get.call_count, 2)
+
+    def test_invalidation_from_another_origin(self) -> None:
+        '''
+        The listener drops the keys written by other processes, and
+        ignores its own announcements.
+        '''
+        self.cache.put("A", 1)
+        self.cache._on_invalidate({"data": "{}:A".format(
+            self.cache.origin).encode()})
+        self.assertIn("A", self.l1.cache_data)
+        self.cache._on_invalidate({"data": b"other:A"})
+        self.assertNotIn("A", self.l1.cache_data)
+        self.assertEqual(self.cache.stats()["invalidations"], 1)
+
+    def test_stale_reads_do_not_fill(self) -> None:
+        '''
+        A value read from Redis before a write or an invalidation of its
+        key landed is returned, but not kept in the L1.
+        '''
+        self.redis.data["A"] = b"old"
+        self.redis.data["B"] = b"old"
+        read = self.redis.get.side_effect
+
+        def racing_get(key: str) -> Optional[bytes]:
+            '''
+            Read key, then let another writer change it.
+            '''
+            value = read(key)
+            if key == "A":
+                self.cache._on_invalidate({"data": b"other:A"})
+            else:
+                self.redis.data[key] = b"new"
+                self.cache.delete(key)
+            return value
+
+        self.redis.get.side_effect = racing_get
+        self.assertEqual(self.cache.get("A"), b"old")
+        self.assertEqual(self.cache.get("B"), b"old")
+        self.assertEqual(self.l1.cache_data, {})
+        self.assertEqual(self.cache._fills, {})
+        self.redis.get.side_effect = read
+        self.redis.data["A"] = b"new"
+        self.assertEqual(self.cache.get("A"), b"new")
+        self.assertEqual(self.l1.cache_data, {"A": b"new"})
+
+    def test_listener(self) -> None:
+        '''
+        With listen, the cache subscribes to its channel in a thread,
+        and close stops it.
+        '''
+        cache = TieredCache(self.l1, self.l2, channel="inval")
+        pubsub = self.redis.pubsub.return_value
+        pubsub.subscribe.assert_called_once_with(
+            inval=cache._on_invalidate)
+        thread = pubsub.run_in_thread.return_value
+        cache.close()
+        thread.stop.assert_called_once_with()
+        cache.close()
+        thread.stop.assert_called_once_with()
+
+    def test_stats(self) -> None:
+        '''
+        Reads are counted by the tier that served them.
+        '''
+        self.assertEqual(self.cache.stats()["l1_hit_ratio"], 0.0)
+        self.redis.data["A"] = b"1"
+        self.cache.get("A")
+        self.cache.get("A")
+        self.cache.get("A")
+        self.cache.get("B")
+        self.assertEqual(self.cache.stats(), {
+            "l1_hits": 2,
+            "l2_hits": 1,
+            "misses": 1,
+            "l1_hit_ratio": 0.5,
+            "invalidations": 0,
+            "l1": {"items": 1},
+        })
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+'''
+This module provides a TieredCache class putting a small in-process
+cache (L1) in front of the Redis-backed Cache (L2).
+Hot keys are served from the L1 without a network round trip, misses
+fall through to Redis, and every write is announced on a Redis pub/sub
+channel so the L1 of every other process drops its stale copy.
+Like keeping a water bottle on your desk instead of walking to the
+well every time, while someone shouts when the well gets poisoned.
+'''
+import threading
+import uuid
+from typing import Any, Callable, Dict, Optional, Union
+
+from exercise import Cache
+
+
+class TieredCache:
+    '''
+    TieredCache reads from the L1 first, then from Redis.
+    The L1 is any cache with put, get and delete, such as the caches of
+    the caching project built on an eviction policy, bounded in items
+    or bytes. It holds values as Redis returns them, in bytes.
+    '''
+
+    def __init__(self, l1: Any, l2: Optional[Cache] = None,
+                 write_through: bool = True,
+                 channel: str = "tiered_cache:invalidate",
+                 listen: bool = True) -> None:
+        '''
+        Wrap the l1 cache and the Redis Cache l2 (a new Cache by default,
+        which flushes the database like any new Cache).
+        With write_through, writes fill the L1 too; otherwise they only
+        drop its copy and the next read loads it from Redis.
+        With listen, a thread applies the invalidations published by the
+        other processes on channel.
+        '''
+        self.l1 = l1
+        self.l2 = l2 if l2 is not None else Cache()
+        self._redis = self.l2._redis
+        self.write_through = write_through
+        self.channel = channel
+        self.origin = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        # A token for every key read from Redis to fill the L1; a write
+        # or invalidation of the key meanwhile withdraws it
+        self._fills: Dict[str, object] = {}
+        self.l1_hits = 0
+        self.l2_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._listener = None
+        if listen:
+            pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(**{channel: self._on_invalidate})
+            self._listener = pubsub.run_in_thread(sleep_time=0.1,
+                                                  daemon=True)
+
+    @staticmethod
+    def _encode(data: Union[str, bytes, int, float]) -> bytes:
+        '''
+        Return data the way Redis gives it back, in bytes.
+        '''
+        if isinstance(data, bytes):
+            return data
+        return str(data).encode("utf-8")
+
+    def _publish(self, key: str) -> None:
+        '''
+        Tell the other processes that key changed.
+        '''
+        self._redis.publish(self.channel, "{}:{}".format(self.origin, key))
+
+    def _on_invalidate(self, message: Dict) -> None:
+        '''
+        Drop from the L1 the key another process changed.
+        '''
+        origin, _, key = message["data"].decode("utf-8").partition(":")
+        if origin == self.origin:
+            return
+        with self._lock:
+            self._fills.pop(key, None)
+            self.l1.delete(key)
+        self.invalidations += 1
+
+    def get(self, key: str, fn: Optional[Callable] = None) -> Any:
+        '''
+        Retrieve data from the L1, or from Redis on a miss (read-through:
+        the value is then kept in the L1, unless the key was written or
+        invalidated while it was read), possibly transforming it.
+        '''
+        with self._lock:
+            value = self.l1.get(key)
+            if value is None:
+                token = self._fills[key] = object()
+        if value is not None:
+            self.l1_hits += 1
+        else:
+            value = None
+            try:
+                value = self.l2.get(key)
+            finally:
+                with self._lock:
+                    if self._fills.get(key) is token:
+                        del self._fills[key]
+                        if value is not None:
+                            self.l1.put(key, value)
+            if value is None:
+                self.misses += 1
+                return None
+            self.l2_hits += 1
+        return fn(value) if fn else value
+
+    def get_str(self, key: str) -> Optional[str]:
+        '''
+        Retrieve a string.
+        '''
+        return self.get(key, lambda d: d.decode("utf-8"))
+
+    def get_int(self, key: str) -> Optional[int]:
+        '''
+        Retrieve an integer.
+        '''
+        return self.get(key, int)
+
+    def put(self, key: str, data: Union[str, bytes, int, float]) -> None:
+        '''
+        Write data to Redis under key, then to the L1 (write-through) or
+        out of it, and invalidate the L1 of the other processes.
+        '''
+        self._redis.set(key, data)
+        with self._lock:
+            self._fills.pop(key, None)
+            if self.write_through:
+                self.l1.put(key, self._encode(data))
+            else:
+                self.l1.delete(key)
+        self._publish(key)
+
+    def store(self, data: Union[str, bytes, int, float]) -> str:
+        '''
+        Store data in Redis under a new key, through Cache.store so its
+        calls are still counted and recorded, and return the key.
+        '''
+        key = self.l2.store(data)
+        if self.write_through:
+            with self._lock:
+                self.l1.put(key, self._encode(data))
+        return key
+
+    def delete(self, key: str) -> None:
+        '''
+        Remove key from Redis and from every L1.
+        '''
+        self._redis.delete(key)
+        with self._lock:
+            self._fills.pop(key, None)
+            self.l1.delete(key)
+        self._publish(key)
+
+    def stats(self) -> Dict[str, Any]:
+        '''
+        Return the hits of each tier, the misses of both, the
+        invalidations received and the stats of the L1 if it has some.
+        '''
+        reads = self.l1_hits + self.l2_hits + self.misses
+        stats = {
+            "l1_hits": self.l1_hits,
+            "l2_hits": self.l2_hits,
+            "misses": self.misses,
+            "l1_hit_ratio": self.l1_hits / reads if reads else 0.0,
+            "invalidations": self.invalidations,
+        }
+        if hasattr(self.l1, "stats"):
+            stats["l1"] = self.l1.stats()
+        return stats
+
+    def close(self) -> None:
+        '''
+        Stop listening for invalidations.
+        '''
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
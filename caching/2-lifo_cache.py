@@ -3,40 +3,23 @@
 This module contains the LIFOCache class, a caching system
 that inherits from the BaseCaching parent class. It uses the
 LIFO (Last In, First Out) caching algorithm.
+The put order is kept by LIFOPolicy, a hash map of keys to nodes
+plus a doubly linked list, so get, put and evict run in constant time
+and every key is tracked once, however often it is updated.
 '''
 BaseCaching = __import__('base_caching').BaseCaching
+LIFOPolicy = __import__('policies').LIFOPolicy
 
 
 class LIFOCache(BaseCaching):
     ''' LIFOCache defines a caching system with a LIFO eviction policy.
+    If the number of items in the cache exceeds MAX_ITEMS,
+    the last item put (added or updated) is discarded.
     '''
 
-    def __init__(self):
+    def __init__(self, **kwargs):
         '''
-        Calls the parent class' init method and initializes
-        a list to keep track of the order of insertion.
+        Calls the parent class' init method with a LIFO policy.
+        kwargs (max_items, max_bytes, ...) are passed to BaseCaching.
         '''
-        super().__init__()
-        self.stack = []
-
-    def put(self, key, item):
-        ''' Add an item to the cache.
-        If key or item is None this method does nothing.
-        If the number of items in the cache exceeds MAX_ITEMS,
-        the last item added is discarded following LIFO.
-        '''
-        if key is not None and item is not None:
-            self.cache_data[key] = item
-            self.stack.append(key)
-
-            if len(self.cache_data) > BaseCaching.MAX_ITEMS:
-                # Remove the most recently added item
-                last_key = self.stack.pop(-2)
-                del self.cache_data[last_key]
-                print(f"DISCARD: {last_key}")
-
-    def get(self, key):
-        ''' Retrieve an item by key from the cache.
-        If key is None or doesn't exist in the cache, it returns None.
-        '''
-        return self.cache_data.get(key, None)
+        super().__init__(LIFOPolicy(), **kwargs)
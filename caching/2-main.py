@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 """ 2-main """
 LIFOCache = __import__('2-lifo_cache').LIFOCache
+print_discard = __import__('base_caching').print_discard
 
 my_cache = LIFOCache()
+my_cache.add_listener(print_discard)
 my_cache.put("A", "Hello")
 my_cache.put("B", "World")
 my_cache.put("C", "Holberton")
@@ -1,8 +1,10 @@
 #!/usr/bin/python3
 """ 4-main """
 MRUCache = __import__('4-mru_cache').MRUCache
+print_discard = __import__('base_caching').print_discard
 
 my_cache = MRUCache()
+my_cache.add_listener(print_discard)
 my_cache.put("A", "Hello")
 my_cache.put("B", "World")
 my_cache.put("C", "Holberton")
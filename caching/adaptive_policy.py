@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+'''
+This module contains the AdaptivePolicy class, an eviction policy that
+picks, while the cache runs, which of several policies fits the
+workload best.
+
+Next to the live policy, the one BaseCaching talks to, every candidate
+policy drives a ghost: a cache of the same capacity that holds keys and
+no item, fed with the same requests (a miss stores the key, like the
+put following a miss in the real cache). The ghosts count their hits
+over a window of requests; when one of them beats the ghost of the live
+policy by a margin, the live policy is replaced by a new instance of
+the winner, seeded with the cached keys. The items never move: only
+the bookkeeping of the policy is rebuilt.
+
+To keep the ghosts light, sample=N makes them see one key out of N
+(picked by hash, so a key is always in or always out) with a capacity
+divided by N, which estimates the hit ratio of the full sized ghost.
+'''
+policies = __import__('policies')
+frequency_sketch = __import__('frequency_sketch')
+
+CANDIDATES = (policies.LRUPolicy, policies.FIFOPolicy, policies.MRUPolicy,
+              policies.LFUPolicy)
+
+
+class Ghost():
+    ''' Ghost simulates a cache driven by policy, holding keys only.
+    '''
+
+    def __init__(self, policy):
+        ''' Start an empty ghost, counting no hit.
+        '''
+        self.policy = policy
+        self.hits = 0
+
+    def request(self, key):
+        ''' Count a request of key, a hit if the ghost holds it; on a
+        miss the key is stored, as a read-through cache would.
+        '''
+        policy = self.policy
+        if key in policy:
+            policy.access(key)
+            self.hits += 1
+            return
+        while len(policy) >= policy.capacity:
+            policy.evict(key)
+        policy.insert(key)
+
+    def store(self, key):
+        ''' Store key unless the ghost holds it: the put following a
+        miss is not another request.
+        '''
+        if key not in self.policy:
+            self.request(key)
+
+    def remove(self, key):
+        ''' Forget key if the ghost holds it.
+        '''
+        if key in self.policy:
+            self.policy.remove(key)
+
+
+class AdaptivePolicy(policies.EvictionPolicy):
+    ''' AdaptivePolicy delegates to the live policy, one of candidates
+    (policy classes, the first one live at first), and switches to
+    another candidate when its ghost hits more than margin times more
+    often than the ghost of the live one over window requests.
+    '''
+
+    def __init__(self, capacity=None, candidates=CANDIDATES, window=10000,
+                 margin=0.05, sample=1):
+        ''' Initialize the live policy and a ghost per candidate.
+        '''
+        self.candidates = tuple(candidates)
+        self.live = self.candidates[0]()
+        self.current = 0
+        self.ghosts = [Ghost(candidate()) for candidate in self.candidates]
+        self.window = window
+        self.margin = margin
+        self.sample = sample
+        self.requests = 0
+        self.sampled = 0
+        self.switches = 0
+        self.ratios = {}
+        super().__init__(capacity)
+
+    @property
+    def capacity(self):
+        ''' Return the capacity of the cache.
+        '''
+        return self.live.capacity
+
+    @capacity.setter
+    def capacity(self, capacity):
+        ''' Size the live policy and the ghosts for capacity items.
+        '''
+        self.live.capacity = capacity
+        for ghost in self.ghosts:
+            ghost.policy.capacity = (None if capacity is None else
+                                     max(1, capacity // self.sample))
+
+    @property
+    def nodes(self):
+        ''' Return the key -> node map of the live policy.
+        '''
+        return self.live.nodes
+
+    @nodes.setter
+    def nodes(self, nodes):
+        ''' Ignore the map EvictionPolicy starts with.
+        '''
+
+    @property
+    def name(self):
+        ''' Return the name of the live policy class.
+        '''
+        return self.candidates[self.current].__name__
+
+    def __iter__(self):
+        ''' Iterate over the keys in the order of the live policy.
+        '''
+        return iter(self.live)
+
+    def _sampled(self, key):
+        ''' Tell whether the ghosts see key.
+        '''
+        if self.sample == 1:
+            return True
+        mixed = ((hash(key) & frequency_sketch.MASK64) *
+                 frequency_sketch.GOLDEN) & frequency_sketch.MASK64
+        return (mixed >> 32) % self.sample == 0
+
+    def _request(self, key):
+        ''' Replay a request of key on the ghosts, then compare them at
+        the end of the window.
+        '''
+        if self._sampled(key):
+            for ghost in self.ghosts:
+                ghost.request(key)
+            self.sampled += 1
+        self.requests += 1
+        if self.requests >= self.window:
+            self._compare()
+
+    def _store(self, key):
+        ''' Replay the storage of key on the ghosts.
+        '''
+        if self._sampled(key):
+            for ghost in self.ghosts:
+                ghost.store(key)
+
+    def _compare(self):
+        ''' Switch to the candidate whose ghost clearly hit the most
+        over the window, and start a new window.
+        '''
+        self.ratios = {candidate.__name__: ghost.hits / max(1, self.sampled)
+                       for candidate, ghost in zip(self.candidates,
+                                                   self.ghosts)}
+        hits = [ghost.hits for ghost in self.ghosts]
+        best = hits.index(max(hits))
+        if hits[best] > hits[self.current] * (1 + self.margin):
+            self.switch(best)
+        for ghost in self.ghosts:
+            ghost.hits = 0
+        self.requests = 0
+        self.sampled = 0
+
+    def switch(self, index):
+        ''' Make the candidate index the live policy.
+        The keys its ghost holds keep their order and state (such as
+        their frequency); the other keys, which it discarded or did not
+        sample, come first, as the next victims, in the order of the
+        previous live policy.
+        '''
+        live = self.candidates[index](self.live.capacity)
+        state, entries = self.ghosts[index].policy.dump()
+        entries = [entry for entry in entries if entry[0] in self.live]
+        held = {key for key, _ in entries}
+        live.insert_many([key for key in self.live if key not in held])
+        live.restore(state, entries)
+        self.live = live
+        self.current = index
+        self.switches += 1
+
+    def insert(self, key):
+        ''' Track key in the live policy and store it in the ghosts.
+        '''
+        self.live.insert(key)
+        self._store(key)
+
+    def access(self, key):
+        ''' Record a hit on key.
+        '''
+        self.live.access(key)
+        self._request(key)
+
+    def update(self, key):
+        ''' Record that the item of key was replaced.
+        '''
+        self.live.update(key)
+
+    def miss(self, key):
+        ''' Record a lookup of a key that is not cached.
+        '''
+        self.live.miss(key)
+        self._request(key)
+
+    def victim(self, key=None):
+        ''' Return the victim of the live policy.
+        '''
+        return self.live.victim(key)
+
+    def evict(self, key=None):
+        ''' Discard the victim of the live policy.
+        '''
+        return self.live.evict(key)
+
+    def remove(self, key):
+        ''' Stop tracking key, in the live policy and the ghosts.
+        '''
+        self.live.remove(key)
+        for ghost in self.ghosts:
+            ghost.remove(key)
+
+    def clear(self):
+        ''' Stop tracking every key and start a new window.
+        '''
+        self.live.clear()
+        for ghost in self.ghosts:
+            ghost.policy.clear()
+            ghost.hits = 0
+        self.requests = 0
+        self.sampled = 0
+
+    def dump(self):
+        ''' Return the state of the live policy and which it is.
+        '''
+        state, entries = self.live.dump()
+        return {"current": self.current, "live": state}, entries
+
+    def restore(self, state, entries):
+        ''' Make the saved candidate live again with its keys.
+        '''
+        self.live = self.candidates[state["current"]](self.live.capacity)
+        self.current = state["current"]
+        self.live.restore(state["live"], entries)
+
+    def stats(self):
+        ''' Return the live policy, the number of switches and the hit
+        ratio of every ghost over the last window.
+        '''
+        return {
+            "policy": self.name,
+            "switches": self.switches,
+            "ghost_hit_ratios": dict(self.ratios),
+        }
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+This module contains the admission filters BaseCaching can put in
+front of any eviction policy.
+
+Without one, every new key is admitted and costs the cache the victim
+of its policy, even a key that will never be asked for again. An
+admission filter remembers how often keys are requested, hits and
+misses alike, and lets a new key in only if it is more popular than
+the victim it would replace.
+'''
+frequency_sketch = __import__('frequency_sketch')
+
+
+class TinyLFUAdmission():
+    ''' TinyLFUAdmission estimates the popularity of keys with a
+    CountMinSketch behind a Doorkeeper (TinyLFU).
+    The first request of a key only sets its bits in the doorkeeper,
+    so the keys seen once never take room in the sketch. After a sample
+    of 10 requests per counter, the counters are halved and the
+    doorkeeper cleared (aging), so the popularity of the past fades.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the filter for a cache of capacity items.
+        BaseCaching fills capacity in when it is None.
+        '''
+        self.capacity = capacity
+        self.sketch = None
+        self.doorkeeper = None
+        self.requests = 0
+
+    def _size(self):
+        ''' Build the sketch and the doorkeeper for the capacity, or
+        grow them with it (byte bounded caches).
+        '''
+        # Aged here, on every request, not on the increments only
+        self.sketch = frequency_sketch.CountMinSketch(self.capacity,
+                                                      aging=False)
+        # As large as the sketch, 4 bytes per column
+        self.doorkeeper = frequency_sketch.Doorkeeper(32 * self.sketch.width)
+        self.requests = 0
+
+    def record(self, key):
+        ''' Count one request of key.
+        '''
+        if self.sketch is None or self.sketch.capacity < self.capacity:
+            self._size()
+        if self.doorkeeper.add(key):
+            self.sketch.increment(key)
+        self.requests += 1
+        if self.requests >= self.sketch.sample_size:
+            self.sketch.reset()
+            self.doorkeeper.clear()
+            self.requests //= 2
+
+    def frequency(self, key):
+        ''' Return the estimated number of requests of key.
+        '''
+        if self.sketch is None:
+            return 0
+        return self.sketch.frequency(key) + (key in self.doorkeeper)
+
+    def admit(self, key, victim):
+        ''' Tell whether key should replace victim in the cache.
+        '''
+        return self.frequency(key) > self.frequency(victim)
+
+    def clear(self):
+        ''' Forget every request.
+        '''
+        if self.sketch is not None:
+            self.sketch.clear()
+            self.doorkeeper.clear()
+        self.requests = 0
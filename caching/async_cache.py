@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+'''
+This module contains the AsyncCache class, which puts any of the caches
+behind an API for coroutines.
+
+Hits never wait: the cache is read in place. A miss loads the key in a
+task of its own, one per key, which every coroutine missing on that key
+awaits (see AsyncSingleFlight in single_flight.py); cancelling one of
+them leaves the load running for the others, and a key written or
+deleted while its load is in flight is not overwritten by the stale
+item.
+'''
+import asyncio
+import inspect
+BaseCaching = __import__('base_caching').BaseCaching
+NOT_FOUND = __import__('base_caching').NOT_FOUND
+LRUPolicy = __import__('policies').LRUPolicy
+AsyncSingleFlight = __import__('single_flight').AsyncSingleFlight
+
+
+class AsyncCache():
+    ''' AsyncCache defines a caching system for coroutines on top of a
+    cache of the other modules (an LRU BaseCaching by default).
+    It is bound to one event loop: it is not thread-safe, except for
+    what the wrapped cache makes thread-safe.
+    '''
+
+    def __init__(self, cache=None, ttl=None):
+        ''' Initialize the wrapper of cache, or of a new LRU BaseCaching
+        holding BaseCaching.MAX_ITEMS items. ttl is the default time to
+        live of the items loaded, the one of cache if None.
+        '''
+        self.cache = BaseCaching(LRUPolicy()) if cache is None else cache
+        self.ttl = ttl
+        self.flights = AsyncSingleFlight()
+        self.loads = 0
+        self.coalesced = 0
+        self.stale = 0
+
+    def get(self, key):
+        ''' Retrieve an item by key, None if it is not cached.
+        '''
+        return self.cache.get(key)
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item; a load of key in flight will not overwrite it.
+        '''
+        self.flights.forget(key)
+        self.cache.put(key, item, ttl, size, cost)
+
+    def delete(self, key):
+        ''' Remove key; a load of key in flight will not cache it.
+        Returns True if key was cached.
+        '''
+        self.flights.forget(key)
+        return self.cache.delete(key)
+
+    def clear(self):
+        ''' Remove every item; the loads in flight will not cache theirs.
+        '''
+        self.flights.clear()
+        self.cache.clear()
+
+    async def get_or_load(self, key, loader, ttl=None):
+        ''' Retrieve an item by key, loading it with loader(key) on a
+        miss and caching it for ttl seconds. A None item is not cached,
+        unless the cache has a negative_ttl: like BaseCaching.get_or_load
+        it is cached and returned as NOT_FOUND, for ttl seconds if given
+        or else the negative_ttl.
+        loader is a coroutine function (or an object with an async
+        __call__), or a function, which runs in the default executor of
+        the loop so it does not block it; when that function returns an
+        awaitable (a lambda or partial wrapping a coroutine function),
+        it is awaited.
+        Concurrent misses on the same key await a single load and get
+        its item, or its exception.
+        '''
+        item = self.cache.get(key)
+        if item is not None or key is None:
+            return item
+        if key in self.flights.calls:
+            self.coalesced += 1
+        return await self.flights.do(
+            key, lambda: self._load(key, loader, ttl))
+
+    async def _load(self, key, loader, ttl):
+        ''' Run the loader in the flight of key and cache its item, if
+        the flight was not forgotten meanwhile.
+        '''
+        self.loads += 1
+        if (inspect.iscoroutinefunction(loader) or
+                inspect.iscoroutinefunction(
+                    getattr(loader, "__call__", None))):
+            item = await loader(key)
+        else:
+            item = await asyncio.get_running_loop().run_in_executor(
+                None, loader, key)
+            if inspect.isawaitable(item):
+                item = await item
+        if item is None and getattr(self.cache, "negative_ttl",
+                                    None) is not None:
+            item = NOT_FOUND
+        if not self.flights.current(key):
+            self.stale += 1
+        elif item is NOT_FOUND:
+            self.cache.put(key, item, ttl)
+        elif item is not None:
+            self.cache.put(key, item, self.ttl if ttl is None else ttl)
+        return item
+
+    async def close(self):
+        ''' Cancel the loads in flight and wait for them to stop; their
+        waiters get CancelledError.
+        '''
+        await self.flights.close()
+
+    def stats(self):
+        ''' Return the counters of the cache, with the loads run, the
+        misses that awaited a load already in flight (coalesced), the
+        loads whose item was not cached because their key was written
+        or deleted meanwhile (stale) and the loads in flight.
+        '''
+        stats = self.cache.stats()
+        stats["loads"] = stats.get("loads", 0) + self.loads
+        stats["coalesced"] = self.coalesced
+        stats["stale"] = self.stale
+        stats["in_flight"] = len(self.flights)
+        return stats
+
+    def __len__(self):
+        ''' Return the number of cached items.
+        '''
+        return len(self.cache.cache_data)
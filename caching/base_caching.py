@@ -1,32 +1,799 @@
 #!/usr/bin/python3
 """ BaseCaching module
 """
+import sys
+import time
+TimingWheel = __import__('timing_wheel').TimingWheel
+LatencyHistogram = __import__('latency_histogram').LatencyHistogram
+single_flight = __import__('single_flight')
+snapshot = __import__('snapshot')
+Compressed = __import__('compression').Compressed
+PENDING = snapshot.PENDING
+
+
+class NotFound():
+    """ The type of NOT_FOUND, a falsy singleton that pickles as itself
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return "NOT_FOUND"
+
+    def __bool__(self):
+        return False
+
+    def __reduce__(self):
+        return "NOT_FOUND"
+
+
+# The item of a negative entry: the key is known to have no item
+NOT_FOUND = NotFound()
+
+
+def print_discard(key, item, reason):
+    """ Eviction listener printing the evicted keys
+    """
+    if reason == "evicted":
+        print("DISCARD: {}".format(key))
+
 
 class BaseCaching():
     """ BaseCaching defines:
       - constants of your caching system
       - where your data are stored (in a dictionary)
+      - the eviction policy choosing what to discard (see policies.py)
+      - the admission filter deciding what gets in, if any
+        (see admission.py)
+      - the compressor of the large items, if any (see compression.py)
+      - the capacity of each instance, in items and/or in bytes
+      - the time to live of the items, if they expire
+      - the time to live and the share of the negative entries
+      - the listeners told about the items leaving the cache
+      - the counters reported by stats()
+      - the snapshot it was loaded from, if any
     """
     MAX_ITEMS = 4
 
-    def __init__(self):
+    def __init__(self, policy=None, max_items=None, max_bytes=None,
+                 sizeof=None, ttl=None, resolution=1.0, clock=None,
+                 sample=0, admission=None, compressor=None,
+                 negative_ttl=None, max_negative=None):
         """ Initiliaze
+        max_items overrides MAX_ITEMS for this instance. With max_bytes
+        (and no max_items) the cache is bounded by the total size of its
+        items instead, as measured by sizeof (sys.getsizeof by default).
+        ttl is the default time to live of an item, in seconds; expired
+        items are reaped by a timing wheel of resolution seconds.
+        With sample, one get and one put out of every sample are timed
+        and their latencies reported by stats().
+        With admission, a new key only gets into a full cache if the
+        filter prefers it to the victim of the policy.
+        With compressor, the items it compresses are stored compressed
+        (and measured so by sizeof) and decompressed by get.
+        A negative entry is a key put with the NOT_FOUND item, which get
+        returns. It expires after negative_ttl seconds (ttl by default),
+        and with max_negative, at most max_negative of them are cached:
+        a new one evicts the oldest. With negative_ttl, get_or_load
+        caches a None loaded as NOT_FOUND.
         """
         self.cache_data = {}
+        self.policy = policy
+        self.admission = admission
+        self.compressor = compressor
+        if max_items is not None:
+            self.MAX_ITEMS = max_items
+        elif max_bytes is not None:
+            self.MAX_ITEMS = None
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or sys.getsizeof
+        self.sizes = {}
+        self.current_bytes = 0
+        self.ttl = ttl
+        self.resolution = resolution
+        self.clock = clock or time.monotonic
+        self.expires = {}
+        self.negative_ttl = negative_ttl
+        self.max_negative = max_negative
+        # The negative keys, oldest first
+        self.negatives = {}
+        self.wheel = None
+        self.listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.deletes = 0
+        self.negative_hits = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.compressed = 0
+        self.saved_bytes = 0
+        self.flights = single_flight.SingleFlight()
+        self.async_flights = single_flight.AsyncSingleFlight()
+        self.snapshot = None
+        self.pending = {}
+        self.latency = {}
+        if sample:
+            for name in ("get", "put"):
+                self.latency[name] = LatencyHistogram(sample)
+                setattr(self, name, self.latency[name].timed(
+                    getattr(self, name)))
+        if policy is not None and policy.capacity is None:
+            policy.capacity = self.MAX_ITEMS or BaseCaching.MAX_ITEMS
+        if admission is not None and admission.capacity is None:
+            admission.capacity = self.MAX_ITEMS or BaseCaching.MAX_ITEMS
 
     def print_cache(self):
         """ Print the cache
         """
+        self.thaw()
         print("Current cache:")
         for key in sorted(self.cache_data.keys()):
-            print("{}: {}".format(key, self.cache_data.get(key)))
+            item = self.cache_data.get(key)
+            if type(item) is Compressed:
+                item = self.compressor.unpack(item)
+            print("{}: {}".format(key, item))
 
-    def put(self, key, item):
+    def put(self, key, item, ttl=None, size=None, cost=None):
         """ Add an item in the cache
+        If the cache is full, the keys chosen by the policy are discarded
+        until the item fits. An item larger than max_bytes is not cached,
+        and the key loses the item it had, if any.
+        The item expires after ttl seconds (the cache's ttl by default,
+        its negative_ttl for NOT_FOUND).
+        A new key the admission filter rejects is not cached.
+        size is the size of the item (measured by sizeof by default)
+        and cost what computing it again costs; a weighted policy is
+        told both.
         """
-        raise NotImplementedError("put must be implemented in your cache class")
+        if self.policy is None:
+            raise NotImplementedError(
+                "put must be implemented in your cache class")
+        if key is None or item is None:
+            return
+        negative = item is NOT_FOUND
+        if negative and self.max_negative is not None and \
+                self.max_negative <= 0:
+            # Not cached, but the key is known to be missing now
+            self.delete(key)
+            return
+        if self.wheel is not None:
+            self.reap()
+        if self.admission is not None:
+            self.admission.record(key)
+        if self.compressor is not None and not negative:
+            item = self._pack(item)
+        weighted = self.policy.weighted
+        if size is None:
+            size = (self.sizeof(item)
+                    if self.max_bytes is not None or weighted else 0)
+        if self.max_bytes is not None and size > self.max_bytes:
+            # The old item must not outlive the one that replaced it
+            self.delete(key)
+            return
+        if key in self.cache_data:
+            if negative:
+                self._negative_room(key)
+            if self.pending:
+                self._forget(key)
+            if self.compressor is not None:
+                self._uncount(self.cache_data[key])
+                self._count(item)
+            self.cache_data[key] = item
+            if negative or self.negatives:
+                self._mark(key, negative)
+            if weighted:
+                self.policy.weigh(key, size, cost)
+            self.policy.update(key)
+            self.updates += 1
+            if self.max_bytes is not None:
+                self.current_bytes += size - self.sizes[key]
+                self.sizes[key] = size
+                self._make_room(key)
+                if key not in self.cache_data:
+                    # The grown item was the policy's own victim
+                    return
+        else:
+            if not self._admit(key, size):
+                return
+            if negative:
+                self._negative_room(key)
+            self._make_room(key, size, 1)
+            self.cache_data[key] = item
+            if negative:
+                self.negatives[key] = None
+            if self.compressor is not None:
+                self._count(item)
+            if self.max_bytes is not None:
+                self.sizes[key] = size
+                self.current_bytes += size
+            if weighted:
+                self.policy.weigh(key, size, cost)
+            self.policy.insert(key)
+            self.inserts += 1
+        if ttl is None:
+            ttl = self.ttl
+            if negative and self.negative_ttl is not None:
+                ttl = self.negative_ttl
+        if ttl is not None:
+            self._expire_at(key, self.clock() + ttl)
+        elif self.expires:
+            self.expires.pop(key, None)
 
     def get(self, key):
         """ Get an item by key
+        An expired item is removed and reported missing. A negative
+        entry is a hit, returning NOT_FOUND.
+        """
+        if self.policy is None:
+            raise NotImplementedError(
+                "get must be implemented in your cache class")
+        if self.admission is not None and key is not None:
+            self.admission.record(key)
+        item = self.cache_data.get(key)
+        if item is not None and self.expires:
+            deadline = self.expires.get(key)
+            if deadline is not None and deadline <= self.clock():
+                self.expire(key)
+                item = None
+        if item is None:
+            if key is not None:
+                self.misses += 1
+                self.policy.miss(key)
+            return None
+        if item is PENDING:
+            item = self._thaw(key)
+        self.hits += 1
+        self.policy.access(key)
+        if type(item) is Compressed:
+            item = self._unpack(key, item)
+        elif item is NOT_FOUND:
+            self.negative_hits += 1
+        return item
+
+    def get_many(self, keys):
+        """ Get the items of keys, as a dictionary of the keys found
+        Each key is looked up once, however often it is repeated.
+        """
+        found = {}
+        if self.policy is None:
+            for key in keys:
+                item = self.get(key)
+                if item is not None:
+                    found[key] = item
+            return found
+        missed = {}
+        lookup = self.cache_data.get
+        for key in keys:
+            item = lookup(key)
+            if item is None:
+                missed[key] = None
+            else:
+                found[key] = item
+        if self.expires:
+            now = self.clock()
+            for key in list(found):
+                deadline = self.expires.get(key)
+                if deadline is not None and deadline <= now:
+                    self.expire(key)
+                    del found[key]
+                    missed[key] = None
+        missed.pop(None, None)
+        if self.admission is not None:
+            for key in found:
+                self.admission.record(key)
+            for key in missed:
+                self.admission.record(key)
+        if self.pending:
+            for key, item in found.items():
+                if item is PENDING:
+                    found[key] = self._thaw(key)
+        self.policy.access_many(found)
+        for key in missed:
+            self.policy.miss(key)
+        self.hits += len(found)
+        self.misses += len(missed)
+        if self.negatives:
+            self.negative_hits += sum(
+                item is NOT_FOUND for item in found.values())
+        if self.compressor is not None:
+            promoted = []
+            for key, item in found.items():
+                if type(item) is Compressed:
+                    found[key] = self._unpack(key, item, promoted)
+            # Promoting may evict other keys of the batch: it waits
+            # until every item is unpacked
+            for key, item, value in promoted:
+                if self.cache_data.get(key) is item:
+                    self._promote(key, item, value)
+        return found
+
+    def put_many(self, items, ttl=None):
+        """ Add the items of a dictionary (or of (key, item) pairs)
+        The cached keys are updated first. Room for the new keys is then
+        made once and they are inserted in order: a batch holding more
+        new keys than the cache keeps its last ones.
+        Behind an admission filter, with a compressor, for a weighted
+        policy or one that is not batchable (MRU, LIFO: their victims
+        are the keys just put), or with NOT_FOUND items, the items are
+        put one by one.
+        """
+        items = dict(items)
+        if (self.policy is None or self.admission is not None or
+                self.compressor is not None or self.policy.weighted or
+                not self.policy.batchable or
+                any(item is NOT_FOUND for item in items.values())):
+            for key, item in items.items():
+                if ttl is None:
+                    self.put(key, item)
+                else:
+                    self.put(key, item, ttl)
+            return
+        if self.wheel is not None:
+            self.reap()
+        cache_data = self.cache_data
+        policy = self.policy
+        batch = {key: item for key, item in items.items()
+                 if key is not None and item is not None}
+        sizes = {}
+        if self.max_bytes is not None:
+            sizes = {key: self.sizeof(item) for key, item in batch.items()}
+            for key in [key for key in batch
+                        if sizes[key] > self.max_bytes]:
+                del batch[key]
+                self.delete(key)
+        fresh = []
+        for key, item in batch.items():
+            if key in cache_data:
+                if self.pending:
+                    self._forget(key)
+                if self.negatives:
+                    self.negatives.pop(key, None)
+                cache_data[key] = item
+                policy.update(key)
+                self.updates += 1
+                if self.max_bytes is not None:
+                    self.current_bytes += sizes[key] - self.sizes[key]
+                    self.sizes[key] = sizes[key]
+            else:
+                fresh.append(key)
+        if self.MAX_ITEMS is not None and len(fresh) > self.MAX_ITEMS:
+            fresh = fresh[len(fresh) - self.MAX_ITEMS:]
+        size = 0
+        if self.max_bytes is not None:
+            size = sum(sizes[key] for key in fresh)
+            while size > self.max_bytes:
+                size -= sizes[fresh.pop(0)]
+        if fresh and self.max_bytes is None:
+            evict = policy.evict
+            for _ in range(len(cache_data) + len(fresh) - self.MAX_ITEMS):
+                self.discard(evict(fresh[0]))
+        elif batch:
+            self._make_room(fresh[0] if fresh else next(iter(batch)),
+                            size, len(fresh))
+        for key in fresh:
+            cache_data[key] = batch[key]
+            if self.max_bytes is not None:
+                self.sizes[key] = sizes[key]
+        policy.insert_many(fresh)
+        self.current_bytes += size
+        self.inserts += len(fresh)
+        if ttl is None:
+            ttl = self.ttl
+        if ttl is not None:
+            deadline = self.clock() + ttl
+            for key in batch:
+                if key in cache_data:
+                    self._expire_at(key, deadline)
+        elif self.expires:
+            for key in batch:
+                self.expires.pop(key, None)
+
+    def delete(self, key):
+        """ Remove key from the cache, return whether it was cached
+        """
+        if self.policy is None:
+            raise NotImplementedError(
+                "delete must be implemented in your cache class")
+        if key not in self.cache_data:
+            return False
+        item = self._remove(key)
+        self.policy.remove(key)
+        self.deletes += 1
+        for listener in self.listeners:
+            listener(key, item, "deleted")
+        return True
+
+    def delete_many(self, keys):
+        """ Remove keys from the cache, return how many were cached
+        """
+        deleted = 0
+        for key in keys:
+            if self.delete(key):
+                deleted += 1
+        return deleted
+
+    def clear(self):
+        """ Remove every item, without telling the listeners
+        """
+        self.cache_data.clear()
+        self.sizes.clear()
+        self.current_bytes = 0
+        self.compressed = 0
+        self.saved_bytes = 0
+        self.expires.clear()
+        self.negatives.clear()
+        if self.wheel is not None:
+            self.wheel.clear()
+        if self.policy is not None:
+            self.policy.clear()
+        if self.admission is not None:
+            self.admission.clear()
+        self.pending.clear()
+        self._release()
+
+    def dump(self, path):
+        """ Write the items, their time to live and the state of the
+        policy to a snapshot file at path (see snapshot.py)
+        """
+        if self.policy is None:
+            raise NotImplementedError(
+                "dump needs a cache built on an eviction policy")
+        snapshot.write(self, path, self.clock())
+
+    def load(self, path):
+        """ Replace the content of the cache by the snapshot at path
+        The keys come back in the order of the policy, and with its
+        state when the snapshot was taken with the same policy class;
+        the items are unpickled from the mapped file when first read.
+        When the cache is smaller, the keys the policy would discard
+        last are kept. Returns the number of keys loaded.
+        """
+        if self.policy is None:
+            raise NotImplementedError(
+                "load needs a cache built on an eviction policy")
+        self.clear()
+        snap = self.snapshot = snapshot.Snapshot(path)
+        keys, records = snap.keys, snap.records
+        # ttl is NaN for the items that don't expire: never <= 0
+        if any(record[3] <= 0 for record in records):
+            kept = [index for index, record in enumerate(records)
+                    if not record[3] <= 0]
+            keys = [keys[index] for index in kept]
+            records = [records[index] for index in kept]
+        if self.MAX_ITEMS is not None and len(keys) > self.MAX_ITEMS:
+            keys = keys[len(keys) - self.MAX_ITEMS:]
+            records = records[len(records) - self.MAX_ITEMS:]
+        self.cache_data.update(dict.fromkeys(keys, PENDING))
+        self.pending.update(zip(keys, records))
+        now = self.clock()
+        for key, record in zip(keys, records):
+            if record[3] == record[3]:
+                self._expire_at(key, now + record[3])
+        if self.max_bytes is not None:
+            for key, record in zip(keys, records):
+                # A size of 0 was not measured by the cache that took
+                # the snapshot
+                self.sizes[key] = record[2] or self.sizeof(
+                    snap.item(record))
+            self.current_bytes = sum(self.sizes.values())
+            first = 0
+            while self.current_bytes > self.max_bytes:
+                self.discard(keys[first])
+                first += 1
+            keys, records = keys[first:], records[first:]
+        # Negative entries are known before their items are unpickled
+        negatives = [key for key, record in zip(keys, records)
+                     if record[5]]
+        if self.max_negative is not None and \
+                len(negatives) > self.max_negative:
+            extra = len(negatives) - self.max_negative
+            for key in negatives[:extra]:
+                self.discard(key)
+            kept = [index for index, key in enumerate(keys)
+                    if key in self.cache_data]
+            keys = [keys[index] for index in kept]
+            records = [records[index] for index in kept]
+            negatives = negatives[extra:]
+        self.negatives.update(dict.fromkeys(negatives))
+        name = type(self.policy).__name__
+        if snap.policy == name:
+            self.policy.restore(snap.state, list(zip(
+                keys, [record[4] for record in records])))
+        else:
+            self.policy.insert_many(keys)
+        if not self.pending:
+            self._release()
+        return len(keys)
+
+    def thaw(self):
+        """ Unpickle every item still in the snapshot
+        """
+        for key in list(self.pending):
+            self._thaw(key)
+
+    def _thaw(self, key):
+        """ Unpickle the item of key from the snapshot and return it
+        """
+        item = self.cache_data[key] = self.snapshot.item(
+            self.pending.pop(key))
+        if self.compressor is not None and item is not NOT_FOUND:
+            self._count(item)
+        if not self.pending:
+            self._release()
+        return item
+
+    def _pack(self, item):
+        """ Return item compressed by the compressor, if it is worth it
+        """
+        packed = self.compressor.pack(item)
+        if packed is not item:
+            packed.saved = self.sizeof(item) - self.sizeof(packed)
+        return packed
+
+    def _unpack(self, key, item, promoted=None):
+        """ Return the decompressed item of key
+        After promote hits, the item is stored uncompressed, or added
+        to the list promoted as (key, item, value) to be promoted later.
+        """
+        value = self.compressor.unpack(item)
+        item.hits += 1
+        promote = self.compressor.promote
+        if promote is not None and item.hits >= promote:
+            if promoted is None:
+                self._promote(key, item, value)
+            else:
+                promoted.append((key, item, value))
+        return value
+
+    def _promote(self, key, item, value):
+        """ Replace the compressed item of key by its value, making
+        room for it if it is larger
+        """
+        size = 0
+        if self.max_bytes is not None:
+            size = self.sizeof(value)
+            if size > self.max_bytes:
+                return
+        self.cache_data[key] = value
+        self._uncount(item)
+        if self.max_bytes is not None:
+            self.current_bytes += size - self.sizes[key]
+            self.sizes[key] = size
+            if self.policy.weighted:
+                self.policy.weigh(key, size)
+            self._make_room(key)
+
+    def _count(self, item):
+        """ Count item among the compressed ones, if it is
+        """
+        if type(item) is Compressed:
+            self.compressed += 1
+            self.saved_bytes += item.saved
+
+    def _uncount(self, item):
+        """ Stop counting item among the compressed ones, if it was
+        """
+        if type(item) is Compressed:
+            self.compressed -= 1
+            self.saved_bytes -= item.saved
+
+    def _forget(self, key):
+        """ Drop the snapshot entry of key, if its item is still there
+        """
+        if self.pending.pop(key, None) is not None and not self.pending:
+            self._release()
+
+    def pending_item(self, key):
+        """ Return the pickled item of key still in the snapshot
+        """
+        return self.snapshot.raw(self.pending[key])
+
+    def _release(self):
+        """ Unmap the snapshot once every item left it
+        """
+        if self.snapshot is not None:
+            self.snapshot.close()
+            self.snapshot = None
+
+    def get_or_load(self, key, loader, ttl=None):
+        """ Get an item by key, loading it with loader(key) on a miss
+        Concurrent misses on the same key run loader once: the other
+        callers wait for its item (or its exception). The loaded item
+        is cached for ttl seconds, a None item is not cached (unless
+        negative_ttl is set: it is cached and returned as NOT_FOUND).
+        BaseCaching is not thread-safe, threads share a ConcurrentCache.
+        """
+        item = self.get(key)
+        if item is None and key is not None:
+            item = self.flights.do(
+                key, lambda: self.loaded(key, loader(key), ttl))
+        return item
+
+    async def get_or_load_async(self, key, loader, ttl=None):
+        """ Get an item by key, awaiting loader(key) on a miss
+        Like get_or_load, concurrent misses on the same key from
+        coroutines await a single call of loader.
+        """
+        item = self.get(key)
+        if item is None and key is not None:
+            async def load():
+                """ Await the loader and cache its item """
+                return self.loaded(key, await loader(key), ttl)
+            item = await self.async_flights.do(key, load)
+        return item
+
+    def loaded(self, key, item, ttl=None):
+        """ Cache the item just loaded for key and return it
+        """
+        self.loads += 1
+        if item is None and self.negative_ttl is not None:
+            item = NOT_FOUND
+        self.put(key, item, ttl)
+        return item
+
+    def is_full(self, size=0, count=0):
+        """ Tell whether count more items of size bytes overflow the cache
+        """
+        if (self.MAX_ITEMS is not None and
+                len(self.cache_data) + count > self.MAX_ITEMS):
+            return True
+        return (self.max_bytes is not None and
+                self.current_bytes + size > self.max_bytes)
+
+    def _admit(self, key, size=0):
+        """ Tell whether the new key of size bytes gets in, when it
+        takes the room of the victim of the policy
+        """
+        if (self.admission is None or not self.cache_data or
+                not self.is_full(size, 1)):
+            return True
+        if self.admission.admit(key, self.policy.victim(key)):
+            self.admitted += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def _make_room(self, key, size=0, count=0):
+        """ Discard the victims chosen for key until count more items
+        of size bytes fit
+        """
+        evicted = False
+        while self.cache_data and self.is_full(size, count):
+            self.discard(self.policy.evict(key))
+            evicted = True
+        if evicted and self.MAX_ITEMS is None:
+            # Byte bounded: the policy sizes its queues on what fits
+            self.policy.capacity = max(1, len(self.cache_data) + count)
+            if self.admission is not None:
+                self.admission.capacity = self.policy.capacity
+
+    def _negative_room(self, key):
+        """ Evict the oldest negative entries until a new one for key
+        fits in max_negative, once it is known to go in
+        """
+        if self.max_negative is None or key in self.negatives:
+            return
+        while len(self.negatives) >= self.max_negative:
+            oldest = next(iter(self.negatives))
+            self.policy.remove(oldest)
+            self.discard(oldest)
+
+    def _mark(self, key, negative):
+        """ Record whether the updated key is a negative entry, a
+        negative one becoming the newest
+        """
+        self.negatives.pop(key, None)
+        if negative:
+            self.negatives[key] = None
+
+    def _expire_at(self, key, deadline):
+        """ Make key expire at deadline
+        """
+        if self.wheel is None:
+            self.wheel = TimingWheel(self.resolution, start=self.clock())
+        self.expires[key] = deadline
+        self.wheel.schedule(key, deadline)
+
+    def _remove(self, key):
+        """ Drop key and its bookkeeping from the storage, return its item
+        """
+        item = self.cache_data.pop(key)
+        self.current_bytes -= self.sizes.pop(key, 0)
+        self.expires.pop(key, None)
+        if self.negatives:
+            self.negatives.pop(key, None)
+        if item is PENDING:
+            item = (self.snapshot.item(self.pending[key])
+                    if self.listeners else None)
+            self._forget(key)
+        elif type(item) is Compressed:
+            self._uncount(item)
+        if type(item) is Compressed and self.listeners:
+            item = self.compressor.unpack(item)
+        return item
+
+    def reap(self, now=None):
+        """ Remove the items whose time to live has passed
+        Amortized O(1): only the entries due on the elapsed ticks of the
+        timing wheel are looked at. put calls it, callers holding items
+        that are rarely written may call it from a timer.
+        """
+        if self.wheel is None:
+            return
+        for deadline, key in self.wheel.advance(
+                self.clock() if now is None else now):
+            # A key updated or removed since has a new deadline, or none
+            if self.expires.get(key) == deadline:
+                self.expire(key)
+
+    def expire(self, key):
+        """ Remove the expired key
+        """
+        item = self._remove(key)
+        self.policy.remove(key)
+        self.expirations += 1
+        for listener in self.listeners:
+            listener(key, item, "expired")
+
+    def discard(self, key):
+        """ Remove the key evicted by the policy
+        """
+        item = self._remove(key)
+        self.evictions += 1
+        for listener in self.listeners:
+            listener(key, item, "evicted")
+
+    def add_listener(self, listener):
+        """ Call listener(key, item, reason) for every item leaving the
+        cache, reason being "evicted", "expired" or "deleted"
+        """
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        """ Stop calling listener
+        """
+        self.listeners.remove(listener)
+
+    def stats(self):
+        """ Return the counters of the cache
+        The latencies sampled by get and put are histograms (see
+        latency_histogram.py).
+        """
+        stats = {
+            "items": len(self.cache_data),
+            "bytes": self.current_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "deletes": self.deletes,
+            "negative": len(self.negatives),
+            "negative_hits": self.negative_hits,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
+        if self.compressor is not None:
+            stats["compressed"] = self.compressed
+            stats["saved_bytes"] = self.saved_bytes
+            if self.max_bytes is not None:
+                stats["effective_bytes"] = self.effective_bytes()
+        for name, histogram in self.latency.items():
+            stats[name + "_ns"] = list(histogram.counts)
+        return stats
+
+    def effective_bytes(self):
+        """ Return the capacity of the cache in bytes of uncompressed
+        items, at the compression ratio of the cached items
         """
-        raise NotImplementedError("get must be implemented in your cache class")
\ No newline at end of file
+        if not self.current_bytes:
+            return self.max_bytes
+        return int(self.max_bytes *
+                   (self.current_bytes + self.saved_bytes) /
+                   self.current_bytes)
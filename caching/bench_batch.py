@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+'''
+Benchmark of the batch APIs.
+For several caches it compares a loop of get (or put) calls with one
+get_many (or put_many) call over the same batches of keys, and reports
+the time per key of both.
+
+Usage: ./bench_batch.py [BATCH] [BATCHES]
+'''
+import sys
+import time
+BaseCaching = __import__('base_caching').BaseCaching
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+policies = __import__('policies')
+zipf_trace = __import__('cache_simulator').zipf_trace
+
+CACHES = {
+    "LRU": lambda: BaseCaching(policies.LRUPolicy(), max_items=10000),
+    "LFU": lambda: BaseCaching(policies.LFUPolicy(), max_items=10000),
+    "ARC": lambda: BaseCaching(policies.ARCPolicy(), max_items=10000),
+    "Concurrent": lambda: ConcurrentCache(max_items=10000),
+}
+
+
+def per_key_ns(fn, batches):
+    ''' Call fn on every batch, return the time per key in nanoseconds.
+    '''
+    start = time.perf_counter_ns()
+    for batch in batches:
+        fn(batch)
+    return (time.perf_counter_ns() - start) / sum(map(len, batches))
+
+
+def get_loop(cache):
+    ''' Return a function getting every key of a batch from cache.
+    '''
+    def run(batch):
+        ''' Get every key of batch. '''
+        for key in batch:
+            cache.get(key)
+    return run
+
+
+def put_loop(cache):
+    ''' Return a function putting every key of a batch in cache.
+    '''
+    def run(batch):
+        ''' Put every key of batch. '''
+        for key in batch:
+            cache.put(key, key)
+    return run
+
+
+def put_many(cache):
+    ''' Return a function putting a batch in cache at once.
+    '''
+    return lambda batch: cache.put_many((key, key) for key in batch)
+
+
+def get_many(cache):
+    ''' Return a function getting a batch from cache at once.
+    '''
+    return cache.get_many
+
+
+def bench(factory, batches, repeat=3):
+    ''' Time the loops and the batch calls on caches from factory,
+    warmed up by the batches for the gets. Each timing is the best of
+    repeat runs on a new cache.
+    Returns the get loop, get_many, put loop and put_many timings.
+    '''
+    timings = []
+    for method in (get_loop, get_many, put_loop, put_many):
+        best = None
+        for _ in range(repeat):
+            cache = factory()
+            if method in (get_loop, get_many):
+                for batch in batches:
+                    cache.put_many((key, key) for key in batch)
+            elapsed = per_key_ns(method(cache), batches)
+            best = elapsed if best is None else min(best, elapsed)
+        timings.append(best)
+    return timings
+
+
+def main():
+    ''' Print the timings of every cache.
+    '''
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    trace = zipf_trace(size * count, 50000, seed=0)
+    batches = [trace[i:i + size] for i in range(0, len(trace), size)]
+    print("{:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "cache", "get", "get_many", "put", "put_many"))
+    for name, factory in CACHES.items():
+        print("{:>10} {:>8.0f}ns {:>8.0f}ns {:>8.0f}ns {:>8.0f}ns".format(
+            name, *bench(factory, batches)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+'''
+Multi-threaded benchmark of the ConcurrentCache class.
+Each thread replays a Zipf trace (get, then put on a miss) against
+an LRU cache guarded by one global lock and against ConcurrentCache,
+and the total throughput is reported for 1 to 32 threads.
+
+Usage: ./bench_concurrent.py [OPS_PER_THREAD] [SHARDS]
+'''
+import sys
+import threading
+import time
+BaseCaching = __import__('base_caching').BaseCaching
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+LRUPolicy = __import__('policies').LRUPolicy
+zipf_trace = __import__('cache_simulator').zipf_trace
+
+
+class GlobalLockCache():
+    ''' GlobalLockCache serializes every call on one lock.
+    '''
+
+    def __init__(self, max_items):
+        ''' Initialize an LRU cache and its lock.
+        '''
+        self.cache = BaseCaching(LRUPolicy(), max_items=max_items)
+        self.lock = threading.Lock()
+
+    def put(self, key, item):
+        ''' Add an item under the lock.
+        '''
+        with self.lock:
+            self.cache.put(key, item)
+
+    def get(self, key):
+        ''' Retrieve an item under the lock.
+        '''
+        with self.lock:
+            return self.cache.get(key)
+
+
+def run(cache, threads, ops):
+    ''' Replay ops accesses in each of threads threads.
+    Returns the total number of operations per second.
+    '''
+    traces = [zipf_trace(ops, 100000, seed=seed) for seed in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(trace):
+        ''' Replay trace once every thread is ready. '''
+        barrier.wait()
+        for key in trace:
+            if cache.get(key) is None:
+                cache.put(key, key)
+
+    workers = [threading.Thread(target=worker, args=(trace,))
+               for trace in traces]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * ops / (time.perf_counter() - start)
+
+
+def main():
+    ''' Print the throughput of both caches for 1 to 32 threads.
+    '''
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    shards = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    print("{:>8} {:>14} {:>14}".format("threads", "global lock",
+                                       "{} shards".format(shards)))
+    for threads in (1, 2, 4, 8, 16, 32):
+        single = run(GlobalLockCache(10000), threads, ops)
+        sharded = run(ConcurrentCache(shards=shards, max_items=10000),
+                      threads, ops)
+        print("{:>8} {:>10.0f}op/s {:>10.0f}op/s".format(
+            threads, single, sharded))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+'''
+Multi-process benchmark of the DistributedCache class.
+Every node is an LRU cache of NODE_ITEMS items served by a process of
+its own on a local socket. For 1 to 8 nodes, the cache is filled with
+twice as many distinct keys as the nodes hold, and the items it kept
+are reported; then client processes replay a Zipf trace (get, then put
+on a miss) against it, once to warm it up and once more, with other
+seeds, to report the hit ratio and the throughput. Then one node
+is added to, and one removed from, a full cache, and the items moved and
+the time it took are reported, with the share of keys plain modulo
+hashing (hash % n) would have moved instead.
+
+Usage: ./bench_distributed.py [OPS_PER_CLIENT] [NODE_ITEMS] [CLIENTS]
+'''
+import multiprocessing
+import sys
+import time
+BaseCaching = __import__('base_caching').BaseCaching
+LRUPolicy = __import__('policies').LRUPolicy
+distributed_cache = __import__('distributed_cache')
+stable_hash = __import__('hash_ring').stable_hash
+zipf_trace = __import__('cache_simulator').zipf_trace
+
+KEYS = 1000000
+
+
+def serve(addresses, max_items):
+    ''' Serve an LRU cache of max_items items and send its address.
+    '''
+    server = distributed_cache.CacheServer(
+        BaseCaching(LRUPolicy(), max_items=max_items))
+    addresses.put(server.address)
+    server.serve_forever()
+
+
+def start_nodes(count, max_items):
+    ''' Start count node processes.
+    Returns the processes and the address of each of them.
+    '''
+    addresses = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=serve,
+                                         args=(addresses, max_items),
+                                         daemon=True)
+                 for _ in range(count)]
+    for process in processes:
+        process.start()
+    return processes, [addresses.get() for _ in processes]
+
+
+def connect(addresses):
+    ''' Return a DistributedCache over the nodes served at addresses.
+    '''
+    return distributed_cache.DistributedCache({
+        "node{}".format(index): distributed_cache.RemoteNode(address)
+        for index, address in enumerate(addresses)})
+
+
+def client(addresses, seed, ops, results):
+    ''' Replay a Zipf trace against the nodes, send hits and seconds.
+    '''
+    cache = connect(addresses)
+    trace = zipf_trace(ops, KEYS, seed=seed)
+    hits = 0
+    start = time.perf_counter()
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+    results.put((hits, time.perf_counter() - start))
+
+
+def replay(addresses, clients, ops, first_seed=0):
+    ''' Run clients client processes at once, with the seeds from
+    first_seed on.
+    Returns the hit ratio and the total number of operations per second.
+    '''
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(
+        target=client, args=(addresses, seed, ops, results))
+        for seed in range(first_seed, first_seed + clients)]
+    for process in processes:
+        process.start()
+    outcomes = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    hits = sum(hits for hits, _ in outcomes)
+    seconds = max(seconds for _, seconds in outcomes)
+    return hits / (clients * ops), clients * ops / seconds
+
+
+def scaling(ops, node_items, clients):
+    ''' Print items held, hit ratio and throughput for 1 to 8 nodes.
+    '''
+    print("{:>6} {:>10} {:>9} {:>9} {:>12}".format(
+        "nodes", "items", "of total", "hits", "throughput"))
+    for count in (1, 2, 4, 8):
+        processes, addresses = start_nodes(count, node_items)
+        cache = connect(addresses)
+        fill = range(-2 * count * node_items, 0)
+        for start in range(0, len(fill), 1000):
+            cache.put_many({key: key for key in fill[start:start + 1000]})
+        held = len(cache)
+        replay(addresses, clients, ops)
+        ratio, throughput = replay(addresses, clients, ops, clients)
+        print("{:>6} {:>10} {:>8.1%} {:>8.1%} {:>8.0f}op/s".format(
+            count, held, held / (count * node_items), ratio, throughput))
+        for process in processes:
+            process.terminate()
+
+
+def modulo_moved(keys, count, new_count):
+    ''' Return the share of keys hash % count sends elsewhere with
+    new_count nodes.
+    '''
+    hashes = [stable_hash(key) for key in keys]
+    return sum(h % count != h % new_count for h in hashes) / len(hashes)
+
+
+def rebalancing(node_items):
+    ''' Print the cost of adding a fifth node and removing it again.
+    '''
+    processes, addresses = start_nodes(5, node_items)
+    cache = connect(addresses[:4])
+    cache.put_many({key: key for key in range(4 * node_items)})
+    held = len(cache)
+    print("\n{:>8} {:>8} {:>8} {:>9} {:>10}".format(
+        "change", "items", "moved", "of items", "modulo"))
+    start = time.perf_counter()
+    moved = cache.add_node("node4",
+                           distributed_cache.RemoteNode(addresses[4]))
+    seconds = time.perf_counter() - start
+    print("{:>8} {:>8} {:>8} {:>8.1%} {:>9.1%}   {:.0f}ms".format(
+        "4 -> 5", held, moved, moved / held,
+        modulo_moved(range(held), 4, 5), seconds * 1000))
+    held = len(cache)
+    start = time.perf_counter()
+    _, moved = cache.remove_node("node2")
+    seconds = time.perf_counter() - start
+    print("{:>8} {:>8} {:>8} {:>8.1%} {:>9.1%}   {:.0f}ms".format(
+        "5 -> 4", held, moved, moved / held,
+        modulo_moved(range(held), 5, 4), seconds * 1000))
+    for process in processes:
+        process.terminate()
+
+
+def main():
+    ''' Run both benchmarks.
+    '''
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    node_items = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    clients = int(sys.argv[3]) if len(sys.argv) > 3 else 4
+    scaling(ops, node_items, clients)
+    rebalancing(node_items)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+Scaling benchmark for the LRUCache class.
+It fills caches holding from 10 up to 10 ** MAX_EXP keys (10 million by
+default) and reports the average latency of a get hit, a get miss, a put
+that updates a key and a put that evicts one. With the constant-time
+usage order every column should stay flat as the cache grows.
+
+Usage: ./bench_lru.py [MAX_EXP] [OPS]
+'''
+import random
+import sys
+import time
+LRUCache = __import__('3-lru_cache').LRUCache
+
+
+def per_op_ns(fn, keys):
+    ''' Run fn on every key and return the average time in nanoseconds.
+    '''
+    start = time.perf_counter_ns()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter_ns() - start) / len(keys)
+
+
+def bench(size, ops):
+    ''' Measure one cache holding size keys over ops operations.
+    Returns a tuple of per-op latencies in nanoseconds.
+    '''
+    cache = LRUCache()
+    cache.MAX_ITEMS = size
+    for key in range(size):
+        cache.put(key, key)
+
+    hits = [random.randrange(size) for _ in range(ops)]
+    misses = [-1 - i for i in range(ops)]
+    new_keys = [size + i for i in range(ops)]
+
+    get_hit = per_op_ns(cache.get, hits)
+    get_miss = per_op_ns(cache.get, misses)
+    update = per_op_ns(lambda key: cache.put(key, key), hits)
+    evict = per_op_ns(lambda key: cache.put(key, key), new_keys)
+    return get_hit, get_miss, update, evict
+
+
+def main():
+    ''' Print a latency table for every power of ten up to MAX_EXP.
+    '''
+    max_exp = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    random.seed(0)
+    print("{:>10} {:>10} {:>10} {:>10} {:>10}".format(
+        "keys", "get hit", "get miss", "update", "evict"))
+    for exp in range(1, max_exp + 1):
+        size = 10 ** exp
+        row = bench(size, ops)
+        print("{:>10} {:>8.0f}ns {:>8.0f}ns {:>8.0f}ns {:>8.0f}ns".format(
+            size, *row))
+
+
+if __name__ == "__main__":
+    main()
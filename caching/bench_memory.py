@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+'''
+Memory benchmark of the compact storage.
+For several caches it fills SIZE keys, traced by tracemalloc, and
+reports the bytes allocated per entry, the keys and the items aside
+(they are created before tracing and shared by every cache), as well as
+the time per get hit and per evicting put.
+
+Usage: ./bench_memory.py [SIZE] [OPS]
+'''
+import gc
+import random
+import sys
+import time
+import tracemalloc
+BaseCaching = __import__('base_caching').BaseCaching
+CompactCache = __import__('compact_cache').CompactCache
+policies = __import__('policies')
+
+CACHES = {
+    "LRU": lambda size: BaseCaching(policies.LRUPolicy(), max_items=size),
+    "LFU": lambda size: BaseCaching(policies.LFUPolicy(), max_items=size),
+    "CLOCK": lambda size: BaseCaching(policies.ClockPolicy(),
+                                      max_items=size),
+    "Compact LRU": lambda size: CompactCache(size, "lru"),
+    "Compact CLOCK": lambda size: CompactCache(size, "clock"),
+}
+
+
+def bytes_per_entry(make, keys, item):
+    ''' Fill a new cache with keys, return the bytes it allocated per
+    entry, and the cache.
+    '''
+    gc.collect()
+    tracemalloc.start()
+    cache = make(len(keys))
+    for key in keys:
+        cache.put(key, item)
+    used = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return used / len(keys), cache
+
+
+def per_op_ns(fn, keys):
+    ''' Run fn on every key and return the average time in nanoseconds.
+    '''
+    start = time.perf_counter_ns()
+    for key in keys:
+        fn(key)
+    return (time.perf_counter_ns() - start) / len(keys)
+
+
+def main():
+    ''' Print the memory and latency table of every cache.
+    '''
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    ops = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    random.seed(0)
+    keys = list(range(size))
+    item = object()
+    hits = [random.randrange(size) for _ in range(ops)]
+    new_keys = list(range(size, size + ops))
+    print("{:>14} {:>12} {:>10} {:>10}".format(
+        "cache", "bytes/entry", "get hit", "evict"))
+    for name, make in CACHES.items():
+        per_entry, cache = bytes_per_entry(make, keys, item)
+        get_hit = per_op_ns(cache.get, hits)
+        evict = per_op_ns(lambda key: cache.put(key, item), new_keys)
+        print("{:>14} {:>12.1f} {:>8.0f}ns {:>8.0f}ns".format(
+            name, per_entry, get_hit, evict))
+        del cache
+
+
+if __name__ == "__main__":
+    main()
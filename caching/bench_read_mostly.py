@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+'''
+Multi-threaded benchmark of the ReadMostlyCache class.
+Each thread replays a Zipf trace of reads over the keys of a warm cache
+and writes one key for every WRITES_EVERY reads, and the total throughput
+is reported for 1 to 32 threads, for an LRU cache guarded by one global
+lock, for ConcurrentCache (one lock per shard) and for ReadMostlyCache
+(no lock for readers, copy-on-write for writers).
+
+Usage: ./bench_read_mostly.py [OPS_PER_THREAD] [ITEMS] [WRITES_EVERY]
+'''
+import sys
+import threading
+import time
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+GlobalLockCache = __import__('bench_concurrent').GlobalLockCache
+ReadMostlyCache = __import__('read_mostly_cache').ReadMostlyCache
+zipf_trace = __import__('cache_simulator').zipf_trace
+
+CACHES = {
+    "global lock": GlobalLockCache,
+    "16 shards": lambda items: ConcurrentCache(shards=16, max_items=items),
+    "read-mostly": lambda items: ReadMostlyCache(max_items=items),
+}
+
+
+def run(cache, threads, ops, items, writes_every):
+    ''' Replay ops accesses in each of threads threads.
+    Returns the total number of operations per second.
+    '''
+    traces = [zipf_trace(ops, items, seed=seed) for seed in range(threads)]
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(trace):
+        ''' Replay trace once every thread is ready. '''
+        barrier.wait()
+        for index, key in enumerate(trace):
+            if index % writes_every == 0:
+                cache.put(key, index)
+            elif cache.get(key) is None:
+                cache.put(key, key)
+
+    workers = [threading.Thread(target=worker, args=(trace,))
+               for trace in traces]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * ops / (time.perf_counter() - start)
+
+
+def main():
+    ''' Print the throughput of every cache for 1 to 32 threads.
+    '''
+    ops = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    items = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    writes_every = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    print("{:>8}".format("threads") + "".join(
+        "{:>16}".format(name) for name in CACHES))
+    for threads in (1, 2, 4, 8, 16, 32):
+        row = []
+        for factory in CACHES.values():
+            cache = factory(items)
+            for key in range(items):
+                cache.put(key, key)
+            row.append(run(cache, threads, ops, items, writes_every))
+        print("{:>8}".format(threads) + "".join(
+            "{:>12.0f}op/s".format(rate) for rate in row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+'''
+Trace-driven simulator for the caching systems of this project.
+It replays a key access trace against every policy, at several
+capacities, and reports for each run the hit ratio, the throughput,
+the p50 / p99 latency of a single operation and the peak memory.
+
+Every access is a get; a miss is followed by a put of the key, like a
+read-through cache in front of a slower backend would do.
+
+Traces are synthetic (zipf, scan, loop) or recorded files holding one
+key per line.
+
+With --weighted, every key also has the size and the cost of its item
+(the second and third fields of a trace file, heavy-tailed random ones
+for a synthetic trace), put with the item, and the byte hit ratio and
+the cost hit ratio are the share of the bytes and of the cost of the
+requests that hit. With --bytes, the capacities are byte budgets.
+
+Usage: ./cache_simulator.py [-t zipf|scan|loop|FILE] [-c CAPACITY ...]
+                            [--weighted] [--bytes]
+'''
+import argparse
+import functools
+import itertools
+import random
+import time
+import tracemalloc
+BaseCaching = __import__('base_caching').BaseCaching
+policies = __import__('policies')
+TinyLFUAdmission = __import__('admission').TinyLFUAdmission
+AdaptivePolicy = __import__('adaptive_policy').AdaptivePolicy
+
+
+def _bound(capacity, in_bytes):
+    ''' Return the BaseCaching arguments bounding a cache to capacity
+    items, or bytes.
+    '''
+    if in_bytes:
+        return {"max_bytes": capacity}
+    return {"max_items": capacity}
+
+
+def _bounded(cache_class):
+    ''' Return a factory building cache_class instances of a capacity,
+    for the classes taking the bounds of BaseCaching.
+    '''
+    def factory(capacity, in_bytes=False):
+        ''' Build a cache_class instance holding capacity items (or
+        bytes).
+        '''
+        return cache_class(**_bound(capacity, in_bytes))
+    return factory
+
+
+def _with_policy(policy_class):
+    ''' Return a factory building BaseCaching instances of a capacity
+    driven by policy_class.
+    '''
+    def factory(capacity, in_bytes=False):
+        ''' Build a BaseCaching instance holding capacity items (or
+        bytes).
+        '''
+        return BaseCaching(policy_class(), **_bound(capacity, in_bytes))
+    return factory
+
+
+def _with_admission(policy_class):
+    ''' Return a factory building BaseCaching instances of a capacity
+    driven by policy_class behind a TinyLFU admission filter.
+    '''
+    def factory(capacity, in_bytes=False):
+        ''' Build a BaseCaching instance holding capacity items (or
+        bytes).
+        '''
+        return BaseCaching(policy_class(), admission=TinyLFUAdmission(),
+                           **_bound(capacity, in_bytes))
+    return factory
+
+
+POLICIES = {
+    "FIFO": _bounded(__import__('1-fifo_cache').FIFOCache),
+    "LIFO": _bounded(__import__('2-lifo_cache').LIFOCache),
+    "LRU": _bounded(__import__('3-lru_cache').LRUCache),
+    "MRU": _bounded(__import__('4-mru_cache').MRUCache),
+    "LFU": _bounded(__import__('100-lfu_cache').LFUCache),
+    "CLOCK": _with_policy(policies.ClockPolicy),
+    "SIEVE": _with_policy(policies.SievePolicy),
+    "2Q": _with_policy(policies.TwoQueuePolicy),
+    "ARC": _with_policy(policies.ARCPolicy),
+    "W-TinyLFU": _with_policy(policies.WTinyLFUPolicy),
+    "LRU+TinyLFU": _with_admission(policies.LRUPolicy),
+    "CLOCK+TinyLFU": _with_admission(policies.ClockPolicy),
+    "Adaptive": _with_policy(AdaptivePolicy),
+    "GDSF": _with_policy(policies.GDSFPolicy),
+    "GDSF-bytes": _with_policy(functools.partial(policies.GDSFPolicy,
+                                                 objective="bytes")),
+}
+
+# The size and cost of a key without weights
+DEFAULT_WEIGHT = (1, 1)
+
+
+def zipf_trace(length, keys, alpha=1.0, seed=0):
+    ''' Return length accesses over keys distinct keys whose
+    popularity follows a Zipf distribution of parameter alpha.
+    '''
+    rng = random.Random(seed)
+    weights = [1 / (rank ** alpha) for rank in range(1, keys + 1)]
+    cumulative = list(itertools.accumulate(weights))
+    return rng.choices(range(keys), cum_weights=cumulative, k=length)
+
+
+def scan_trace(length, keys, scan_share=0.5, alpha=1.0, seed=0):
+    ''' Return a Zipf trace over keys distinct keys where scan_share of
+    the accesses are replaced by one-off keys never seen again.
+    '''
+    rng = random.Random(seed)
+    trace = zipf_trace(length, keys, alpha, seed)
+    for i in range(length):
+        if rng.random() < scan_share:
+            trace[i] = keys + i
+    return trace
+
+
+def loop_trace(length, keys):
+    ''' Return length accesses cycling over keys distinct keys.
+    '''
+    return [i % keys for i in range(length)]
+
+
+def load_trace(path):
+    ''' Return the trace recorded in the file at path.
+    The key is the first field of every non-empty line.
+    '''
+    trace = []
+    with open(path) as trace_file:
+        for line in trace_file:
+            fields = line.split()
+            if fields:
+                trace.append(fields[0])
+    return trace
+
+
+def load_weights(path):
+    ''' Return the size and the cost of the keys of the trace file at
+    path: its second and third fields (a cost of 1 when missing).
+    '''
+    weights = {}
+    with open(path) as trace_file:
+        for line in trace_file:
+            fields = line.split()
+            if len(fields) > 1:
+                weights[fields[0]] = (int(fields[1]), float(fields[2])
+                                      if len(fields) > 2 else 1)
+    return weights
+
+
+def synthetic_weights(trace, size=1000, seed=0):
+    ''' Return a random size and cost for every key of trace.
+    Sizes follow a Pareto distribution of mean about size bytes, costs
+    an independent lognormal distribution of median 1: a few keys are
+    large or expensive, most are small and cheap.
+    '''
+    rng = random.Random(seed)
+    weights = {}
+    for key in trace:
+        if key not in weights:
+            weights[key] = (int(size / 10 * rng.paretovariate(1.1)),
+                            rng.lognormvariate(0, 1))
+    return weights
+
+
+def percentile(ordered, fraction):
+    ''' Return the value at fraction of the already sorted list.
+    '''
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def replay(cache, trace, weights=None):
+    ''' Replay trace against cache, putting the missed keys with their
+    size and cost from weights, if given.
+    Returns the number of hits, the bytes and the cost of the hits and
+    the latency of every access in nanoseconds.
+    '''
+    clock = time.perf_counter_ns
+    hits = 0
+    latencies = []
+    record = latencies.append
+    if weights is None:
+        for key in trace:
+            start = clock()
+            if cache.get(key) is None:
+                cache.put(key, key)
+            else:
+                hits += 1
+            record(clock() - start)
+        return hits, hits, hits, latencies
+    hit_bytes = hit_cost = 0
+    for key in trace:
+        size, cost = weights.get(key, DEFAULT_WEIGHT)
+        start = clock()
+        if cache.get(key) is None:
+            cache.put(key, key, size=size, cost=cost)
+        else:
+            hits += 1
+            hit_bytes += size
+            hit_cost += cost
+        record(clock() - start)
+    return hits, hit_bytes, hit_cost, latencies
+
+
+def peak_memory(factory, capacity, trace, weights=None, in_bytes=False):
+    ''' Replay trace against a new cache under tracemalloc.
+    Returns the peak number of bytes allocated during the replay.
+    '''
+    tracemalloc.start()
+    try:
+        cache = factory(capacity, in_bytes)
+        for key in trace:
+            if cache.get(key) is None:
+                if weights is None:
+                    cache.put(key, key)
+                else:
+                    size, cost = weights.get(key, DEFAULT_WEIGHT)
+                    cache.put(key, key, size=size, cost=cost)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def simulate(trace, capacities, names=None, memory=True, weights=None,
+             in_bytes=False):
+    ''' Replay trace against the policies called names (every policy by
+    default) at each of the capacities.
+    With weights, a key -> (size, cost) dictionary, the items are put
+    with their weight; with in_bytes, the capacities are byte budgets.
+    Returns one result dictionary per run.
+    '''
+    if in_bytes and weights is None:
+        raise ValueError("byte budgets need the weights of the keys")
+    results = []
+    names = names or list(POLICIES)
+    if weights is not None:
+        requested = [sum(weights.get(key, DEFAULT_WEIGHT)[field]
+                         for key in trace) for field in (0, 1)]
+    else:
+        requested = [len(trace), len(trace)]
+    for capacity in capacities:
+        for name in names:
+            factory = POLICIES[name]
+            start = time.perf_counter()
+            hits, hit_bytes, hit_cost, latencies = replay(
+                factory(capacity, in_bytes), trace, weights)
+            elapsed = time.perf_counter() - start
+            latencies.sort()
+            results.append({
+                "policy": name,
+                "capacity": capacity,
+                "hit_ratio": hits / len(trace) if trace else 0,
+                "byte_hit_ratio": (hit_bytes / requested[0]
+                                   if requested[0] else 0),
+                "cost_hit_ratio": (hit_cost / requested[1]
+                                   if requested[1] else 0),
+                "ops_per_sec": len(trace) / elapsed if elapsed else 0,
+                "p50_ns": percentile(latencies, 0.50),
+                "p99_ns": percentile(latencies, 0.99),
+                "peak_bytes": (peak_memory(factory, capacity, trace,
+                                           weights, in_bytes)
+                               if memory else None),
+            })
+    return results
+
+
+def format_results(results):
+    ''' Return the results as a text table.
+    '''
+    lines = ["{:<10} {:>9} {:>7} {:>7} {:>7} {:>10} {:>8} {:>8} {:>10}"
+             .format("policy", "capacity", "hits", "bytes", "cost",
+                     "ops/s", "p50", "p99", "peak")]
+    for result in results:
+        peak = result["peak_bytes"]
+        lines.append(
+            "{:<10} {:>9} {:>6.2%} {:>6.2%} {:>6.2%} {:>10.0f} {:>6}ns "
+            "{:>6}ns {:>10}".format(
+                result["policy"], result["capacity"], result["hit_ratio"],
+                result["byte_hit_ratio"], result["cost_hit_ratio"],
+                result["ops_per_sec"], result["p50_ns"], result["p99_ns"],
+                "-" if peak is None else "{:.1f}KiB".format(peak / 1024)))
+    return "\n".join(lines)
+
+
+def main():
+    ''' Parse the command line, run the simulation and print it.
+    '''
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-t", "--trace", default="zipf",
+                        help="zipf, scan, loop or the path of a trace file")
+    parser.add_argument("-c", "--capacity", type=int, nargs="+",
+                        default=[100, 1000, 10000])
+    parser.add_argument("-p", "--policy", nargs="+", choices=POLICIES)
+    parser.add_argument("-n", "--length", type=int, default=200000)
+    parser.add_argument("-k", "--keys", type=int, default=100000)
+    parser.add_argument("--alpha", type=float, default=1.0)
+    parser.add_argument("--no-memory", action="store_true",
+                        help="skip the (slower) peak memory replay")
+    parser.add_argument("-w", "--weighted", action="store_true",
+                        help="give the items a size and a cost")
+    parser.add_argument("-b", "--bytes", action="store_true",
+                        help="read the capacities as byte budgets "
+                             "(implies --weighted)")
+    args = parser.parse_args()
+
+    if args.trace == "zipf":
+        trace = zipf_trace(args.length, args.keys, args.alpha)
+    elif args.trace == "scan":
+        trace = scan_trace(args.length, args.keys, alpha=args.alpha)
+    elif args.trace == "loop":
+        trace = loop_trace(args.length, args.keys)
+    else:
+        trace = load_trace(args.trace)
+    weights = None
+    if args.weighted or args.bytes:
+        if args.trace in ("zipf", "scan", "loop"):
+            weights = synthetic_weights(trace)
+        else:
+            weights = load_weights(args.trace)
+    results = simulate(trace, args.capacity, args.policy,
+                       not args.no_memory, weights, args.bytes)
+    print(format_results(results))
+
+
+if __name__ == "__main__":
+    main()
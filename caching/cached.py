@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+'''
+This module contains the cached decorator, memoizing a function in a
+cache bounded by one of the eviction policies of policies.py.
+Concurrent calls with the same arguments run the function once (see
+single_flight.py), and each decorated function keeps its own stats.
+'''
+import functools
+import inspect
+BaseCaching = __import__('base_caching').BaseCaching
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+LRUPolicy = __import__('policies').LRUPolicy
+NOT_FOUND = __import__('base_caching').NOT_FOUND
+
+# Separates the positional from the keyword arguments in a key
+KWARGS = object()
+FAST_TYPES = {int, str}
+
+
+class HashedKey(list):
+    ''' HashedKey is a call key whose hash is computed only once.
+    '''
+    __slots__ = ("hashvalue",)
+
+    def __init__(self, values):
+        ''' Hold values and their hash.
+        '''
+        self[:] = values
+        self.hashvalue = hash(values)
+
+    def __hash__(self):
+        ''' Return the hash computed at creation.
+        '''
+        return self.hashvalue
+
+
+def make_key(*args, **kwargs):
+    ''' Return the key of a call with args and kwargs.
+    A single int or str argument is its own key.
+    '''
+    if not kwargs and len(args) == 1 and type(args[0]) in FAST_TYPES:
+        return args[0]
+    values = args
+    if kwargs:
+        values += (KWARGS,) + tuple(kwargs.items())
+    try:
+        return HashedKey(values)
+    except TypeError as error:
+        raise TypeError("{}: pass a key function to cached".format(error))
+
+
+def cached(policy=LRUPolicy, capacity=128, ttl=None, key=None,
+           max_bytes=None, sizeof=None, shards=1, negative_ttl=None):
+    ''' Return a decorator memoizing a function in a cache of capacity
+    results, evicted by policy (a policy class or factory).
+    key(*args, **kwargs) returns the key of a call, make_key by default;
+    give one when the arguments are not hashable. ttl, max_bytes and
+    sizeof are passed on to the cache; None results are cached as
+    negative entries, for negative_ttl seconds if given. Coroutine
+    functions are cached too, their results awaited once.
+    The decorated function has cache_stats(), cache_clear() and cache.
+    '''
+    key_of = key or make_key
+
+    def decorator(function):
+        ''' Memoize function. '''
+        if inspect.iscoroutinefunction(function):
+            cache = BaseCaching(policy(), max_items=capacity,
+                                max_bytes=max_bytes, sizeof=sizeof, ttl=ttl,
+                                negative_ttl=negative_ttl)
+
+            @functools.wraps(function)
+            async def wrapper(*args, **kwargs):
+                ''' Return the cached result, or await it. '''
+                async def load(_):
+                    ''' Await the function. '''
+                    result = await function(*args, **kwargs)
+                    return NOT_FOUND if result is None else result
+                result = await cache.get_or_load_async(
+                    key_of(*args, **kwargs), load)
+                return None if result is NOT_FOUND else result
+        else:
+            cache = ConcurrentCache(policy, shards=shards,
+                                    max_items=capacity, max_bytes=max_bytes,
+                                    sizeof=sizeof, ttl=ttl,
+                                    negative_ttl=negative_ttl)
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                ''' Return the cached result, or compute it. '''
+                def load(_):
+                    ''' Call the function. '''
+                    result = function(*args, **kwargs)
+                    return NOT_FOUND if result is None else result
+                result = cache.get_or_load(key_of(*args, **kwargs), load)
+                return None if result is NOT_FOUND else result
+
+        wrapper.cache = cache
+        wrapper.cache_stats = cache.stats
+        wrapper.cache_clear = cache.clear
+        return wrapper
+    return decorator
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+'''
+This module contains the CompactCache class, a caching system for very
+large caches where the per-key overhead of cache_data, the policy's
+nodes dictionary and its linked list nodes dominates memory.
+
+CompactCache stores its entries in slots: parallel lists of keys and
+items and arrays of machine integers (hashes, links, reference bits)
+indexed by slot number. Keys are found through an open-addressing
+table of slot numbers, probed linearly and kept at most half full, and
+removals shift the following entries back so no tombstone is left.
+hash() is mixed by a Fibonacci multiplication first, as consecutive
+ints, hashed to themselves, would otherwise fill one long run of the
+table.
+Every slot is allocated up front, for the MAX_ITEMS of the cache.
+
+Two policies are available:
+  - "lru": the slots are linked in usage order by prev/next arrays
+  - "clock": the hand sweeps the slots themselves, a new key taking the
+    slot of the key it evicts.
+'''
+from array import array
+
+BaseCaching = __import__('base_caching').BaseCaching
+
+# 2 ** 64 divided by the golden ratio, odd: multiplying by it permutes
+# the 64-bit hashes and spreads consecutive ones over the table
+FIBONACCI = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+
+FREE = 0
+USED = 1
+REFERENCED = 2
+
+
+def mix(key):
+    ''' Return the hash of key mixed over 64 bits.
+    '''
+    return (hash(key) * FIBONACCI) & MASK64
+
+
+class CompactCache():
+    ''' CompactCache defines a caching system bounded in items, keeping
+    its entries in preallocated arrays.
+    It supports the core API of BaseCaching (get, put, delete, clear,
+    listeners and stats), without time to live or byte capacity.
+    '''
+
+    def __init__(self, max_items=BaseCaching.MAX_ITEMS, policy="lru"):
+        '''
+        Allocate max_items slots and a table of slot numbers twice as
+        large (rounded up to a power of two).
+        policy is "lru" or "clock".
+        '''
+        if policy not in ("lru", "clock"):
+            raise ValueError("unknown policy: {}".format(policy))
+        if max_items < 1:
+            raise ValueError("max_items must be at least 1")
+        self.MAX_ITEMS = max_items
+        self.policy = policy
+        bits = 3
+        while 1 << bits < 2 * max_items:
+            bits += 1
+        # The home position of a key is the top bits of its mixed hash
+        self.shift = 64 - bits
+        self.mask = (1 << bits) - 1
+        # Slot number of each table position, -1 when empty
+        self.table = array('i', [-1]) * (1 << bits)
+        self.keys = [None] * max_items
+        self.items = [None] * max_items
+        self.hashes = array('Q', [0]) * max_items
+        if policy == "lru":
+            # Slot max_items is the sentinel: next of it is the least
+            # recently used slot, prev of it the most recently used one
+            self.root = max_items
+            self.prev = array('i', [max_items]) * (max_items + 1)
+            self.next = array('i', [max_items]) * (max_items + 1)
+        else:
+            self.flags = bytearray(max_items)
+            self.hand = 0
+        # Slots never used yet start at high, released ones are in free
+        self.high = 0
+        self.free = array('i')
+        self.count = 0
+        self.listeners = []
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+        self.deletes = 0
+
+    def __len__(self):
+        ''' Return the number of cached items.
+        '''
+        return self.count
+
+    def __contains__(self, key):
+        ''' Tell whether key is cached, without using it.
+        '''
+        return key is not None and self._find(key, mix(key))[1] >= 0
+
+    def __iter__(self):
+        ''' Iterate over the cached keys, in slot order.
+        '''
+        return (key for key in self.keys[:self.high] if key is not None)
+
+    def _find(self, key, key_hash):
+        ''' Return the table position of key and its slot, or the
+        position where it would go and -1.
+        '''
+        table = self.table
+        hashes = self.hashes
+        keys = self.keys
+        mask = self.mask
+        position = key_hash >> self.shift
+        while True:
+            slot = table[position]
+            if slot < 0:
+                return position, -1
+            if hashes[slot] == key_hash and (keys[slot] is key or
+                                             keys[slot] == key):
+                return position, slot
+            position = (position + 1) & mask
+
+    def _position(self, slot):
+        ''' Return the table position of slot.
+        '''
+        table = self.table
+        mask = self.mask
+        position = self.hashes[slot] >> self.shift
+        while table[position] != slot:
+            position = (position + 1) & mask
+        return position
+
+    def _vacant(self, key_hash):
+        ''' Return the empty table position where a new key of hash
+        key_hash goes.
+        '''
+        table = self.table
+        mask = self.mask
+        position = key_hash >> self.shift
+        while table[position] >= 0:
+            position = (position + 1) & mask
+        return position
+
+    def _unindex(self, position):
+        ''' Empty the table position, shifting back the entries probed
+        past it so every key stays reachable from its home position.
+        '''
+        table = self.table
+        hashes = self.hashes
+        mask = self.mask
+        shift = self.shift
+        hole = position
+        while True:
+            position = (position + 1) & mask
+            slot = table[position]
+            if slot < 0:
+                break
+            home = hashes[slot] >> shift
+            # Leave the entry if its home lies between the hole and it
+            if hole < position:
+                stays = hole < home <= position
+            else:
+                stays = home > hole or home <= position
+            if not stays:
+                table[hole] = slot
+                hole = position
+        table[hole] = -1
+
+    def _link(self, slot):
+        ''' Link slot as the most recently used one.
+        '''
+        last = self.prev[self.root]
+        self.prev[slot] = last
+        self.next[slot] = self.root
+        self.next[last] = slot
+        self.prev[self.root] = slot
+
+    def _unlink(self, slot):
+        ''' Unlink slot from the usage order.
+        '''
+        before = self.prev[slot]
+        after = self.next[slot]
+        self.next[before] = after
+        self.prev[after] = before
+
+    def _victim(self):
+        ''' Return the slot the policy discards.
+        '''
+        if self.policy == "lru":
+            return self.next[self.root]
+        flags = self.flags
+        hand = self.hand
+        while flags[hand] != USED:
+            # Clear the bit of referenced slots, skip the free ones
+            if flags[hand]:
+                flags[hand] = USED
+            hand = (hand + 1) % self.MAX_ITEMS
+        self.hand = (hand + 1) % self.MAX_ITEMS
+        return hand
+
+    def _release(self, slot, position):
+        ''' Empty slot, found at position in the table, and return its
+        key and item.
+        '''
+        key = self.keys[slot]
+        item = self.items[slot]
+        self._unindex(position)
+        self.keys[slot] = None
+        self.items[slot] = None
+        if self.policy == "lru":
+            self._unlink(slot)
+        else:
+            self.flags[slot] = FREE
+        self.free.append(slot)
+        self.count -= 1
+        return key, item
+
+    def print_cache(self):
+        ''' Print the cache.
+        '''
+        cache_data = {key: self.items[slot]
+                      for slot, key in enumerate(self.keys[:self.high])
+                      if key is not None}
+        print("Current cache:")
+        for key in sorted(cache_data):
+            print("{}: {}".format(key, cache_data[key]))
+
+    def put(self, key, item):
+        ''' Add an item in the cache.
+        If key or item is None this method does nothing. If the cache is
+        full, the key chosen by the policy is discarded first.
+        '''
+        if key is None or item is None:
+            return
+        key_hash = mix(key)
+        position, slot = self._find(key, key_hash)
+        if slot >= 0:
+            self.items[slot] = item
+            if self.policy == "lru":
+                self._unlink(slot)
+                self._link(slot)
+            else:
+                self.flags[slot] = USED | REFERENCED
+            self.updates += 1
+            return
+        if self.count == self.MAX_ITEMS:
+            self.discard(self._victim())
+            # The shift of the table may have moved the free position
+            position = self._vacant(key_hash)
+        if self.free:
+            slot = self.free.pop()
+        else:
+            slot = self.high
+            self.high += 1
+        self.table[position] = slot
+        self.keys[slot] = key
+        self.items[slot] = item
+        self.hashes[slot] = key_hash
+        if self.policy == "lru":
+            self._link(slot)
+        else:
+            self.flags[slot] = USED
+        self.count += 1
+        self.inserts += 1
+
+    def get(self, key):
+        ''' Get an item by key.
+        If key is None or doesn't exist in the cache it returns None.
+        '''
+        if key is None:
+            return None
+        # _find and the move to the back of the usage order, inlined:
+        # this is the hot path
+        key_hash = (hash(key) * FIBONACCI) & MASK64
+        table = self.table
+        hashes = self.hashes
+        keys = self.keys
+        mask = self.mask
+        position = key_hash >> self.shift
+        while True:
+            slot = table[position]
+            if slot < 0:
+                self.misses += 1
+                return None
+            if hashes[slot] == key_hash and (keys[slot] is key or
+                                             keys[slot] == key):
+                break
+            position = (position + 1) & mask
+        if self.policy == "lru":
+            prev = self.prev
+            after = self.next[slot]
+            root = self.root
+            if after != root:
+                before = prev[slot]
+                links = self.next
+                links[before] = after
+                prev[after] = before
+                last = prev[root]
+                prev[slot] = last
+                links[slot] = root
+                links[last] = slot
+                prev[root] = slot
+        else:
+            self.flags[slot] = USED | REFERENCED
+        self.hits += 1
+        return self.items[slot]
+
+    def delete(self, key):
+        ''' Remove key from the cache, return whether it was cached.
+        '''
+        if key is None:
+            return False
+        position, slot = self._find(key, mix(key))
+        if slot < 0:
+            return False
+        key, item = self._release(slot, position)
+        self.deletes += 1
+        for listener in self.listeners:
+            listener(key, item, "deleted")
+        return True
+
+    def discard(self, slot):
+        ''' Remove the item of the slot evicted by the policy.
+        '''
+        key, item = self._release(slot, self._position(slot))
+        self.evictions += 1
+        for listener in self.listeners:
+            listener(key, item, "evicted")
+
+    def clear(self):
+        ''' Remove every item, without telling the listeners.
+        '''
+        self.table = array('i', [-1]) * len(self.table)
+        self.keys = [None] * self.MAX_ITEMS
+        self.items = [None] * self.MAX_ITEMS
+        if self.policy == "lru":
+            self.prev[self.root] = self.root
+            self.next[self.root] = self.root
+        else:
+            self.flags = bytearray(self.MAX_ITEMS)
+            self.hand = 0
+        self.high = 0
+        self.free = array('i')
+        self.count = 0
+
+    def add_listener(self, listener):
+        ''' Call listener(key, item, reason) for every item leaving the
+        cache, reason being "evicted" or "deleted".
+        '''
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        ''' Stop calling listener.
+        '''
+        self.listeners.remove(listener)
+
+    def stats(self):
+        ''' Return the counters of the cache.
+        '''
+        return {
+            "items": self.count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "deletes": self.deletes,
+        }
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+'''
+This module contains the Compressor class, which lets BaseCaching keep
+large str and bytes items compressed with zlib, and train, which builds
+a shared zlib dictionary from sample items.
+
+A dictionary primes the compressor with the strings the items have in
+common, such as the keys of a JSON document: small items, which give
+zlib too little to work with on their own, then compress as well as
+large ones.
+'''
+import sys
+import zlib
+from collections import Counter
+
+TEXT = 0
+BYTES = 1
+BYTEARRAY = 2
+
+
+class Compressed():
+    ''' Compressed holds an item compressed by a Compressor, with what
+    the cache knows about it.
+    '''
+    __slots__ = ('data', 'kind', 'dictionary', 'saved', 'hits')
+
+    def __init__(self, data, kind, dictionary=None):
+        ''' Initialize the compressed data of an item of kind (TEXT,
+        BYTES or BYTEARRAY), compressed with dictionary (its adler32).
+        '''
+        self.data = data
+        self.kind = kind
+        self.dictionary = dictionary
+        self.saved = 0
+        self.hits = 0
+
+    def __len__(self):
+        ''' Return the length of the compressed data.
+        '''
+        return len(self.data)
+
+    def __sizeof__(self):
+        ''' Return the size of the object and of its data in memory.
+        '''
+        return object.__sizeof__(self) + sys.getsizeof(self.data)
+
+    def __getstate__(self):
+        ''' Return the data to pickle, the hits excluded.
+        '''
+        return self.data, self.kind, self.dictionary, self.saved
+
+    def __setstate__(self, state):
+        ''' Restore the unpickled data.
+        '''
+        self.__init__(*state[:3])
+        self.saved = state[3]
+
+
+class Compressor():
+    ''' Compressor compresses the str and bytes items of at least
+    threshold bytes (characters for a str) that get smaller with zlib,
+    with the trained dictionary if there is one.
+    With promote, an item is stored uncompressed again after promote
+    hits, which spares decompressing the hottest items at the price of
+    the room they take.
+    '''
+
+    def __init__(self, threshold=1024, level=6, dictionary=None,
+                 promote=None):
+        ''' Initialize the compressor.
+        Raises ValueError for a level zlib does not know.
+        '''
+        if not -1 <= level <= 9:
+            raise ValueError("level must be between -1 and 9")
+        self.threshold = threshold
+        self.level = level
+        self.dictionary = dictionary
+        self.checksum = zlib.adler32(dictionary) if dictionary else None
+        self.promote = promote
+
+    def pack(self, item):
+        ''' Return item compressed, or item itself when it is not worth
+        compressing.
+        '''
+        kind = type(item)
+        if kind is str:
+            kind = TEXT
+        elif kind is bytes:
+            kind = BYTES
+        elif kind is bytearray:
+            kind = BYTEARRAY
+        else:
+            return item
+        if len(item) < self.threshold:
+            return item
+        raw = item.encode() if kind == TEXT else item
+        if self.dictionary is None:
+            data = zlib.compress(raw, self.level)
+        else:
+            compressor = zlib.compressobj(self.level,
+                                          zdict=self.dictionary)
+            data = compressor.compress(raw) + compressor.flush()
+        if len(data) >= len(raw):
+            return item
+        return Compressed(data, kind, self.checksum)
+
+    def unpack(self, compressed):
+        ''' Return the item compressed holds.
+        Raises ValueError if it was compressed with another dictionary.
+        '''
+        if compressed.dictionary is None:
+            raw = zlib.decompress(compressed.data)
+        elif compressed.dictionary == self.checksum:
+            decompressor = zlib.decompressobj(zdict=self.dictionary)
+            raw = decompressor.decompress(compressed.data)
+        else:
+            raise ValueError("item compressed with another dictionary")
+        if compressed.kind == TEXT:
+            return raw.decode()
+        if compressed.kind == BYTEARRAY:
+            return bytearray(raw)
+        return raw
+
+
+def train(samples, size=32768, length=8):
+    ''' Return a zlib dictionary of at most size bytes built from the
+    str or bytes samples: the runs of bytes found in several samples,
+    the most common last, where zlib reaches them best.
+    Every length bytes long substring of every sample is counted.
+    '''
+    counts = Counter()
+    for sample in samples:
+        if isinstance(sample, str):
+            sample = sample.encode()
+        counts.update({sample[start:start + length]
+                       for start in range(len(sample) - length + 1)})
+    pieces = []
+    # Every piece chosen so far, each after a zero byte: a substring
+    # found there is not added again
+    chosen = bytearray()
+    # Equal counts come in the order they were first met: consecutive
+    # substrings of a common run extend the same piece
+    for gram, count in counts.most_common():
+        if count < 2 or len(chosen) >= size:
+            break
+        if pieces and pieces[-1].endswith(gram[:-1]):
+            pieces[-1].append(gram[-1])
+            chosen.append(gram[-1])
+        elif gram not in chosen:
+            pieces.append(bytearray(gram))
+            chosen += b"\0" + gram
+    return b"".join(reversed(pieces))[-size:]
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+'''
+This module contains the ConcurrentCache class, a thread-safe cache
+made of independent shards. Each shard is a BaseCaching instance with
+its own policy and its own lock, and a key always goes to the same
+shard, so threads working on different shards never wait on each other.
+'''
+import threading
+BaseCaching = __import__('base_caching').BaseCaching
+Compressed = __import__('compression').Compressed
+LRUPolicy = __import__('policies').LRUPolicy
+
+
+class ConcurrentCache():
+    ''' ConcurrentCache defines a lock-striped caching system.
+    It keeps the put / get contract of BaseCaching; eviction is decided
+    per shard by the shard's policy.
+    '''
+    # Fewer items than this per shard leave its policy nothing to choose
+    MIN_SHARD_ITEMS = 8
+
+    def __init__(self, policy=LRUPolicy, shards=16, max_items=None,
+                 max_bytes=None, sizeof=None, ttl=None, sample=0,
+                 admission=None, compressor=None, negative_ttl=None,
+                 max_negative=None, max_item_bytes=None):
+        '''
+        Initialize shards caches, each one built with a new instance of
+        the policy class (or factory) and a slice of the capacity.
+        max_items and max_bytes are the capacity of the whole cache, split
+        so that the shards add up to it; without them every shard gets
+        BaseCaching.MAX_ITEMS items. There are fewer shards than asked
+        when each one would get less than MIN_SHARD_ITEMS items, or less
+        than max_item_bytes bytes: an item larger than the budget of its
+        shard is never cached, so max_item_bytes should be the size of
+        the largest items to cache.
+        Raises ValueError if max_item_bytes is larger than max_bytes.
+        ttl is the default time to live of the items and sample the
+        latency sampling rate of each shard. admission is the class (or
+        factory) of the admission filter of each shard, if any; the
+        shards share the compressor, if any. negative_ttl is the time
+        to live of the negative entries, max_negative their share of
+        the whole cache (see BaseCaching).
+        '''
+        if max_items is not None:
+            shards = max(1, min(shards, max_items // self.MIN_SHARD_ITEMS))
+        if max_bytes is not None:
+            if max_item_bytes is not None and max_item_bytes > max_bytes:
+                raise ValueError("max_item_bytes is larger than max_bytes")
+            shards = max(1, min(shards,
+                                max_bytes // (max_item_bytes or 1)))
+
+        def share(total, index):
+            ''' Return the part of total given to the shard index. '''
+            if total is None:
+                return None
+            return total // shards + (index < total % shards)
+
+        self.shards = [
+            BaseCaching(policy(), max_items=share(max_items, index),
+                        max_bytes=share(max_bytes, index), sizeof=sizeof,
+                        ttl=ttl, sample=sample,
+                        admission=admission() if admission else None,
+                        compressor=compressor, negative_ttl=negative_ttl,
+                        max_negative=share(max_negative, index))
+            for index in range(shards)
+        ]
+        self.locks = [threading.Lock() for _ in range(shards)]
+        self.compressor = compressor
+        self.negative_ttl = negative_ttl
+
+    def _index(self, key):
+        ''' Return the index of the shard owning key.
+        '''
+        return hash(key) % len(self.shards)
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item to the shard owning key.
+        '''
+        index = self._index(key)
+        with self.locks[index]:
+            self.shards[index].put(key, item, ttl, size, cost)
+
+    def get(self, key):
+        ''' Retrieve an item by key from the shard owning it.
+        If key is None or doesn't exist in the cache it returns None.
+        '''
+        index = self._index(key)
+        with self.locks[index]:
+            return self.shards[index].get(key)
+
+    def _group(self, keys):
+        ''' Return the keys sorted out by the index of their shard.
+        '''
+        groups = {}
+        shards = len(self.shards)
+        for key in keys:
+            index = hash(key) % shards
+            group = groups.get(index)
+            if group is None:
+                groups[index] = [key]
+            else:
+                group.append(key)
+        return groups
+
+    def get_many(self, keys):
+        ''' Retrieve the items of keys, taking each shard lock once.
+        Returns a dictionary of the keys found.
+        '''
+        found = {}
+        for index, group in self._group(keys).items():
+            with self.locks[index]:
+                found.update(self.shards[index].get_many(group))
+        return found
+
+    def put_many(self, items, ttl=None):
+        ''' Add the items of a dictionary (or of (key, item) pairs),
+        taking each shard lock once.
+        '''
+        groups = {}
+        shards = len(self.shards)
+        for key, item in dict(items).items():
+            index = hash(key) % shards
+            group = groups.get(index)
+            if group is None:
+                groups[index] = {key: item}
+            else:
+                group[key] = item
+        for index, group in groups.items():
+            with self.locks[index]:
+                self.shards[index].put_many(group, ttl)
+
+    def delete(self, key):
+        ''' Remove key from the shard owning it.
+        Returns whether it was cached.
+        '''
+        index = self._index(key)
+        with self.locks[index]:
+            return self.shards[index].delete(key)
+
+    def delete_many(self, keys):
+        ''' Remove keys, taking each shard lock once.
+        Returns how many were cached.
+        '''
+        deleted = 0
+        for index, group in self._group(keys).items():
+            with self.locks[index]:
+                deleted += self.shards[index].delete_many(group)
+        return deleted
+
+    def clear(self):
+        ''' Remove every item, one shard at a time.
+        '''
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.clear()
+
+    def get_or_load(self, key, loader, ttl=None):
+        ''' Retrieve an item by key, loading it with loader(key) on a
+        miss. Concurrent misses on the same key run loader once, outside
+        the lock of the shard, and every caller gets its item.
+        '''
+        index = self._index(key)
+        lock, shard = self.locks[index], self.shards[index]
+        with lock:
+            item = shard.get(key)
+        if item is None and key is not None:
+            def load():
+                ''' Run the loader, then cache its item. '''
+                item = loader(key)
+                with lock:
+                    return shard.loaded(key, item, ttl)
+            item = shard.flights.do(key, load)
+        return item
+
+    def reap(self):
+        ''' Remove the expired items of every shard, one at a time.
+        '''
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.reap()
+
+    def add_listener(self, listener):
+        ''' Call listener(key, item, reason) for every item leaving a
+        shard. It runs under the lock of the shard.
+        '''
+        for shard in self.shards:
+            shard.add_listener(listener)
+
+    def remove_listener(self, listener):
+        ''' Stop calling listener.
+        '''
+        for shard in self.shards:
+            shard.remove_listener(listener)
+
+    def stats(self):
+        ''' Return the counters of every shard added together.
+        '''
+        total = {}
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                counters = shard.stats()
+            for name, value in counters.items():
+                if isinstance(value, list):
+                    # Latency histograms add up bucket by bucket
+                    value = [a + b for a, b in
+                             zip(total.get(name, [0] * len(value)), value)]
+                else:
+                    value += total.get(name, 0)
+                total[name] = value
+        return total
+
+    def __len__(self):
+        ''' Return the number of cached items.
+        '''
+        return sum(len(shard.cache_data) for shard in self.shards)
+
+    @property
+    def cache_data(self):
+        ''' Return a copy of every cached key and item, decompressed.
+        Each shard is copied under its lock; the copy as a whole is not
+        an atomic snapshot of the cache.
+        '''
+        data = {}
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                shard.thaw()
+                data.update(shard.cache_data)
+        for key, item in data.items():
+            if type(item) is Compressed:
+                data[key] = self.compressor.unpack(item)
+        return data
+
+    def print_cache(self):
+        ''' Print the cache
+        '''
+        data = self.cache_data
+        print("Current cache:")
+        for key in sorted(data.keys()):
+            print("{}: {}".format(key, data.get(key)))
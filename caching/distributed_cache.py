@@ -0,0 +1,503 @@
+#!/usr/bin/env python3
+'''
+This module contains the DistributedCache class, which spreads one
+logical cache over several cache nodes with a consistent hash ring, and
+the CacheServer and RemoteNode classes, which serve a cache on a local
+socket and talk to it.
+
+A node is a cache living in this process that offers get, put, delete,
+their batches, clear, stats and cache_data (BaseCaching and its
+subclasses, ConcurrentCache, ReadMostlyCache), or a RemoteNode for such
+a cache served by another process. Adding or removing a node moves only
+the keys whose owner changes, about 1/n of them.
+
+Messages are pickled: a CacheServer runs whatever its clients send it
+unpickled, so it listens on the loopback interface and must only be
+reachable by trusted processes.
+
+Usage: ./distributed_cache.py [PORT] [MAX_ITEMS]
+serves an LRU cache of MAX_ITEMS items on 127.0.0.1:PORT.
+'''
+import pickle
+import socket
+import socketserver
+import struct
+import sys
+import threading
+BaseCaching = __import__('base_caching').BaseCaching
+HashRing = __import__('hash_ring').HashRing
+LRUPolicy = __import__('policies').LRUPolicy
+
+# Every message is its length, then the pickled (operation, arguments)
+# of a request or (ok, result or exception) of a response
+LENGTH = struct.Struct("!I")
+
+# The methods of the cache served that clients may call
+METHODS = {"get", "put", "delete", "get_many", "put_many", "delete_many",
+           "clear", "stats"}
+
+
+def pack_message(message):
+    ''' Return message pickled behind its length.
+    '''
+    data = pickle.dumps(message, pickle.HIGHEST_PROTOCOL)
+    return LENGTH.pack(len(data)) + data
+
+
+def read_message(stream):
+    ''' Read and unpickle one message from the binary file stream.
+    Raises EOFError if the connection was closed.
+    '''
+    header = stream.read(LENGTH.size)
+    if len(header) < LENGTH.size:
+        raise EOFError("connection closed")
+    length, = LENGTH.unpack(header)
+    data = stream.read(length)
+    if len(data) < length:
+        raise EOFError("connection closed")
+    return pickle.loads(data)
+
+
+class CacheHandler(socketserver.StreamRequestHandler):
+    ''' CacheHandler answers the requests of one connection.
+    '''
+
+    def setup(self):
+        ''' Send the small responses without waiting (no Nagle).
+        '''
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY,
+                                   1)
+        with self.server.lock:
+            self.server.connections.add(self.connection)
+
+    def finish(self):
+        ''' Forget the connection.
+        '''
+        with self.server.lock:
+            self.server.connections.discard(self.connection)
+        super().finish()
+
+    def handle(self):
+        ''' Run every request until the client disconnects.
+        '''
+        while True:
+            try:
+                operation, args = read_message(self.rfile)
+            except (EOFError, OSError):
+                return
+            try:
+                response = True, self.server.call(operation, args)
+            except Exception as error:
+                response = False, error
+            self.wfile.write(pack_message(response))
+
+
+class CacheServer(socketserver.ThreadingTCPServer):
+    ''' CacheServer serves cache, one thread per connection, and runs
+    one request at a time on it.
+    '''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, cache=None, address=("127.0.0.1", 0)):
+        ''' Listen on address (a free port by default) for the requests
+        of the clients of cache, a new LRU BaseCaching if None.
+        '''
+        super().__init__(address, CacheHandler)
+        self.cache = BaseCaching(LRUPolicy()) if cache is None else cache
+        self.lock = threading.Lock()
+        self.connections = set()
+        self.thread = None
+
+    @property
+    def address(self):
+        ''' Return the (host, port) the server listens on.
+        '''
+        return self.server_address[:2]
+
+    def call(self, operation, args):
+        ''' Run the requested operation on the cache.
+        Raises ValueError for an operation clients may not call.
+        '''
+        with self.lock:
+            if operation == "keys":
+                return list(self.cache.cache_data)
+            if operation == "len":
+                return len(self.cache.cache_data)
+            if operation not in METHODS:
+                raise ValueError("unknown operation {!r}".format(operation))
+            return getattr(self.cache, operation)(*args)
+
+    def start(self):
+        ''' Serve in a daemon thread and return the server.
+        '''
+        # Polled every 0.1s for shutdown, instead of every 0.5s
+        self.thread = threading.Thread(target=self.serve_forever,
+                                       args=(0.1,), daemon=True)
+        self.thread.start()
+        return self
+
+    def close(self):
+        ''' Stop serving, close the listening socket and cut the
+        connections of the clients.
+        '''
+        if self.thread is not None:
+            self.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server_close()
+        with self.lock:
+            for connection in self.connections:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+
+class RemoteNode():
+    ''' RemoteNode is the client of a CacheServer, with the get / put
+    contract of the caches. It keeps one connection, shared by threads
+    one request at a time, and opens it again after an error.
+    '''
+
+    def __init__(self, address, timeout=5):
+        ''' Initialize the client of the server listening on address.
+        '''
+        self.address = tuple(address)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sock = None
+        self.stream = None
+
+    def _call(self, operation, *args):
+        ''' Send a request and return its result.
+        Raises the exception the server raised, or OSError (EOFError
+        included) if the server cannot be reached.
+        '''
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection(self.address,
+                                                         self.timeout)
+                    self.sock.setsockopt(socket.IPPROTO_TCP,
+                                         socket.TCP_NODELAY, 1)
+                    self.stream = self.sock.makefile("rb")
+                self.sock.sendall(pack_message((operation, args)))
+                ok, result = read_message(self.stream)
+            except (EOFError, OSError) as error:
+                self.close()
+                if isinstance(error, EOFError):
+                    raise ConnectionError(str(error)) from error
+                raise
+        if not ok:
+            raise result
+        return result
+
+    def get(self, key):
+        ''' Retrieve an item by key, None if it is not cached.
+        '''
+        return self._call("get", key)
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item.
+        '''
+        self._call("put", key, item, ttl, size, cost)
+
+    def delete(self, key):
+        ''' Remove key. Returns whether it was cached.
+        '''
+        return self._call("delete", key)
+
+    def get_many(self, keys):
+        ''' Retrieve the items of keys in one request.
+        Returns a dictionary of the keys found.
+        '''
+        return self._call("get_many", list(keys))
+
+    def put_many(self, items, ttl=None):
+        ''' Add the items of a dictionary (or of (key, item) pairs) in
+        one request.
+        '''
+        self._call("put_many", dict(items), ttl)
+
+    def delete_many(self, keys):
+        ''' Remove keys in one request. Returns how many were cached.
+        '''
+        return self._call("delete_many", list(keys))
+
+    def clear(self):
+        ''' Remove every item.
+        '''
+        self._call("clear")
+
+    def stats(self):
+        ''' Return the counters of the cache served.
+        '''
+        return self._call("stats")
+
+    def keys(self):
+        ''' Return the keys cached, expired ones included.
+        '''
+        return self._call("keys")
+
+    def __len__(self):
+        ''' Return the number of cached items.
+        '''
+        return self._call("len")
+
+    def close(self):
+        ''' Close the connection; the next request opens a new one.
+        '''
+        if self.sock is not None:
+            self.stream.close()
+            self.sock.close()
+            self.sock = self.stream = None
+
+
+def node_keys(node):
+    ''' Return the keys cached by node, expired ones included.
+    '''
+    if isinstance(node, RemoteNode):
+        return node.keys()
+    return list(node.cache_data)
+
+
+def node_size(node):
+    ''' Return the number of items cached by node.
+    '''
+    if isinstance(node, RemoteNode):
+        return len(node)
+    return len(node.cache_data)
+
+
+class DistributedCache():
+    ''' DistributedCache defines one caching system made of named nodes.
+    Each key lives on the node the hash ring gives it; eviction is
+    decided per node by the node's own policy, and the capacity is the
+    sum of the capacities of the nodes.
+    A node that cannot be reached behaves as an empty one: gets miss
+    and puts are dropped, and stats()["errors"] counts them.
+    '''
+
+    def __init__(self, nodes=None, replicas=160):
+        ''' Initialize the cache with the nodes of a name -> node
+        dictionary, each with replicas virtual nodes.
+        '''
+        self.ring = HashRing(replicas)
+        self.nodes = {}
+        self.errors = 0
+        self.moved = 0
+        for name, node in (nodes or {}).items():
+            self.nodes[name] = node
+            self.ring.add(name)
+
+    def node(self, key):
+        ''' Return the name of the node owning key.
+        '''
+        return self.ring.node(key)
+
+    def _group(self, keys):
+        ''' Return the keys sorted out by the name of their node.
+        '''
+        groups = {}
+        for key in keys:
+            groups.setdefault(self.ring.node(key), []).append(key)
+        return groups
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item to the node owning key.
+        ttl, size and cost are only passed on when they are given, for
+        the nodes that do not take them all.
+        '''
+        if key is None or item is None:
+            return
+        given = {name: value for name, value in
+                 (("ttl", ttl), ("size", size), ("cost", cost))
+                 if value is not None}
+        try:
+            self.nodes[self.ring.node(key)].put(key, item, **given)
+        except OSError:
+            self.errors += 1
+
+    def get(self, key):
+        ''' Retrieve an item by key from the node owning it.
+        If key is None or doesn't exist in the cache it returns None.
+        '''
+        if key is None:
+            return None
+        try:
+            return self.nodes[self.ring.node(key)].get(key)
+        except OSError:
+            self.errors += 1
+            return None
+
+    def get_many(self, keys):
+        ''' Retrieve the items of keys, one call per node.
+        Returns a dictionary of the keys found.
+        '''
+        found = {}
+        for name, group in self._group(
+                key for key in keys if key is not None).items():
+            try:
+                found.update(self.nodes[name].get_many(group))
+            except OSError:
+                self.errors += 1
+        return found
+
+    def put_many(self, items, ttl=None):
+        ''' Add the items of a dictionary (or of (key, item) pairs), one
+        call per node.
+        '''
+        items = dict(items)
+        for name, group in self._group(
+                key for key in items if key is not None).items():
+            try:
+                self.nodes[name].put_many(
+                    {key: items[key] for key in group}, ttl)
+            except OSError:
+                self.errors += 1
+
+    def delete(self, key):
+        ''' Remove key from the node owning it.
+        Returns whether it was cached.
+        '''
+        try:
+            return self.nodes[self.ring.node(key)].delete(key)
+        except OSError:
+            self.errors += 1
+            return False
+
+    def delete_many(self, keys):
+        ''' Remove keys, one call per node. Returns how many were cached.
+        '''
+        deleted = 0
+        for name, group in self._group(keys).items():
+            try:
+                deleted += self.nodes[name].delete_many(group)
+            except OSError:
+                self.errors += 1
+        return deleted
+
+    def clear(self):
+        ''' Remove every item of every node.
+        '''
+        for node in self.nodes.values():
+            node.clear()
+
+    def add_node(self, name, node, weight=1, rebalance=True):
+        ''' Add node under name, with weight times the virtual nodes of
+        the others. With rebalance, the items of the keys it now owns
+        are moved to it from their former nodes (with the default time
+        to live of node: the one they had left is not kept); the items
+        of a node that cannot be reached are left behind.
+        Returns the number of items moved.
+        Raises ValueError if name is already taken.
+        '''
+        if name in self.nodes:
+            raise ValueError("node {!r} already exists".format(name))
+        self.nodes[name] = node
+        self.ring.add(name, weight)
+        if not rebalance:
+            return 0
+        moved = 0
+        for other, former in self.nodes.items():
+            if other == name:
+                continue
+            try:
+                keys = [key for key in node_keys(former)
+                        if self.ring.node(key) == name]
+                moved += self._move(former, keys)
+            except OSError:
+                self.errors += 1
+        return moved
+
+    def remove_node(self, name, rebalance=True):
+        ''' Remove the node called name and return it. With rebalance,
+        its items are then moved to the nodes now owning their keys,
+        unless it cannot be reached.
+        Returns the node and the number of items moved.
+        Raises KeyError if there is no such node.
+        '''
+        node = self.nodes.pop(name)
+        self.ring.remove(name)
+        moved = 0
+        if rebalance and self.nodes:
+            try:
+                moved = self._move(node, node_keys(node))
+            except OSError:
+                self.errors += 1
+        return node, moved
+
+    def _move(self, former, keys):
+        ''' Move the items of keys from the node former to their owners.
+        Returns the number of items moved.
+        '''
+        if not keys:
+            return 0
+        items = former.get_many(keys)
+        self.put_many(items)
+        former.delete_many(keys)
+        self.moved += len(items)
+        return len(items)
+
+    def stats(self):
+        ''' Return the counters of every node added together, with the
+        number of items of every node, the unreachable node errors and
+        the items moved by rebalancing.
+        '''
+        total = {}
+        sizes = {}
+        for name, node in self.nodes.items():
+            try:
+                counters = node.stats()
+                sizes[name] = node_size(node)
+            except OSError:
+                self.errors += 1
+                continue
+            for counter, value in counters.items():
+                if isinstance(value, list):
+                    # Latency histograms add up bucket by bucket
+                    value = [a + b for a, b in
+                             zip(total.get(counter, [0] * len(value)),
+                                 value)]
+                elif not isinstance(value, (int, float)):
+                    continue
+                else:
+                    value += total.get(counter, 0)
+                total[counter] = value
+        total["nodes"] = sizes
+        total["errors"] = self.errors
+        total["moved"] = self.moved
+        return total
+
+    def __len__(self):
+        ''' Return the number of cached items.
+        '''
+        size = 0
+        for node in self.nodes.values():
+            try:
+                size += node_size(node)
+            except OSError:
+                self.errors += 1
+        return size
+
+
+def main():
+    ''' Serve an LRU cache on the port of the command line.
+    '''
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 11311
+    max_items = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    server = CacheServer(BaseCaching(LRUPolicy(), max_items=max_items),
+                         ("127.0.0.1", port))
+    print("Serving {} items on {}:{}".format(max_items, *server.address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
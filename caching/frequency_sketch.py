@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+This module contains the CountMinSketch class, a compact and
+approximate counter of how often keys were seen. It is what lets the
+TinyLFU based policies compare the popularity of two keys without
+remembering every key they have ever met, and the Doorkeeper, a Bloom
+filter that keeps the keys seen only once out of the sketch.
+'''
+
+MASK64 = (1 << 64) - 1
+MASK32 = (1 << 32) - 1
+GOLDEN = 0x9E3779B97F4A7C15
+HALVE = bytes(i >> 1 for i in range(256))
+
+
+class CountMinSketch():
+    ''' CountMinSketch keeps four rows of 4-bit saturating counters.
+    A key bumps one counter per row and its estimate is the smallest
+    of them. Once sample_size increments were made every counter is
+    halved, so old popularity fades away (aging).
+    '''
+    MAX_COUNT = 15
+    # Counters per row for each key the sketch is sized for: a row as
+    # wide as the keys would make a cold key share its counter with a
+    # hot one in every row too often
+    SPREAD = 4
+
+    def __init__(self, capacity, aging=True):
+        ''' Size the sketch for about capacity distinct keys (at least
+        16, rounded up to a power of two).
+        Without aging, the counters are only halved by reset().
+        '''
+        size = 16
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self.width = self.SPREAD * size
+        self.mask = self.width - 1
+        self.table = bytearray(4 * self.width)
+        self.sample_size = 10 * size
+        self.aging = aging
+        self.additions = 0
+
+    def _indexes(self, key):
+        ''' Return the position of key's counter in every row.
+        The rows are addressed by double hashing of one mixed hash.
+        '''
+        h = ((hash(key) & MASK64) * GOLDEN) & MASK64
+        h1 = h >> 32
+        h2 = (h & MASK32) | 1
+        mask = self.mask
+        width = self.width
+        return (h1 & mask,
+                width + ((h1 + h2) & mask),
+                2 * width + ((h1 + 2 * h2) & mask),
+                3 * width + ((h1 + 3 * h2) & mask))
+
+    def increment(self, key):
+        ''' Count one more occurrence of key.
+        '''
+        table = self.table
+        for index in self._indexes(key):
+            if table[index] < self.MAX_COUNT:
+                table[index] += 1
+        self.additions += 1
+        if self.aging and self.additions >= self.sample_size:
+            self.reset()
+
+    def frequency(self, key):
+        ''' Return the estimated number of occurrences of key.
+        '''
+        table = self.table
+        a, b, c, d = self._indexes(key)
+        return min(table[a], table[b], table[c], table[d])
+
+    def reset(self):
+        ''' Halve every counter (aging).
+        '''
+        self.table = bytearray(self.table.translate(HALVE))
+        self.additions //= 2
+
+    def clear(self):
+        ''' Forget every occurrence.
+        '''
+        self.table = bytearray(len(self.table))
+        self.additions = 0
+
+
+class Doorkeeper():
+    ''' Doorkeeper is a Bloom filter of the keys seen since it was last
+    cleared, three bits per key. It may wrongly claim a key was seen,
+    never the other way round.
+    '''
+
+    def __init__(self, bits):
+        ''' Allocate at least bits bits (a power of two).
+        '''
+        size = 64
+        while size < bits:
+            size <<= 1
+        self.mask = size - 1
+        self.table = bytearray(size >> 3)
+
+    def _indexes(self, key):
+        ''' Return the bits of key, by double hashing of one mixed hash.
+        '''
+        h = ((hash(key) & MASK64) * GOLDEN) & MASK64
+        h1 = h >> 32
+        h2 = (h & MASK32) | 1
+        mask = self.mask
+        return h1 & mask, (h1 + h2) & mask, (h1 + 2 * h2) & mask
+
+    def __contains__(self, key):
+        ''' Tell whether key was (probably) seen.
+        '''
+        table = self.table
+        a, b, c = self._indexes(key)
+        return bool(table[a >> 3] & (1 << (a & 7)) and
+                    table[b >> 3] & (1 << (b & 7)) and
+                    table[c >> 3] & (1 << (c & 7)))
+
+    def add(self, key):
+        ''' Remember key, return whether it was (probably) seen before.
+        '''
+        table = self.table
+        seen = True
+        for index in self._indexes(key):
+            bit = 1 << (index & 7)
+            if not table[index >> 3] & bit:
+                table[index >> 3] |= bit
+                seen = False
+        return seen
+
+    def clear(self):
+        ''' Forget every key.
+        '''
+        self.table = bytearray(len(self.table))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+'''
+This module contains a consistent hash ring, used by DistributedCache
+to tell which node owns a key.
+
+Every node is hashed to many points of a 64-bit circle (its virtual
+nodes) and a key belongs to the node of the first point at or after
+its own hash. Adding or removing one node of n only moves the keys of
+the arcs it gains or loses, about 1/n of them, and the virtual nodes
+spread both its load and the keys it gives up over all the others.
+'''
+import bisect
+import hashlib
+
+
+def stable_hash(key):
+    ''' Return a 64-bit hash of key, the same in every process (unlike
+    hash(), which is salted per process for str and bytes).
+    Keys other than str and bytes are hashed through their repr.
+    '''
+    if isinstance(key, str):
+        data = key.encode()
+    elif isinstance(key, bytes):
+        data = key
+    else:
+        data = repr(key).encode()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(),
+                          "big")
+
+
+class HashRing():
+    ''' HashRing maps keys to nodes with replicas virtual nodes for a
+    node of weight 1.
+    '''
+
+    def __init__(self, replicas=160):
+        ''' Initialize an empty ring.
+        '''
+        self.replicas = replicas
+        self.weights = {}
+        # The sorted points of the circle and the node of each of them
+        self.points = []
+        self.owners = []
+
+    def __len__(self):
+        ''' Return the number of nodes.
+        '''
+        return len(self.weights)
+
+    def __contains__(self, node):
+        ''' Return True if node is on the ring.
+        '''
+        return node in self.weights
+
+    def __iter__(self):
+        ''' Iterate over the nodes in the order they were added.
+        '''
+        return iter(self.weights)
+
+    def add(self, node, weight=1):
+        ''' Add node (a str) with weight times the virtual nodes of a
+        node of weight 1, or change its weight if it is on the ring.
+        '''
+        self.weights[node] = weight
+        self._build()
+
+    def remove(self, node):
+        ''' Remove node from the ring.
+        Raises KeyError if it is not on the ring.
+        '''
+        del self.weights[node]
+        self._build()
+
+    def _build(self):
+        ''' Place the virtual nodes of every node on the circle.
+        A point two nodes share goes to the first one in sort order.
+        '''
+        points = {}
+        for node, weight in self.weights.items():
+            for replica in range(round(self.replicas * weight)):
+                point = stable_hash("{}#{}".format(node, replica))
+                if point not in points or node < points[point]:
+                    points[point] = node
+        self.points = sorted(points)
+        self.owners = [points[point] for point in self.points]
+
+    def node(self, key):
+        ''' Return the node owning key.
+        Raises LookupError if the ring is empty.
+        '''
+        if not self.points:
+            raise LookupError("no node on the ring")
+        index = bisect.bisect_left(self.points, stable_hash(key))
+        return self.owners[index if index < len(self.points) else 0]
+
+    def shares(self):
+        ''' Return the share of the circle owned by every node.
+        '''
+        shares = dict.fromkeys(self.weights, 0)
+        previous = self.points[-1] - 2 ** 64 if self.points else 0
+        for point, owner in zip(self.points, self.owners):
+            shares[owner] += (point - previous) / 2 ** 64
+            previous = point
+        return shares
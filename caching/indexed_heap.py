@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+This module contains an indexed binary min-heap used by the caching
+systems to keep keys ordered by a priority that changes over time.
+The heap knows the position of every key, so a key can be reprioritized
+or removed in O(log n) without searching the heap for it.
+'''
+
+
+class IndexedHeap():
+    ''' IndexedHeap keeps keys in a binary min-heap of their priority.
+    Keys of equal priority come out in the order they were last
+    pushed or reprioritized.
+    '''
+
+    def __init__(self):
+        ''' Initialize an empty heap.
+        '''
+        # Every entry is [priority, sequence number, key]: sequence
+        # numbers are unique, so entries compare without reaching keys
+        self.heap = []
+        self.positions = {}
+        self.counter = 0
+
+    def __len__(self):
+        ''' Return the number of keys in the heap.
+        '''
+        return len(self.heap)
+
+    def __contains__(self, key):
+        ''' Return True if key is in the heap.
+        '''
+        return key in self.positions
+
+    def __iter__(self):
+        ''' Iterate over the keys from the lowest priority up.
+        This sorts the heap: O(n log n).
+        '''
+        return (entry[2] for entry in sorted(self.heap))
+
+    def priority(self, key):
+        ''' Return the priority of key.
+        '''
+        return self.heap[self.positions[key]][0]
+
+    def push(self, key, priority):
+        ''' Add key with priority, or reprioritize it if it is there.
+        '''
+        self.counter += 1
+        position = self.positions.get(key)
+        if position is not None:
+            entry = self.heap[position]
+            lower = priority < entry[0]
+            entry[0] = priority
+            entry[1] = self.counter
+            if lower:
+                self._up(position)
+            else:
+                self._down(position)
+            return
+        self.heap.append([priority, self.counter, key])
+        self.positions[key] = len(self.heap) - 1
+        self._up(len(self.heap) - 1)
+
+    def peek(self):
+        ''' Return the key of lowest priority and its priority.
+        Raises IndexError if the heap is empty.
+        '''
+        if not self.heap:
+            raise IndexError("peek at an empty heap")
+        priority, _, key = self.heap[0]
+        return key, priority
+
+    def pop(self):
+        ''' Remove and return the key of lowest priority and its
+        priority. Raises IndexError if the heap is empty.
+        '''
+        key, priority = self.peek()
+        self.remove(key)
+        return key, priority
+
+    def remove(self, key):
+        ''' Remove key from the heap.
+        '''
+        position = self.positions.pop(key)
+        last = self.heap.pop()
+        if position == len(self.heap):
+            return
+        self.heap[position] = last
+        self.positions[last[2]] = position
+        if position and last < self.heap[(position - 1) >> 1]:
+            self._up(position)
+        else:
+            self._down(position)
+
+    def clear(self):
+        ''' Remove every key.
+        '''
+        self.heap.clear()
+        self.positions.clear()
+
+    def _up(self, position):
+        ''' Move the entry at position up to its place.
+        '''
+        heap = self.heap
+        positions = self.positions
+        entry = heap[position]
+        while position:
+            parent = (position - 1) >> 1
+            if heap[parent] < entry:
+                break
+            heap[position] = heap[parent]
+            positions[heap[position][2]] = position
+            position = parent
+        heap[position] = entry
+        positions[entry[2]] = position
+
+    def _down(self, position):
+        ''' Move the entry at position down to its place.
+        '''
+        heap = self.heap
+        positions = self.positions
+        size = len(heap)
+        entry = heap[position]
+        while True:
+            child = 2 * position + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if entry < heap[child]:
+                break
+            heap[position] = heap[child]
+            positions[heap[position][2]] = position
+            position = child
+        heap[position] = entry
+        positions[entry[2]] = position
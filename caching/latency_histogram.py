@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+This module contains the LatencyHistogram class, used by BaseCaching to
+time a sample of its calls.
+Durations are counted in power of two buckets of nanoseconds, so
+recording one is a few integer operations and the histograms of several
+caches are merged by adding their counts.
+'''
+import time
+
+
+class LatencyHistogram():
+    ''' LatencyHistogram counts the duration of one call out of every.
+    Bucket n counts the durations below 2 ** n nanoseconds that did not
+    fit in bucket n - 1.
+    '''
+    BUCKETS = 48
+
+    def __init__(self, every=100):
+        ''' Initialize empty counts, sampling one call out of every.
+        '''
+        self.every = every
+        self.countdown = every
+        self.counts = [0] * self.BUCKETS
+
+    def record(self, ns):
+        ''' Count a duration of ns nanoseconds.
+        '''
+        self.counts[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+
+    def timed(self, method):
+        ''' Return method wrapped so that a sample of its calls is timed.
+        '''
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            ''' Call method, timing it once every self.every calls. '''
+            self.countdown -= 1
+            if self.countdown:
+                return method(*args, **kwargs)
+            self.countdown = self.every
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(clock() - start)
+        return wrapper
+
+
+def percentile(counts, fraction):
+    ''' Return the upper bound in nanoseconds of the bucket holding the
+    given fraction of the durations counted in counts, or None.
+    '''
+    total = sum(counts)
+    if not total:
+        return None
+    seen = 0
+    for bucket, count in enumerate(counts):
+        seen += count
+        if seen >= fraction * total:
+            return 2 ** bucket
+    return 2 ** (len(counts) - 1)
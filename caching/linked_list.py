@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+This module contains a minimal intrusive doubly linked list used by
+the caching systems to keep keys ordered (by recency, insertion, ...).
+Every operation is O(1): nodes know their neighbours, so a node can be
+unlinked or moved without searching the list for it.
+'''
+
+
+class Node():
+    ''' Node is a single link of a DoublyLinkedList.
+    It only carries the cache key, the value stays in cache_data.
+    '''
+    __slots__ = ('key', 'prev', 'next')
+
+    def __init__(self, key=None):
+        ''' Initialize an unlinked node holding key.
+        '''
+        self.key = key
+        self.prev = None
+        self.next = None
+
+
+class DoublyLinkedList():
+    ''' DoublyLinkedList keeps nodes between a sentinel head and tail.
+    The node right after the head is the oldest one (front) and the
+    node right before the tail is the newest one (back).
+    '''
+
+    def __init__(self):
+        ''' Initialize an empty list made only of its sentinel.
+        '''
+        self.root = Node()
+        self.root.prev = self.root
+        self.root.next = self.root
+        self.size = 0
+
+    def __len__(self):
+        ''' Return the number of nodes in the list.
+        '''
+        return self.size
+
+    def __iter__(self):
+        ''' Iterate over the keys from the front to the back.
+        '''
+        node = self.root.next
+        while node is not self.root:
+            yield node.key
+            node = node.next
+
+    def __reversed__(self):
+        ''' Iterate over the keys from the back to the front.
+        '''
+        node = self.root.prev
+        while node is not self.root:
+            yield node.key
+            node = node.prev
+
+    def append(self, node):
+        ''' Link node at the back of the list and return it.
+        '''
+        last = self.root.prev
+        node.prev = last
+        node.next = self.root
+        last.next = node
+        self.root.prev = node
+        self.size += 1
+        return node
+
+    def appendleft(self, node):
+        ''' Link node at the front of the list and return it.
+        '''
+        first = self.root.next
+        node.prev = self.root
+        node.next = first
+        first.prev = node
+        self.root.next = node
+        self.size += 1
+        return node
+
+    def remove(self, node):
+        ''' Unlink node from the list and return it.
+        '''
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        node.prev = None
+        node.next = None
+        self.size -= 1
+        return node
+
+    def move_to_end(self, node):
+        ''' Move an already linked node to the back of the list.
+        '''
+        if node is self.root.prev:
+            return
+        node.prev.next = node.next
+        node.next.prev = node.prev
+        last = self.root.prev
+        node.prev = last
+        node.next = self.root
+        last.next = node
+        self.root.prev = node
+
+    def first(self):
+        ''' Return the front node, or None if the list is empty.
+        '''
+        node = self.root.next
+        return None if node is self.root else node
+
+    def last(self):
+        ''' Return the back node, or None if the list is empty.
+        '''
+        node = self.root.prev
+        return None if node is self.root else node
+
+    def popleft(self):
+        ''' Unlink and return the front node.
+        Raises IndexError if the list is empty.
+        '''
+        if self.size == 0:
+            raise IndexError("pop from an empty list")
+        return self.remove(self.root.next)
+
+    def pop(self):
+        ''' Unlink and return the back node.
+        Raises IndexError if the list is empty.
+        '''
+        if self.size == 0:
+            raise IndexError("pop from an empty list")
+        return self.remove(self.root.prev)
+
+    def clear(self):
+        ''' Drop every node from the list.
+        '''
+        self.root.prev = self.root
+        self.root.next = self.root
+        self.size = 0
@@ -0,0 +1,429 @@
+#!/usr/bin/env python3
+'''
+This module contains the PartitionedCache class, a cache shared by
+several namespaces (tenants) so that a noisy one cannot flush the hot
+set of the others.
+
+Every namespace has its own eviction policy, a guaranteed minimum and
+an optional maximum, in items or in bytes like the cache. Capacity a
+namespace leaves idle is borrowed by the others; when the cache is
+full a new item takes the room of:
+  - a key of its own namespace, if that one reached its maximum
+  - otherwise a key of a borrower, a namespace holding more than its
+    minimum, taken in turn so every borrower gives some room back.
+A namespace under its minimum therefore always gets its share back.
+The borrowers are kept in insertion order in an OrderedDict, so the
+choice of the victim is O(1) whatever the number of namespaces.
+'''
+from collections import OrderedDict
+BaseCaching = __import__('base_caching').BaseCaching
+policies = __import__('policies')
+
+
+class Partition():
+    ''' Partition holds the policy, the bounds and the counters of a
+    namespace.
+    '''
+
+    def __init__(self, policy, minimum=0, maximum=None):
+        ''' Initialize an empty partition.
+        '''
+        self.policy = policy
+        self.minimum = minimum
+        self.maximum = maximum
+        self.used = 0
+        self.sizes = {}
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+
+    def stats(self):
+        ''' Return the counters of the namespace.
+        '''
+        return {
+            "items": len(self.policy),
+            "used": self.used,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+        }
+
+
+class PartitionedPolicy(policies.EvictionPolicy):
+    ''' PartitionedPolicy tracks the (namespace, key) keys of a
+    PartitionedCache, each in the policy of its namespace, and picks
+    the partition giving up the victim.
+    With sizes, the size dictionary of a byte bounded cache, the
+    partitions count bytes instead of items.
+    '''
+
+    def __init__(self, policy=policies.LRUPolicy, sizes=None):
+        ''' Initialize the policy with no namespace.
+        policy is the class (or factory) of the policy of every
+        namespace.
+        '''
+        super().__init__()
+        self.factory = policy
+        self.sizes = sizes
+        self.partitions = {}
+        self.borrowers = OrderedDict()
+        self.pending = {}
+        self.weighted = (sizes is not None or
+                         getattr(policy, "weighted", False))
+
+    def __len__(self):
+        ''' Return the number of keys of every namespace.
+        '''
+        return sum(len(partition.policy)
+                   for partition in self.partitions.values())
+
+    def __contains__(self, key):
+        ''' Return True if key is tracked in its namespace.
+        '''
+        partition = self.partitions.get(key[0])
+        return partition is not None and key in partition.policy
+
+    def __iter__(self):
+        ''' Iterate over the keys, one namespace after the other.
+        '''
+        for partition in self.partitions.values():
+            yield from partition.policy
+
+    def add(self, name, minimum=0, maximum=None, capacity=None):
+        ''' Add the namespace name, with a policy sized for capacity
+        items.
+        '''
+        self.partitions[name] = Partition(self.factory(capacity),
+                                          minimum, maximum)
+
+    def partition(self, key):
+        ''' Return the partition of the namespace of key.
+        Raises KeyError for an unknown namespace.
+        '''
+        partition = self.partitions.get(key[0])
+        if partition is None:
+            raise KeyError("unknown namespace: {}".format(key[0]))
+        return partition
+
+    def _charge(self, name, partition, amount):
+        ''' Add amount to what partition uses and update the borrowers.
+        '''
+        partition.used += amount
+        if partition.used > partition.minimum:
+            if name not in self.borrowers:
+                self.borrowers[name] = partition
+        else:
+            self.borrowers.pop(name, None)
+
+    def _forget(self, key, partition):
+        ''' Release what key used in partition.
+        '''
+        if self.sizes is None:
+            self._charge(key[0], partition, -1)
+        else:
+            self._charge(key[0], partition, -partition.sizes.pop(key))
+
+    def fits(self, key, amount):
+        ''' Tell whether amount (an item or bytes) can fit in the
+        maximum of the namespace of key at all.
+        '''
+        maximum = self.partition(key).maximum
+        return maximum is None or amount <= maximum
+
+    def over_quota(self, key, amount):
+        ''' Tell whether amount more overflows the maximum of the
+        namespace of key, while it still holds keys to evict.
+        '''
+        partition = self.partition(key)
+        return (partition.maximum is not None and len(partition.policy) and
+                partition.used + amount > partition.maximum)
+
+    def lender(self, key=None):
+        ''' Return the partition to take room from for key, if its own
+        namespace is within its maximum: the next borrower in turn, its
+        own if there is none.
+        '''
+        if self.borrowers:
+            name, partition = next(iter(self.borrowers.items()))
+            self.borrowers.move_to_end(name)
+            return partition
+        partition = self.partitions.get(key[0]) if key is not None else None
+        if partition is not None and len(partition.policy):
+            return partition
+        # The minimums add up to more than the cache, or key is None
+        return next(partition for partition in self.partitions.values()
+                    if len(partition.policy))
+
+    def weigh(self, key, size, cost=None):
+        ''' Record the size of the item of key in its namespace, and
+        tell the namespace policy if it weighs its keys.
+        '''
+        partition = self.partition(key)
+        if self.sizes is not None:
+            if key in partition.sizes:
+                self._charge(key[0], partition, size - partition.sizes[key])
+                partition.sizes[key] = size
+            else:
+                self.pending[key] = size
+        if partition.policy.weighted:
+            partition.policy.weigh(key, size, cost)
+
+    def insert(self, key):
+        ''' Track key in its namespace.
+        '''
+        partition = self.partition(key)
+        partition.policy.insert(key)
+        partition.inserts += 1
+        if self.sizes is None:
+            self._charge(key[0], partition, 1)
+        else:
+            size = self.pending.pop(key, None)
+            if size is None:
+                size = self.sizes.get(key, 0)
+            partition.sizes[key] = size
+            self._charge(key[0], partition, size)
+
+    def access(self, key):
+        ''' Record a hit on key.
+        '''
+        partition = self.partitions[key[0]]
+        partition.policy.access(key)
+        partition.hits += 1
+
+    def update(self, key):
+        ''' Record that the item of key was replaced.
+        '''
+        partition = self.partitions[key[0]]
+        partition.policy.update(key)
+        partition.updates += 1
+
+    def miss(self, key):
+        ''' Record a lookup of a key that is not cached.
+        '''
+        partition = self.partition(key)
+        partition.policy.miss(key)
+        partition.misses += 1
+
+    def victim(self, key=None):
+        ''' Return the key to discard to make room for key.
+        '''
+        return self.lender(key).policy.victim(key)
+
+    def evict(self, key=None, partition=None):
+        ''' Discard the victim of partition (the next lender by
+        default) and return it.
+        '''
+        if partition is None:
+            partition = self.lender(key)
+        victim = partition.policy.evict(key)
+        partition.evictions += 1
+        self._forget(victim, partition)
+        return victim
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        partition = self.partitions[key[0]]
+        partition.policy.remove(key)
+        self._forget(key, partition)
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        for partition in self.partitions.values():
+            partition.policy.clear()
+            partition.sizes.clear()
+            partition.used = 0
+        self.borrowers.clear()
+        self.pending.clear()
+
+    def dump(self):
+        ''' Return the state of every namespace policy and the keys of
+        every namespace, one after the other.
+        '''
+        states = {}
+        entries = []
+        for name, partition in self.partitions.items():
+            states[name], keys = partition.policy.dump()
+            entries.extend(keys)
+        return {"states": states}, entries
+
+    def restore(self, state, entries):
+        ''' Track the keys again in their namespaces, which have to be
+        added first.
+        '''
+        groups = {}
+        for key, flags in entries:
+            groups.setdefault(key[0], []).append((key, flags))
+        for name, group in groups.items():
+            partition = self.partition(group[0][0])
+            partition.policy.restore(state["states"].get(name, {}), group)
+            for key, _ in group:
+                if self.sizes is None:
+                    self._charge(name, partition, 1)
+                else:
+                    partition.sizes[key] = self.sizes.get(key, 0)
+                    self._charge(name, partition, partition.sizes[key])
+
+
+class Namespace():
+    ''' Namespace is the view of a PartitionedCache restricted to the
+    keys of one namespace.
+    '''
+
+    def __init__(self, cache, name):
+        ''' Initialize the view of the namespace name of cache.
+        '''
+        self.cache = cache
+        self.name = name
+
+    def __len__(self):
+        ''' Return the number of items of the namespace.
+        '''
+        return len(self.cache.policy.partitions[self.name].policy)
+
+    def __contains__(self, key):
+        ''' Return True if key is cached in the namespace.
+        '''
+        return (self.name, key) in self.cache.cache_data
+
+    def get(self, key):
+        ''' Get an item by key
+        '''
+        return self.cache.get((self.name, key))
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item in the namespace
+        '''
+        self.cache.put((self.name, key), item, ttl, size, cost)
+
+    def delete(self, key):
+        ''' Remove key from the namespace, return whether it was cached
+        '''
+        return self.cache.delete((self.name, key))
+
+    def get_or_load(self, key, loader, ttl=None):
+        ''' Get an item by key, loading it with loader(key) on a miss
+        '''
+        return self.cache.get_or_load((self.name, key),
+                                      lambda _: loader(key), ttl)
+
+    def stats(self):
+        ''' Return the counters of the namespace
+        '''
+        return self.cache.policy.partitions[self.name].stats()
+
+
+class PartitionedCache(BaseCaching):
+    ''' PartitionedCache is a BaseCaching whose keys are (namespace,
+    key) pairs, each namespace bounded by a minimum and a maximum.
+    '''
+
+    def __init__(self, max_items=None, max_bytes=None,
+                 policy=policies.LRUPolicy, sizeof=None, ttl=None,
+                 resolution=1.0, clock=None):
+        ''' Initialize a cache with no namespace.
+        policy is the class (or factory) of the policy of each
+        namespace; the other arguments are those of BaseCaching.
+        '''
+        super().__init__(None, max_items=max_items, max_bytes=max_bytes,
+                         sizeof=sizeof, ttl=ttl, resolution=resolution,
+                         clock=clock)
+        self.policy = PartitionedPolicy(
+            policy, None if self.MAX_ITEMS is not None else self.sizes)
+        self.policy.capacity = self.MAX_ITEMS or BaseCaching.MAX_ITEMS
+        self.views = {}
+
+    @property
+    def capacity(self):
+        ''' Return the capacity of the cache, in items or in bytes.
+        '''
+        if self.MAX_ITEMS is not None:
+            return self.MAX_ITEMS
+        return self.max_bytes
+
+    def add_namespace(self, name, minimum=0, maximum=None):
+        ''' Add the namespace name, guaranteed minimum items (or bytes)
+        and holding at most maximum of them (no more than the cache by
+        default). Returns its Namespace view.
+        Raises ValueError if the name is taken or the bounds don't fit.
+        '''
+        if name in self.policy.partitions:
+            raise ValueError("namespace {} already exists".format(name))
+        if minimum < 0 or (maximum is not None and maximum < minimum):
+            raise ValueError("minimum must be between 0 and maximum")
+        reserved = sum(partition.minimum
+                       for partition in self.policy.partitions.values())
+        if reserved + minimum > self.capacity:
+            raise ValueError("the minimums exceed the capacity")
+        capacity = self.policy.capacity
+        if self.MAX_ITEMS is not None and maximum is not None:
+            capacity = min(capacity, maximum)
+        self.policy.add(name, minimum, maximum, capacity)
+        self.views[name] = Namespace(self, name)
+        return self.views[name]
+
+    def namespace(self, name):
+        ''' Return the Namespace view of name.
+        Raises KeyError for an unknown namespace.
+        '''
+        return self.views[name]
+
+    def _amount(self, size, count):
+        ''' Return what count items of size bytes take, in the unit of
+        the capacity.
+        '''
+        return count if self.MAX_ITEMS is not None else size
+
+    def _admit(self, key, size=0):
+        ''' Tell whether the new key of size bytes gets in: it has to
+        fit in the maximum of its namespace
+        '''
+        if not self.policy.fits(key, self._amount(size, 1)):
+            return False
+        return super()._admit(key, size)
+
+    def _make_room(self, key, size=0, count=0):
+        ''' Discard victims until count more items of size bytes fit
+        in the cache and in the maximum of the namespace of key
+        '''
+        policy = self.policy
+        amount = self._amount(size, count)
+        evicted = False
+        while self.cache_data:
+            if policy.over_quota(key, amount):
+                self.discard(policy.evict(key, policy.partition(key)))
+            elif self.is_full(size, count):
+                self.discard(policy.evict(key))
+            else:
+                break
+            evicted = True
+        if evicted and self.MAX_ITEMS is None:
+            # Byte bounded: every namespace may borrow the whole cache,
+            # its policy sizes its queues on what fits in it
+            policy.capacity = max(1, len(self.cache_data) + count)
+            for partition in policy.partitions.values():
+                partition.policy.capacity = policy.capacity
+
+    def put_many(self, items, ttl=None):
+        ''' Add the items of a dictionary (or of (key, item) pairs), one
+        by one
+        '''
+        for key, item in dict(items).items():
+            self.put(key, item, ttl)
+
+    def stats(self):
+        ''' Return the counters of the cache, and of every namespace
+        under "namespaces"
+        '''
+        stats = super().stats()
+        stats["namespaces"] = {
+            name: partition.stats()
+            for name, partition in self.policy.partitions.items()}
+        return stats
@@ -0,0 +1,981 @@
+#!/usr/bin/env python3
+'''
+This module contains the eviction policies that plug into BaseCaching.
+A policy only tracks keys: BaseCaching keeps the items in cache_data
+and asks its policy which key to discard when the cache is full.
+
+Besides FIFO, LIFO, LRU, MRU and LFU it ships policies that resist one-off
+scans and keep a higher hit ratio on mixed workloads: CLOCK, 2Q, ARC,
+SIEVE and W-TinyLFU. Every operation is O(1) (amortized for CLOCK and SIEVE).
+
+GDSF weighs the keys by the size and the cost of their items instead,
+in O(log n) per operation, for caches whose items differ widely.
+'''
+from collections import OrderedDict
+linked_list = __import__('linked_list')
+frequency_sketch = __import__('frequency_sketch')
+IndexedHeap = __import__('indexed_heap').IndexedHeap
+
+
+class FrequencyNode(linked_list.Node):
+    ''' FrequencyNode is a linked list node that also remembers
+    how many times its key has been used.
+    '''
+    __slots__ = ('freq',)
+
+    def __init__(self, key=None):
+        ''' Initialize a node for a key used once.
+        '''
+        super().__init__(key)
+        self.freq = 1
+
+
+class FlagNode(linked_list.Node):
+    ''' FlagNode is a linked list node carrying a reference bit.
+    '''
+    __slots__ = ('flag',)
+
+    def __init__(self, key=None):
+        ''' Initialize a node whose bit is clear.
+        '''
+        super().__init__(key)
+        self.flag = False
+
+
+class QueueNode(linked_list.Node):
+    ''' QueueNode is a linked list node that knows which of the
+    policy's lists it currently belongs to.
+    '''
+    __slots__ = ('queue',)
+
+    def __init__(self, key=None, queue=None):
+        ''' Initialize a node and link it at the back of queue.
+        '''
+        super().__init__(key)
+        self.queue = queue
+        if queue is not None:
+            queue.append(self)
+
+    def move(self, queue):
+        ''' Move the node to the back of another queue.
+        '''
+        self.queue.remove(self)
+        self.queue = queue
+        queue.append(self)
+
+
+class EvictionPolicy():
+    ''' EvictionPolicy defines how BaseCaching talks to a policy:
+      - insert(key) when a new key is stored
+      - access(key) on a hit, update(key) when an item is replaced
+      - miss(key) when a key is looked up but is not cached
+      - victim(key) to choose the key to discard to make room for key
+      - evict(key) to discard that victim and return it
+      - remove(key) to forget a key that left for any other reason
+      - dump() and restore(state, entries) to save and reload it
+    capacity is the number of items of the cache; BaseCaching fills
+    it in when the policy is created without one.
+    A weighted policy is also told the size and the cost of an item,
+    by weigh(key, size, cost), before its key is inserted or updated.
+    A policy that is not batchable, whose victim depends on the keys
+    put just before it, gets the batches of put_many one key at a time.
+    '''
+    weighted = False
+    batchable = True
+
+    def __init__(self, capacity=None):
+        ''' Initialize the policy with an empty key -> node map.
+        '''
+        self.capacity = capacity
+        self.nodes = {}
+
+    def __len__(self):
+        ''' Return the number of keys tracked by the policy.
+        '''
+        return len(self.nodes)
+
+    def __contains__(self, key):
+        ''' Return True if key is tracked by the policy.
+        '''
+        return key in self.nodes
+
+    def __iter__(self):
+        ''' Iterate over the tracked keys.
+        '''
+        return iter(self.nodes)
+
+    def insert(self, key):
+        ''' Start tracking key.
+        '''
+        raise NotImplementedError("insert must be implemented in your policy")
+
+    def access(self, key):
+        ''' Record a hit on key.
+        '''
+        raise NotImplementedError("access must be implemented in your policy")
+
+    def update(self, key):
+        ''' Record that the item of key was replaced.
+        '''
+        self.access(key)
+
+    def insert_many(self, keys):
+        ''' Start tracking keys, in order.
+        '''
+        for key in keys:
+            self.insert(key)
+
+    def access_many(self, keys):
+        ''' Record a hit on each of keys, in order.
+        '''
+        for key in keys:
+            self.access(key)
+
+    def miss(self, key):
+        ''' Record a lookup of a key that is not cached.
+        '''
+
+    def weigh(self, key, size, cost=None):
+        ''' Record the size and the cost of the item of key.
+        '''
+
+    def victim(self, key=None):
+        ''' Return the key to discard to make room for key.
+        '''
+        raise NotImplementedError("victim must be implemented in your policy")
+
+    def evict(self, key=None):
+        ''' Stop tracking the victim chosen for key and return it.
+        '''
+        victim = self.victim(key)
+        self.remove(victim)
+        return victim
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        raise NotImplementedError("remove must be implemented in your policy")
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        raise NotImplementedError("clear must be implemented in your policy")
+
+    def dump(self):
+        ''' Return the state of the policy: a dictionary of what it
+        knows besides its keys, and a (key, flags) pair per key, in the
+        order of iteration.
+        '''
+        return {}, [(key, 0) for key in self]
+
+    def restore(self, state, entries):
+        ''' Track again, in an empty policy, the keys dump() returned
+        (or the last ones of them).
+        '''
+        for key, _ in entries:
+            self.insert(key)
+
+
+class LRUPolicy(EvictionPolicy):
+    ''' LRUPolicy discards the least recently used key.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the usage order, least recently used first.
+        '''
+        super().__init__(capacity)
+        self.order = linked_list.DoublyLinkedList()
+
+    def __iter__(self):
+        ''' Iterate from the least to the most recently used key.
+        '''
+        return iter(self.order)
+
+    def insert(self, key):
+        ''' Track key as the most recently used one.
+        '''
+        self.nodes[key] = self.order.append(linked_list.Node(key))
+
+    def access(self, key):
+        ''' Make key the most recently used one.
+        '''
+        self.order.move_to_end(self.nodes[key])
+
+    def insert_many(self, keys):
+        ''' Track keys as the most recently used ones, in order.
+        '''
+        nodes = self.nodes
+        append = self.order.append
+        Node = linked_list.Node
+        for key in keys:
+            nodes[key] = append(Node(key))
+
+    def access_many(self, keys):
+        ''' Make keys the most recently used ones, in order.
+        '''
+        nodes = self.nodes
+        move_to_end = self.order.move_to_end
+        for key in keys:
+            move_to_end(nodes[key])
+
+    def victim(self, key=None):
+        ''' Return the least recently used key.
+        '''
+        return self.order.first().key
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        self.order.remove(self.nodes.pop(key))
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        self.nodes.clear()
+        self.order.clear()
+
+
+class FIFOPolicy(LRUPolicy):
+    ''' FIFOPolicy discards the key inserted first, whatever its use.
+    '''
+
+    def access(self, key):
+        ''' Hits do not change the insertion order.
+        '''
+
+    def access_many(self, keys):
+        ''' Hits do not change the insertion order.
+        '''
+
+
+class LIFOPolicy(FIFOPolicy):
+    ''' LIFOPolicy discards the key put last: inserted, or updated.
+    '''
+    batchable = False
+
+    def update(self, key):
+        ''' Make key the last one put.
+        '''
+        self.order.move_to_end(self.nodes[key])
+
+    def victim(self, key=None):
+        ''' Return the key put last.
+        '''
+        return self.order.last().key
+
+
+class MRUPolicy(LRUPolicy):
+    ''' MRUPolicy discards the most recently used key, which suits
+    loops over more keys than the cache holds.
+    '''
+    batchable = False
+
+    def victim(self, key=None):
+        ''' Return the most recently used key.
+        '''
+        return self.order.last().key
+
+
+class LFUPolicy(EvictionPolicy):
+    ''' LFUPolicy discards the least frequently used key, using LRU
+    as a tie-breaker. Keys are grouped in frequency buckets, each one
+    in LRU order, and the lowest non-empty frequency is tracked.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the frequency buckets and the minimum frequency.
+        '''
+        super().__init__(capacity)
+        self.buckets = {}
+        self.min_freq = 0
+
+    def __iter__(self):
+        ''' Iterate from the next victim to the most used key.
+        '''
+        for freq in sorted(self.buckets):
+            yield from self.buckets[freq]
+
+    def _bucket(self, freq):
+        ''' Return the bucket of freq, creating it if needed.
+        '''
+        bucket = self.buckets.get(freq)
+        if bucket is None:
+            bucket = self.buckets[freq] = linked_list.DoublyLinkedList()
+        return bucket
+
+    def _unlink(self, node):
+        ''' Take node out of its bucket, dropping the bucket if empty.
+        '''
+        bucket = self.buckets[node.freq]
+        bucket.remove(node)
+        if not bucket:
+            del self.buckets[node.freq]
+            if self.min_freq == node.freq:
+                self.min_freq += 1
+
+    def insert(self, key):
+        ''' Track key as used once.
+        '''
+        self.nodes[key] = self._bucket(1).append(FrequencyNode(key))
+        self.min_freq = 1
+
+    def access(self, key):
+        ''' Move key to the bucket of the next frequency.
+        It lands at the most recently used end of that bucket.
+        '''
+        node = self.nodes[key]
+        self._unlink(node)
+        node.freq += 1
+        self._bucket(node.freq).append(node)
+
+    def victim(self, key=None):
+        ''' Return the least recently used key of the lowest frequency.
+        '''
+        bucket = self.buckets.get(self.min_freq)
+        if bucket is None:
+            # The lowest bucket was emptied by remove, look for the next
+            # one (an insert usually resets min_freq before we get here)
+            self.min_freq = min(self.buckets)
+            bucket = self.buckets[self.min_freq]
+        return bucket.first().key
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        self._unlink(self.nodes.pop(key))
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        self.nodes.clear()
+        self.buckets.clear()
+        self.min_freq = 0
+
+    def dump(self):
+        ''' Return the keys with their frequency.
+        '''
+        return {}, [(key, self.nodes[key].freq) for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again in their frequency buckets.
+        '''
+        for key, freq in entries:
+            node = FrequencyNode(key)
+            node.freq = freq
+            self.nodes[key] = self._bucket(freq).append(node)
+        self.min_freq = min(self.buckets) if self.buckets else 0
+
+
+class ClockPolicy(EvictionPolicy):
+    ''' ClockPolicy (CLOCK) gives every key a reference bit set on
+    access. The hand sweeps the keys in insertion order: a key whose bit
+    is set gets a second chance (bit cleared, hand moves on), the first
+    key whose bit is clear is the victim.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the clock, the hand pointing at its front.
+        '''
+        super().__init__(capacity)
+        self.clock = linked_list.DoublyLinkedList()
+
+    def __iter__(self):
+        ''' Iterate over the keys starting from the hand.
+        '''
+        return iter(self.clock)
+
+    def insert(self, key):
+        ''' Track key right behind the hand with its bit clear.
+        '''
+        self.nodes[key] = self.clock.append(FlagNode(key))
+
+    def access(self, key):
+        ''' Set the reference bit of key.
+        '''
+        self.nodes[key].flag = True
+
+    def victim(self, key=None):
+        ''' Sweep the hand to the first key whose bit is clear.
+        '''
+        node = self.clock.first()
+        while node.flag:
+            node.flag = False
+            self.clock.move_to_end(node)
+            node = self.clock.first()
+        return node.key
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        self.clock.remove(self.nodes.pop(key))
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        self.nodes.clear()
+        self.clock.clear()
+
+    def dump(self):
+        ''' Return the keys from the hand on, with their bit.
+        '''
+        return {}, [(key, int(self.nodes[key].flag)) for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again with their bit.
+        '''
+        for key, flag in entries:
+            node = self.nodes[key] = self.clock.append(FlagNode(key))
+            node.flag = bool(flag)
+
+
+class SievePolicy(EvictionPolicy):
+    ''' SievePolicy (SIEVE) keeps keys in insertion order with a
+    visited bit set on access. Unlike CLOCK, visited keys are not moved:
+    the hand walks from the oldest towards the newest key, clearing bits,
+    and evicts the first unvisited key it meets, then stays there.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the queue (oldest first) and the hand.
+        '''
+        super().__init__(capacity)
+        self.queue = linked_list.DoublyLinkedList()
+        self.hand = None
+
+    def __iter__(self):
+        ''' Iterate from the oldest to the newest key.
+        '''
+        return iter(self.queue)
+
+    def insert(self, key):
+        ''' Track key as the newest one, not visited yet.
+        '''
+        self.nodes[key] = self.queue.append(FlagNode(key))
+
+    def access(self, key):
+        ''' Mark key as visited.
+        '''
+        self.nodes[key].flag = True
+
+    def victim(self, key=None):
+        ''' Move the hand to the next unvisited key and return it.
+        '''
+        node = self.hand or self.queue.first()
+        while node.flag:
+            node.flag = False
+            node = node.next
+            if node is self.queue.root:
+                node = self.queue.first()
+        self.hand = node
+        return node.key
+
+    def remove(self, key):
+        ''' Stop tracking key, moving the hand past it if needed.
+        '''
+        node = self.nodes.pop(key)
+        if node is self.hand:
+            self.hand = node.next
+            if self.hand is self.queue.root:
+                self.hand = None
+        self.queue.remove(node)
+
+    def clear(self):
+        ''' Stop tracking every key.
+        '''
+        self.nodes.clear()
+        self.queue.clear()
+        self.hand = None
+
+    def dump(self):
+        ''' Return the keys with their bit, plus 2 for the hand.
+        '''
+        return {}, [(key, int(self.nodes[key].flag) |
+                     (2 if self.nodes[key] is self.hand else 0))
+                    for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again with their bit, and the hand.
+        '''
+        for key, flags in entries:
+            node = self.nodes[key] = self.queue.append(FlagNode(key))
+            node.flag = bool(flags & 1)
+            if flags & 2:
+                self.hand = node
+
+
+class TwoQueuePolicy(EvictionPolicy):
+    ''' TwoQueuePolicy (2Q) admits new keys in a small FIFO (a1in).
+    Keys evicted from it are remembered without their item in a ghost
+    FIFO (a1out); only a key coming back while still remembered enters
+    the main LRU (am). One-off scans therefore never reach am.
+    '''
+
+    def __init__(self, capacity=None, kin=0.25, kout=0.5):
+        ''' Initialize the queues.
+        kin and kout are the sizes of a1in and a1out relative
+        to the capacity.
+        '''
+        super().__init__(capacity)
+        self.kin = kin
+        self.kout = kout
+        self.a1in = linked_list.DoublyLinkedList()
+        self.am = linked_list.DoublyLinkedList()
+        self.a1out = OrderedDict()
+
+    def __iter__(self):
+        ''' Iterate over a1in then am, oldest first.
+        '''
+        yield from self.a1in
+        yield from self.am
+
+    def insert(self, key):
+        ''' Track key in am if it is a remembered ghost, a1in otherwise.
+        '''
+        if key in self.a1out:
+            del self.a1out[key]
+            self.nodes[key] = QueueNode(key, self.am)
+        else:
+            self.nodes[key] = QueueNode(key, self.a1in)
+
+    def access(self, key):
+        ''' Refresh key if it is in am; a1in stays in FIFO order.
+        '''
+        node = self.nodes[key]
+        if node.queue is self.am:
+            self.am.move_to_end(node)
+
+    def victim(self, key=None):
+        ''' Return the oldest key of a1in if it is over its share,
+        the least recently used key of am otherwise.
+        '''
+        kin = max(1, int(self.capacity * self.kin))
+        if self.a1in and (len(self.a1in) > kin or not self.am):
+            return self.a1in.first().key
+        return self.am.first().key
+
+    def evict(self, key=None):
+        ''' Discard the victim, remembering it if it came from a1in.
+        '''
+        victim = self.victim(key)
+        if self.nodes[victim].queue is self.a1in:
+            self.a1out[victim] = None
+            if len(self.a1out) > max(1, int(self.capacity * self.kout)):
+                self.a1out.popitem(last=False)
+        self.remove(victim)
+        return victim
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        node = self.nodes.pop(key)
+        node.queue.remove(node)
+
+    def clear(self):
+        ''' Stop tracking every key and forget the ghosts.
+        '''
+        self.nodes.clear()
+        self.a1in.clear()
+        self.am.clear()
+        self.a1out.clear()
+
+    def dump(self):
+        ''' Return the ghosts and the keys, flagged 1 in am.
+        '''
+        return {"a1out": list(self.a1out)}, [
+            (key, int(self.nodes[key].queue is self.am)) for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again in their queue, and the ghosts.
+        '''
+        for key, in_am in entries:
+            self.nodes[key] = QueueNode(key, self.am if in_am else self.a1in)
+        self.a1out = OrderedDict.fromkeys(state.get("a1out", ()))
+
+
+class ARCPolicy(EvictionPolicy):
+    ''' ARCPolicy (Adaptive Replacement Cache) splits the cache in t1,
+    keys seen once recently, and t2, keys seen at least twice. Ghost
+    lists b1 and b2 remember the keys recently evicted from each; a hit
+    on a ghost moves the target size p of t1 towards the list that
+    would have kept it.
+    '''
+
+    def __init__(self, capacity=None):
+        ''' Initialize the four lists and the target size of t1.
+        '''
+        super().__init__(capacity)
+        self.t1 = linked_list.DoublyLinkedList()
+        self.t2 = linked_list.DoublyLinkedList()
+        self.b1 = OrderedDict()
+        self.b2 = OrderedDict()
+        self.p = 0
+
+    def __iter__(self):
+        ''' Iterate over t1 then t2, least recently used first.
+        '''
+        yield from self.t1
+        yield from self.t2
+
+    def insert(self, key):
+        ''' Track key, adapting p if key is a ghost.
+        '''
+        capacity = self.capacity
+        if key in self.b1:
+            self.p = min(capacity,
+                         self.p + max(len(self.b2) / len(self.b1), 1))
+            del self.b1[key]
+            self.nodes[key] = QueueNode(key, self.t2)
+            return
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) / len(self.b2), 1))
+            del self.b2[key]
+            self.nodes[key] = QueueNode(key, self.t2)
+            return
+        # Keep the ghost directory within twice the capacity
+        if len(self.t1) + len(self.b1) >= capacity:
+            if self.b1:
+                self.b1.popitem(last=False)
+        elif (len(self.t1) + len(self.t2) + len(self.b1) + len(self.b2)
+              >= 2 * capacity and self.b2):
+            self.b2.popitem(last=False)
+        self.nodes[key] = QueueNode(key, self.t1)
+
+    def access(self, key):
+        ''' Move key to the most recently used end of t2.
+        '''
+        node = self.nodes[key]
+        if node.queue is self.t2:
+            self.t2.move_to_end(node)
+        else:
+            node.move(self.t2)
+
+    def victim(self, key=None):
+        ''' Return the LRU key of t1 if t1 is over its target size,
+        the LRU key of t2 otherwise.
+        '''
+        size = len(self.t1)
+        if self.t1 and (size > self.p or not self.t2 or
+                        (key in self.b2 and size == self.p)):
+            return self.t1.first().key
+        return self.t2.first().key
+
+    def evict(self, key=None):
+        ''' Discard the victim and remember it in the matching ghost list.
+        '''
+        victim = self.victim(key)
+        if self.nodes[victim].queue is self.t1:
+            self.b1[victim] = None
+        else:
+            self.b2[victim] = None
+        self.remove(victim)
+        return victim
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        node = self.nodes.pop(key)
+        node.queue.remove(node)
+
+    def clear(self):
+        ''' Stop tracking every key and forget the ghosts.
+        '''
+        self.nodes.clear()
+        self.t1.clear()
+        self.t2.clear()
+        self.b1.clear()
+        self.b2.clear()
+        self.p = 0
+
+    def dump(self):
+        ''' Return p, the ghosts and the keys, flagged 1 in t2.
+        '''
+        state = {"p": self.p, "b1": list(self.b1), "b2": list(self.b2)}
+        return state, [(key, int(self.nodes[key].queue is self.t2))
+                       for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again in their list, with p and the ghosts.
+        '''
+        for key, in_t2 in entries:
+            self.nodes[key] = QueueNode(key, self.t2 if in_t2 else self.t1)
+        self.p = state.get("p", 0)
+        self.b1 = OrderedDict.fromkeys(state.get("b1", ()))
+        self.b2 = OrderedDict.fromkeys(state.get("b2", ()))
+
+
+class WTinyLFUPolicy(EvictionPolicy):
+    ''' WTinyLFUPolicy (Window TinyLFU) admits new keys into a small
+    LRU window. When the cache is full, the oldest window key competes
+    with the victim of the main segmented LRU (probation then protected)
+    and the one a CountMinSketch estimates as less popular is discarded.
+    '''
+
+    def __init__(self, capacity=None, window=0.01, protected=0.8):
+        ''' Initialize the window and the main segments.
+        window is the share of the capacity given to the window and
+        protected the share of the main cache given to protected keys.
+        '''
+        super().__init__(capacity)
+        self.window_share = window
+        self.protected_share = protected
+        self.window = linked_list.DoublyLinkedList()
+        self.probation = linked_list.DoublyLinkedList()
+        self.protected = linked_list.DoublyLinkedList()
+        self.sketch = None
+
+    def __iter__(self):
+        ''' Iterate over window, probation then protected, LRU first.
+        '''
+        yield from self.window
+        yield from self.probation
+        yield from self.protected
+
+    def _window_size(self):
+        ''' Return the number of keys the window may hold.
+        '''
+        return max(1, int(self.capacity * self.window_share))
+
+    def _count(self, key):
+        ''' Record one occurrence of key in the sketch.
+        '''
+        if self.sketch is None or self.sketch.capacity < self.capacity:
+            # Sized (or grown, for byte bounded caches) on the capacity
+            self.sketch = frequency_sketch.CountMinSketch(self.capacity)
+        self.sketch.increment(key)
+
+    def _duel(self):
+        ''' Pick the node to discard.
+        Returns it with the window node that wins its place, if any.
+        '''
+        candidate = None
+        if len(self.window) >= self._window_size():
+            candidate = self.window.first()
+        victim = self.probation.first() or self.protected.first()
+        if victim is None:
+            return self.window.first(), None
+        if candidate is None:
+            return victim, None
+        if self.sketch is None:
+            # Nothing counted yet: the candidate has no edge
+            return candidate, None
+        if (self.sketch.frequency(candidate.key) >
+                self.sketch.frequency(victim.key)):
+            return victim, candidate
+        return candidate, None
+
+    def insert(self, key):
+        ''' Track key in the window, moving the oldest window key to
+        probation if the window overflows.
+        '''
+        self._count(key)
+        self.nodes[key] = QueueNode(key, self.window)
+        if len(self.window) > self._window_size():
+            self.window.first().move(self.probation)
+
+    def access(self, key):
+        ''' Refresh key, promoting it to protected if it was on
+        probation.
+        '''
+        self._count(key)
+        node = self.nodes[key]
+        if node.queue is self.probation:
+            node.move(self.protected)
+            main = self.capacity - self._window_size()
+            if len(self.protected) > int(main * self.protected_share):
+                self.protected.first().move(self.probation)
+        else:
+            node.queue.move_to_end(node)
+
+    def miss(self, key):
+        ''' Record the lookup of key in the sketch.
+        '''
+        self._count(key)
+
+    def victim(self, key=None):
+        ''' Return the loser of the window / main duel.
+        '''
+        return self._duel()[0].key
+
+    def evict(self, key=None):
+        ''' Discard the loser of the duel, the winning window key
+        moving to probation.
+        '''
+        victim, winner = self._duel()
+        if winner is not None:
+            winner.move(self.probation)
+        self.remove(victim.key)
+        return victim.key
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        node = self.nodes.pop(key)
+        node.queue.remove(node)
+
+    def clear(self):
+        ''' Stop tracking every key and forget their frequencies.
+        '''
+        self.nodes.clear()
+        self.window.clear()
+        self.probation.clear()
+        self.protected.clear()
+        if self.sketch is not None:
+            self.sketch.clear()
+
+    def dump(self):
+        ''' Return the sketch and the keys, flagged 0 in the window, 1
+        on probation and 2 protected.
+        The sketch counts hash(key), which changes between processes
+        for strings: hash("sketch") tells whether it can be reused.
+        '''
+        queues = (self.window, self.probation, self.protected)
+        state = {}
+        if self.sketch is not None:
+            state["sketch"] = (hash("sketch"), self.sketch.capacity,
+                               bytes(self.sketch.table),
+                               self.sketch.additions)
+        return state, [(key, queues.index(self.nodes[key].queue))
+                       for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again in their queue, with a new sketch that
+        gets the saved counters when they were counted by a process
+        hashing strings the same way.
+        '''
+        queues = (self.window, self.probation, self.protected)
+        for key, queue in entries:
+            self.nodes[key] = QueueNode(key, queues[queue])
+        self.sketch = frequency_sketch.CountMinSketch(self.capacity)
+        if "sketch" in state:
+            seed, capacity, table, additions = state["sketch"]
+            if (seed == hash("sketch") and
+                    len(table) == len(self.sketch.table)):
+                self.sketch.table[:] = table
+                self.sketch.additions = additions
+
+
+class WeightNode():
+    ''' WeightNode holds what GDSFPolicy knows about a key.
+    '''
+    __slots__ = ('freq', 'size', 'cost')
+
+    def __init__(self, size=1, cost=1):
+        ''' Initialize a node for a key used once.
+        '''
+        self.freq = 1
+        self.size = size
+        self.cost = cost
+
+
+class GDSFPolicy(EvictionPolicy):
+    ''' GDSFPolicy (GreedyDual-Size-Frequency) gives every key the
+    priority L + freq * cost / size and discards the key of lowest
+    priority, raising L to it: the keys left behind age, as every new
+    priority starts from a higher L.
+    With objective "cost" (the default), cost is the cost of computing
+    the item again, 1 when unknown: small items are kept, which
+    maximizes the hit ratio (or the cost saved by the hits). With
+    objective "bytes", cost is the size, which maximizes the byte hit
+    ratio. The keys sit in an indexed heap: O(log n) per operation.
+    '''
+    weighted = True
+
+    def __init__(self, capacity=None, objective="cost"):
+        ''' Initialize the heap and the inflation value L.
+        '''
+        if objective not in ("cost", "bytes"):
+            raise ValueError("objective must be cost or bytes")
+        super().__init__(capacity)
+        self.objective = objective
+        self.heap = IndexedHeap()
+        self.inflation = 0
+        self.weights = {}
+
+    def __iter__(self):
+        ''' Iterate from the next victim to the key of top priority.
+        '''
+        return iter(self.heap)
+
+    def _push(self, key, node):
+        ''' Give key its priority from the current L.
+        '''
+        cost = node.size if self.objective == "bytes" else node.cost
+        self.heap.push(key, self.inflation +
+                       node.freq * cost / max(node.size, 1))
+
+    def weigh(self, key, size, cost=None):
+        ''' Record the size and the cost of the item of key, used from
+        its next insert or update.
+        '''
+        size = max(size or 1, 1)
+        cost = 1 if cost is None else cost
+        node = self.nodes.get(key)
+        if node is None:
+            self.weights[key] = (size, cost)
+        else:
+            node.size = size
+            node.cost = cost
+
+    def insert(self, key):
+        ''' Track key as used once, with the weight it was given.
+        '''
+        node = self.nodes[key] = WeightNode(*self.weights.pop(key, ()))
+        self._push(key, node)
+
+    def access(self, key):
+        ''' Count a hit on key and raise its priority.
+        '''
+        node = self.nodes[key]
+        node.freq += 1
+        self._push(key, node)
+
+    def victim(self, key=None):
+        ''' Return the key of lowest priority.
+        '''
+        return self.heap.peek()[0]
+
+    def evict(self, key=None):
+        ''' Discard the key of lowest priority, raising L to it.
+        '''
+        victim, self.inflation = self.heap.pop()
+        del self.nodes[victim]
+        return victim
+
+    def remove(self, key):
+        ''' Stop tracking key.
+        '''
+        del self.nodes[key]
+        self.heap.remove(key)
+
+    def clear(self):
+        ''' Stop tracking every key and reset L.
+        '''
+        self.nodes.clear()
+        self.heap.clear()
+        self.weights.clear()
+        self.inflation = 0
+
+    def dump(self):
+        ''' Return L with the priority, size and cost of every key, and
+        the keys with their frequency.
+        '''
+        heap = self.heap
+        return {
+            "inflation": self.inflation,
+            "weights": {key: (heap.priority(key), node.size, node.cost)
+                        for key, node in self.nodes.items()},
+        }, [(key, self.nodes[key].freq) for key in self]
+
+    def restore(self, state, entries):
+        ''' Track the keys again with their priority and weight.
+        '''
+        self.inflation = state.get("inflation", 0)
+        weights = state.get("weights", {})
+        for key, freq in entries:
+            if key in weights:
+                priority, size, cost = weights[key]
+                node = self.nodes[key] = WeightNode(size, cost)
+                node.freq = freq
+                self.heap.push(key, priority)
+            else:
+                self.insert(key)
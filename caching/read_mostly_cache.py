@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+'''
+This module contains the ReadMostlyCache class, a thread-safe cache for
+data read far more often than it is written, such as configuration or
+user profiles.
+
+Readers take no lock: the items live in a dictionary that is never
+changed once published (the snapshot), and in a small dictionary of the
+writes made since it was, which readers look into first and writers
+only add to. Writers take a lock; every batch writes, they publish a
+copy of the snapshot with their writes applied and swap it in at once,
+along with a new empty dictionary of writes.
+
+There is no LRU list for the readers to update under a lock. Every
+publication starts a new epoch and a read stamps its entry with the
+current epoch, only if it is not stamped already. When the cache is
+full, the writer evicts the key of the oldest stamp among a few keys
+drawn at random (sampled LRU, as Redis does).
+'''
+import random
+import threading
+import time
+BaseCaching = __import__('base_caching').BaseCaching
+single_flight = __import__('single_flight')
+
+# The write recorded for a key deleted since the last publication
+DELETED = object()
+
+
+class ReadMostlyCache():
+    ''' ReadMostlyCache defines a copy-on-write caching system.
+    It may hold up to batch items more than max_items between two
+    publications. The counters updated by readers are not locked, so
+    under threads they may miss a few hits and misses.
+    '''
+
+    def __init__(self, max_items=None, ttl=None, batch=64, samples=5,
+                 clock=None):
+        ''' Initialize an empty cache of max_items items
+        (BaseCaching.MAX_ITEMS by default). ttl is the default time to
+        live of the items, in seconds; batch is the number of writes
+        published together and samples the number of keys drawn to
+        choose each victim.
+        '''
+        self.max_items = max_items or BaseCaching.MAX_ITEMS
+        self.ttl = ttl
+        self.batch = batch
+        self.samples = samples
+        self.clock = clock or time.monotonic
+        # Every entry is [item, expiry time or None, epoch of last read]
+        self.data = {}
+        self.writes = {}
+        self.epoch = 0
+        self.lock = threading.Lock()
+        self.rng = random.Random()
+        self.flights = single_flight.SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.loads = 0
+        self.deletes = 0
+        self.publications = 0
+
+    def _entry(self, key):
+        ''' Return the live entry of key, None if there is none.
+        '''
+        entry = self.writes.get(key)
+        if entry is None:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+        elif entry is DELETED:
+            return None
+        if entry[1] is not None and entry[1] <= self.clock():
+            return None
+        return entry
+
+    def get(self, key):
+        ''' Retrieve an item by key, without taking any lock.
+        If key is None or doesn't exist in the cache it returns None.
+        '''
+        # The snapshot is read after the writes: a publication swaps
+        # the snapshot first, so no write can be missed in between
+        entry = self._entry(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        epoch = self.epoch
+        if entry[2] != epoch:
+            entry[2] = epoch
+        self.hits += 1
+        return entry[0]
+
+    def get_many(self, keys):
+        ''' Retrieve the items of keys.
+        Returns a dictionary of the keys found.
+        '''
+        found = {}
+        for key in keys:
+            item = self.get(key)
+            if item is not None:
+                found[key] = item
+        return found
+
+    def put(self, key, item, ttl=None, size=None, cost=None):
+        ''' Add an item, for ttl seconds if given (or the default ttl).
+        If key or item is None this method does nothing. size and cost
+        are accepted for the put contract of BaseCaching, and ignored.
+        '''
+        if key is None or item is None:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires = None if ttl is None else self.clock() + ttl
+        with self.lock:
+            self.writes[key] = [item, expires, self.epoch]
+            if len(self.writes) >= self.batch:
+                self._publish()
+
+    def put_many(self, items, ttl=None):
+        ''' Add the items of a dictionary (or of (key, item) pairs).
+        '''
+        for key, item in dict(items).items():
+            self.put(key, item, ttl)
+
+    def delete(self, key):
+        ''' Remove key. Returns whether it was cached.
+        '''
+        with self.lock:
+            if self._entry(key) is None:
+                return False
+            self.writes[key] = DELETED
+            if len(self.writes) >= self.batch:
+                self._publish()
+            return True
+
+    def delete_many(self, keys):
+        ''' Remove keys. Returns how many were cached.
+        '''
+        return sum(self.delete(key) for key in keys)
+
+    def clear(self):
+        ''' Remove every item.
+        '''
+        with self.lock:
+            self.data = {}
+            self.writes = {}
+            self.epoch += 1
+
+    def flush(self):
+        ''' Publish the writes made since the last publication.
+        '''
+        with self.lock:
+            self._publish()
+
+    def get_or_load(self, key, loader, ttl=None):
+        ''' Retrieve an item by key, loading it with loader(key) on a
+        miss. Concurrent misses on the same key run loader once, and
+        every caller gets its item.
+        '''
+        item = self.get(key)
+        if item is None and key is not None:
+            item = self.flights.do(
+                key, lambda: self._loaded(key, loader(key), ttl))
+        return item
+
+    def _loaded(self, key, item, ttl):
+        ''' Cache the item just loaded for key and return it.
+        '''
+        self.loads += 1
+        self.put(key, item, ttl)
+        return item
+
+    def _publish(self):
+        ''' Swap in a copy of the snapshot with the writes applied,
+        within the capacity. Runs under the lock.
+        '''
+        if not self.writes:
+            return
+        data = self.data.copy()
+        for key, entry in self.writes.items():
+            if entry is DELETED:
+                if data.pop(key, None) is not None:
+                    self.deletes += 1
+            else:
+                if key in data:
+                    self.updates += 1
+                else:
+                    self.inserts += 1
+                data[key] = entry
+        if len(data) > self.max_items:
+            self._reap(data)
+        if len(data) > self.max_items:
+            self._evict(data, len(data) - self.max_items)
+        self.publications += 1
+        self.data = data
+        self.writes = {}
+        self.epoch += 1
+
+    def _reap(self, data):
+        ''' Remove the expired entries from data.
+        '''
+        now = self.clock()
+        expired = [key for key, entry in data.items()
+                   if entry[1] is not None and entry[1] <= now]
+        for key in expired:
+            del data[key]
+        self.expirations += len(expired)
+
+    def _evict(self, data, count):
+        ''' Remove count entries from data, each time the one read the
+        longest ago among samples keys drawn at random.
+        '''
+        keys = list(data)
+        for _ in range(count):
+            drawn = self.rng.sample(range(len(keys)),
+                                    min(self.samples, len(keys)))
+            index = min(drawn, key=lambda index: data[keys[index]][2])
+            # Swap the victim with the last key to pop it in O(1)
+            keys[index], keys[-1] = keys[-1], keys[index]
+            del data[keys.pop()]
+        self.evictions += count
+
+    def reap(self):
+        ''' Publish the cache without its expired items.
+        '''
+        with self.lock:
+            self._publish()
+            data = self.data.copy()
+            self._reap(data)
+            if len(data) < len(self.data):
+                self.publications += 1
+                self.data = data
+                self.epoch += 1
+
+    def stats(self):
+        ''' Return the counters of the cache.
+        '''
+        return {
+            "items": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "loads": self.loads,
+            "deletes": self.deletes,
+            "publications": self.publications,
+            "unpublished": len(self.writes),
+        }
+
+    def __len__(self):
+        ''' Return the number of cached items, expired ones included.
+        The writes are counted under the lock, writers changing them.
+        '''
+        with self.lock:
+            data = self.data
+            size = len(data)
+            for key, entry in self.writes.items():
+                if entry is DELETED:
+                    size -= key in data
+                else:
+                    size += key not in data
+        return size
+
+    @property
+    def cache_data(self):
+        ''' Return the key and item of every entry, expired ones
+        included, copied under the lock.
+        '''
+        with self.lock:
+            data = {key: entry[0] for key, entry in self.data.items()}
+            for key, entry in self.writes.items():
+                if entry is DELETED:
+                    data.pop(key, None)
+                else:
+                    data[key] = entry[0]
+        return data
+
+    def print_cache(self):
+        ''' Print the cache
+        '''
+        data = self.cache_data
+        print("Current cache:")
+        for key in sorted(data.keys()):
+            print("{}: {}".format(key, data.get(key)))
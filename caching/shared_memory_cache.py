@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+'''
+This module contains the SharedMemoryCache class, a cache living in a
+multiprocessing.shared_memory segment so that several processes (the
+workers of one server) share a single copy of their hot entries.
+
+The segment holds a fixed-slot, set-associative hash table: a key is
+hashed with crc32 (the same in every process, unlike hash()) to a set
+of ways slots, and a full set evicts with CLOCK, each slot keeping a
+referenced byte set by reads.
+
+Writers lock the set they change, with a thread lock and an fcntl lock
+on the byte of that set in a lock file, so processes attached to the
+segment by name exclude each other without sharing a lock object.
+Readers take no lock: each set has a version counter, odd while a writer
+is at work, and a read retries when it changed under it. get returns a
+memoryview of the value in the segment, without copying it.
+
+A writer killed at work leaves its set odd. The fcntl lock dies with
+it: whoever locks the set next and finds it odd empties the set, whose
+slots may be half written, and makes it even again. A reader waiting
+for too long on an odd set takes the lock to do so.
+'''
+import fcntl
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from multiprocessing import resource_tracker, shared_memory
+
+MAGIC = b"SMC2"
+# magic, sets, ways, key_size, value_size, pid of the creator's tracker
+HEADER = struct.Struct("<4sIIIIq")
+# version of each set, odd while it is written
+VERSION = struct.Struct("<Q")
+# clock hand of each set
+HAND = struct.Struct("<I")
+# flags, referenced, key length, value length, crc32 of the key
+SLOT = struct.Struct("<BBHII")
+USED = 1
+# Offset of the referenced byte in a slot, apart from the flags: readers
+# set it without a lock, and must never rewrite a USED flag just cleared
+REFERENCED = 1
+# Retries of a reader finding its set odd before it suspects the writer
+# died at work
+SPINS = 1000
+
+
+class SharedMemoryCache():
+    ''' SharedMemoryCache defines a caching system shared by processes.
+    Keys are str or bytes of at most key_size bytes, items are
+    bytes-like objects; an item larger than value_size is not cached.
+    '''
+
+    def __init__(self, name=None, slots=1024, ways=8, key_size=64,
+                 value_size=1024, create=True):
+        '''
+        Create a segment of slots slots (rounded down to whole sets of
+        ways slots), or attach to the segment called name when create
+        is False, taking its geometry from its header.
+        '''
+        if create:
+            sets = max(1, slots // ways)
+            size = (HEADER.size + sets * (VERSION.size + HAND.size) +
+                    sets * ways * (SLOT.size + key_size + value_size))
+            self.shm = shared_memory.SharedMemory(name, create=True,
+                                                  size=size)
+            HEADER.pack_into(self.shm.buf, 0, MAGIC, sets, ways, key_size,
+                             value_size, tracker_pid())
+        else:
+            self.shm = attach(name)
+            (magic, sets, ways, key_size, value_size,
+             _) = HEADER.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                self.shm.close()
+                raise ValueError("{} is not a cache segment".format(name))
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.sets = sets
+        self.ways = ways
+        self.key_size = key_size
+        self.value_size = value_size
+        self.versions = HEADER.size
+        self.hands = self.versions + sets * VERSION.size
+        self.slots = self.hands + sets * HAND.size
+        self.slot_size = SLOT.size + key_size + value_size
+        self.lock = threading.Lock()
+        self.lock_path = os.path.join(tempfile.gettempdir(),
+                                      self.name.lstrip("/") + ".lock")
+        self.lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        self.hits = 0
+        self.misses = 0
+        self.inserts = 0
+        self.updates = 0
+        self.evictions = 0
+        self.deletes = 0
+        self.recoveries = 0
+
+    def _encode(self, key):
+        ''' Return key as bytes and the index of its set.
+        '''
+        if isinstance(key, str):
+            key = key.encode()
+        if len(key) > self.key_size:
+            raise ValueError("key longer than {} bytes".format(
+                self.key_size))
+        crc = zlib.crc32(key)
+        return key, crc, crc % self.sets
+
+    def _version(self, index):
+        ''' Return the version of the set index.
+        '''
+        return VERSION.unpack_from(self.buf, self.versions +
+                                   index * VERSION.size)[0]
+
+    def _bump(self, index):
+        ''' Increment the version of the set index.
+        '''
+        offset = self.versions + index * VERSION.size
+        VERSION.pack_into(self.buf, offset,
+                          VERSION.unpack_from(self.buf, offset)[0] + 1)
+
+    def _find(self, index, key, crc):
+        ''' Return the offset of the slot holding key in the set index,
+        or None.
+        '''
+        buf = self.buf
+        offset = self.slots + index * self.ways * self.slot_size
+        for _ in range(self.ways):
+            flags, _, key_len, _, slot_crc = SLOT.unpack_from(buf, offset)
+            if (flags & USED and slot_crc == crc and key_len == len(key) and
+                    buf[offset + SLOT.size:
+                        offset + SLOT.size + key_len] == key):
+                return offset
+            offset += self.slot_size
+        return None
+
+    def _write(self, index):
+        ''' Return a context manager locking the set index for writing.
+        '''
+        return SetLock(self, index)
+
+    def _recover(self, index):
+        ''' Empty the set index, left odd by a writer that died at work,
+        and make its version even. Runs under the lock of the set.
+        '''
+        offset = self.slots + index * self.ways * self.slot_size
+        for _ in range(self.ways):
+            self.buf[offset] = 0
+            offset += self.slot_size
+        self._bump(index)
+        self.recoveries += 1
+
+    def get(self, key, copy=False):
+        ''' Retrieve an item by key, as a memoryview of the segment.
+        If key is None or doesn't exist in the cache it returns None.
+        The view reads the live slot, which a later write may reuse for
+        another key; with copy the item is returned as bytes copied
+        while the slot was known to hold it.
+        '''
+        if key is None:
+            return None
+        key, crc, index = self._encode(key)
+        spins = 0
+        while True:
+            version = self._version(index)
+            if version & 1:
+                spins += 1
+                if spins < SPINS:
+                    # A writer is at work on the set, let it finish
+                    time.sleep(0)
+                else:
+                    # Or it died: the lock waits for a live writer and
+                    # recovers the set after a dead one
+                    with self._write(index):
+                        pass
+                    spins = 0
+                continue
+            offset = self._find(index, key, crc)
+            if offset is None:
+                item = None
+            else:
+                _, referenced, _, value_len, _ = SLOT.unpack_from(
+                    self.buf, offset)
+                start = offset + SLOT.size + self.key_size
+                item = self.buf[start:start + value_len]
+                if copy:
+                    item = bytes(item)
+            if self._version(index) == version:
+                break
+        if item is None:
+            self.misses += 1
+            return None
+        if not referenced:
+            # A write racing this one may give its slot a second chance,
+            # it cannot bring back a deleted key
+            self.buf[offset + REFERENCED] = 1
+        self.hits += 1
+        return item
+
+    def put(self, key, item):
+        ''' Add an item in the cache.
+        If key or item is None this method does nothing. A full set
+        discards the slot chosen by its clock hand.
+        '''
+        if key is None or item is None:
+            return
+        item = memoryview(item).cast("B")
+        if len(item) > self.value_size:
+            return
+        key, crc, index = self._encode(key)
+        with self._write(index):
+            offset = self._find(index, key, crc)
+            if offset is not None:
+                self.updates += 1
+            else:
+                offset = self._free(index)
+                self.inserts += 1
+            SLOT.pack_into(self.buf, offset, USED, 0, len(key), len(item),
+                           crc)
+            start = offset + SLOT.size
+            self.buf[start:start + len(key)] = key
+            start += self.key_size
+            self.buf[start:start + len(item)] = item
+
+    def _free(self, index):
+        ''' Return the offset of a slot to use in the set index, evicting
+        one with the clock hand if none is free.
+        '''
+        base = self.slots + index * self.ways * self.slot_size
+        for way in range(self.ways):
+            offset = base + way * self.slot_size
+            if not self.buf[offset] & USED:
+                return offset
+        hand_offset = self.hands + index * HAND.size
+        hand = HAND.unpack_from(self.buf, hand_offset)[0]
+        while True:
+            offset = base + hand * self.slot_size
+            hand = (hand + 1) % self.ways
+            if self.buf[offset + REFERENCED]:
+                self.buf[offset + REFERENCED] = 0
+                continue
+            HAND.pack_into(self.buf, hand_offset, hand)
+            self.evictions += 1
+            return offset
+
+    def delete(self, key):
+        ''' Remove key from the cache, return whether it was cached.
+        '''
+        key, crc, index = self._encode(key)
+        with self._write(index):
+            offset = self._find(index, key, crc)
+            if offset is None:
+                return False
+            self.buf[offset] = 0
+        self.deletes += 1
+        return True
+
+    def __len__(self):
+        ''' Return the number of cached items, counted over every slot.
+        '''
+        return sum(1 for slot in range(self.sets * self.ways)
+                   if self.buf[self.slots + slot * self.slot_size] & USED)
+
+    def stats(self):
+        ''' Return the counters of this process, and the number of items
+        cached by all of them.
+        '''
+        return {
+            "items": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "inserts": self.inserts,
+            "updates": self.updates,
+            "evictions": self.evictions,
+            "deletes": self.deletes,
+            "recoveries": self.recoveries,
+        }
+
+    def close(self):
+        ''' Detach this process from the segment.
+        Views returned by get must be released first.
+        '''
+        self.buf = None
+        self.shm.close()
+        os.close(self.lock_fd)
+
+    def unlink(self):
+        ''' Destroy the segment, once every process has closed it.
+        '''
+        self.shm.unlink()
+        try:
+            os.unlink(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        ''' Return the cache.
+        '''
+        return self
+
+    def __exit__(self, *exc_info):
+        ''' Close the cache.
+        '''
+        self.close()
+
+
+class SetLock():
+    ''' SetLock locks one set of a SharedMemoryCache for writing and
+    keeps its version odd meanwhile.
+    '''
+
+    def __init__(self, cache, index):
+        ''' Prepare to lock the set index of cache.
+        '''
+        self.cache = cache
+        self.index = index
+
+    def __enter__(self):
+        ''' Lock the set against threads, then against processes, and
+        recover it if the last writer died at work.
+        '''
+        self.cache.lock.acquire()
+        fcntl.lockf(self.cache.lock_fd, fcntl.LOCK_EX, 1, self.index)
+        if self.cache._version(self.index) & 1:
+            self.cache._recover(self.index)
+        self.cache._bump(self.index)
+
+    def __exit__(self, *exc_info):
+        ''' Unlock the set.
+        '''
+        self.cache._bump(self.index)
+        fcntl.lockf(self.cache.lock_fd, fcntl.LOCK_UN, 1, self.index)
+        self.cache.lock.release()
+
+
+def tracker_pid():
+    ''' Return the pid of the resource tracker of this process.
+    '''
+    resource_tracker.ensure_running()
+    return getattr(resource_tracker._resource_tracker, "_pid", None) or 0
+
+
+def attach(name):
+    ''' Return the existing segment called name.
+    A resource tracker destroys the segments registered with it when
+    the processes using it are gone. Attaching registers the segment
+    too: keep it out of the tracker, unless it is the one of the creator
+    (a forked worker shares the tracker of its parent).
+    '''
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        shm = shared_memory.SharedMemory(name)
+        creator = HEADER.unpack_from(shm.buf, 0)[5]
+        if creator != tracker_pid():
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
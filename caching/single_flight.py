@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+'''
+This module contains the SingleFlight and AsyncSingleFlight classes,
+used by the caches to coalesce concurrent loads of the same key.
+While a call for a key is in flight, every other caller asking for the
+same key waits for its outcome instead of running the call again.
+'''
+import asyncio
+import threading
+
+
+class Call():
+    ''' Call is the outcome of one call in flight, shared by its waiters.
+    '''
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        ''' Initialize a call not done yet.
+        '''
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    ''' SingleFlight coalesces the calls made by threads.
+    '''
+
+    def __init__(self):
+        ''' Initialize with no call in flight.
+        '''
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn):
+        ''' Return fn(), unless a call for key is already in flight: then
+        wait for it and return its result (or raise its exception).
+        '''
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result
+
+
+class AsyncSingleFlight():
+    ''' AsyncSingleFlight coalesces the calls made by coroutines.
+    A call runs in a task of its own: cancelling a waiter cancels its
+    wait, not the call. A call forgotten while in flight runs on for
+    its waiters, but later callers start a new one.
+    '''
+
+    def __init__(self):
+        ''' Initialize with no call in flight.
+        '''
+        self.calls = {}
+
+    async def _run(self, key, fn):
+        ''' Await fn() and forget the call once it is done.
+        '''
+        try:
+            return await fn()
+        finally:
+            if self.calls.get(key) is asyncio.current_task():
+                del self.calls[key]
+
+    async def do(self, key, fn):
+        ''' Return await fn(), unless a call for key is already in
+        flight: then wait for it and return its result (or raise its
+        exception).
+        '''
+        task = self.calls.get(key)
+        if task is None:
+            task = self.calls[key] = asyncio.ensure_future(
+                self._run(key, fn))
+            task.add_done_callback(self._done)
+        return await asyncio.shield(task)
+
+    def current(self, key):
+        ''' Tell whether the running call, which fn awaits in, is
+        still the call of key: it was not forgotten meanwhile.
+        '''
+        return self.calls.get(key) is asyncio.current_task()
+
+    def forget(self, key):
+        ''' Make the next call for key start a new call, the one in
+        flight (if any) running on for its waiters.
+        '''
+        self.calls.pop(key, None)
+
+    def clear(self):
+        ''' Forget every call in flight.
+        '''
+        self.calls.clear()
+
+    async def close(self):
+        ''' Cancel the calls in flight and wait for them to stop;
+        their waiters get CancelledError.
+        '''
+        tasks = list(self.calls.values())
+        self.calls.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    @staticmethod
+    def _done(task):
+        ''' Retrieve the exception of a call, so a call every waiter of
+        which was cancelled is not reported as an unretrieved error.
+        '''
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self):
+        ''' Return the number of calls in flight.
+        '''
+        return len(self.calls)
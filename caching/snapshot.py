@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''
+This module writes and reads the snapshots BaseCaching.dump and
+BaseCaching.load use to warm a cache up after a restart.
+
+A snapshot is a binary file made of:
+  - a header: magic, version, number of entries and the lengths of the
+    blocks that follow
+  - the name of the policy class and its pickled state (see
+    EvictionPolicy.dump)
+  - the keys, pickled together as one list, in the order of the policy
+  - a fixed-size record per key: offset and length of its pickled item,
+    size of the item, remaining time to live (NaN if none), the
+    policy flags of the key and whether it is a negative entry
+  - the pickled items, one after the other.
+
+Reading maps the file in memory, unpickles the keys in one go and
+unpacks the records with struct.iter_unpack; an item is only unpickled
+the first time it is read, straight from the mapping.
+'''
+import math
+import mmap
+import os
+import pickle
+import struct
+
+MAGIC = b"CSNP"
+VERSION = 2
+# magic, version, entries, name length, state length, keys length
+HEADER = struct.Struct("<4sHQHIQ")
+# item offset, item length, size, time to live, policy flags, negative
+RECORD = struct.Struct("<QQqdq?")
+
+# Stands in cache_data for an item not unpickled yet
+PENDING = object()
+
+
+def write(cache, path, now):
+    ''' Write a snapshot of cache to path, atomically.
+    now is the current time of the cache's clock.
+    '''
+    state, entries = cache.policy.dump()
+    name = type(cache.policy).__name__.encode()
+    state = pickle.dumps(state, pickle.HIGHEST_PROTOCOL)
+    keys = pickle.dumps([key for key, _ in entries], pickle.HIGHEST_PROTOCOL)
+    items = []
+    for key, _ in entries:
+        if cache.cache_data[key] is PENDING:
+            # Still in the snapshot it was loaded from
+            items.append(cache.pending_item(key))
+        else:
+            items.append(pickle.dumps(cache.cache_data[key],
+                                      pickle.HIGHEST_PROTOCOL))
+    offset = (HEADER.size + len(name) + len(state) + len(keys) +
+              RECORD.size * len(entries))
+    temp = "{}.{}.tmp".format(path, os.getpid())
+    with open(temp, "wb") as snapshot:
+        snapshot.write(HEADER.pack(MAGIC, VERSION, len(entries), len(name),
+                                   len(state), len(keys)))
+        snapshot.write(name)
+        snapshot.write(state)
+        snapshot.write(keys)
+        for (key, flags), item in zip(entries, items):
+            deadline = cache.expires.get(key)
+            snapshot.write(RECORD.pack(
+                offset, len(item), cache.sizes.get(key, 0),
+                math.nan if deadline is None else deadline - now, flags,
+                key in cache.negatives))
+            offset += len(item)
+        for item in items:
+            snapshot.write(item)
+    os.replace(temp, path)
+
+
+class Snapshot():
+    ''' Snapshot is a snapshot file mapped in memory.
+    keys lists its keys in the order of the policy and records their
+    (item offset, item length, size, ttl, flags, negative), ttl being
+    NaN for the items that do not expire.
+    '''
+
+    def __init__(self, path):
+        ''' Map the file at path and read everything but the items.
+        '''
+        with open(path, "rb") as snapshot:
+            self.map = mmap.mmap(snapshot.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+        magic, version, count, name_len, state_len, keys_len = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise ValueError("{} is not a cache snapshot".format(path))
+        offset = HEADER.size
+        self.policy = self.map[offset:offset + name_len].decode()
+        offset += name_len
+        self.state = pickle.loads(self.map[offset:offset + state_len])
+        offset += state_len
+        self.keys = pickle.loads(self.map[offset:offset + keys_len])
+        offset += keys_len
+        self.records = list(RECORD.iter_unpack(
+            self.map[offset:offset + RECORD.size * count]))
+
+    def raw(self, record):
+        ''' Return the pickled item of record.
+        '''
+        return self.map[record[0]:record[0] + record[1]]
+
+    def item(self, record):
+        ''' Return the item of record.
+        '''
+        return pickle.loads(self.map[record[0]:record[0] + record[1]])
+
+    def close(self):
+        ''' Unmap the file.
+        '''
+        self.map.close()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+'''
+Tests for the AdaptivePolicy class and its ghosts.
+'''
+import os
+import random
+import tempfile
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+AdaptivePolicy = __import__('adaptive_policy').AdaptivePolicy
+policies = __import__('policies')
+cache_simulator = __import__('cache_simulator')
+
+
+def replay(cache, trace):
+    ''' Look every key of trace up, caching it on a miss, and return
+    the hit ratio.
+    '''
+    hits = 0
+    for key in trace:
+        if cache.get(key) is None:
+            cache.put(key, key)
+        else:
+            hits += 1
+    return hits / len(trace)
+
+
+class TestAdaptivePolicy(unittest.TestCase):
+    '''
+    Making sure the live policy follows the workload without losing
+    the cached items.
+    '''
+
+    def test_follows_the_workload(self):
+        '''
+        A loop larger than the cache calls for MRU, a Zipf trace for a
+        recency or frequency based policy.
+        '''
+        policy = AdaptivePolicy(window=1000)
+        cache = BaseCaching(policy, max_items=100)
+        loop = cache_simulator.loop_trace(10000, 150)
+        replay(cache, loop[:5000])
+        self.assertEqual(policy.name, "MRUPolicy")
+        self.assertGreater(replay(cache, loop[5000:]), 0.5)
+        replay(cache, cache_simulator.zipf_trace(10000, 1000))
+        self.assertIn(policy.name, ("LRUPolicy", "LFUPolicy"))
+        stats = policy.stats()
+        self.assertGreaterEqual(stats["switches"], 2)
+        self.assertEqual(set(stats["ghost_hit_ratios"]),
+                         {"LRUPolicy", "FIFOPolicy", "MRUPolicy",
+                          "LFUPolicy"})
+
+    def test_switch_keeps_the_items(self):
+        '''
+        Switching rebuilds the policy only, every key stays tracked.
+        '''
+        rng = random.Random(0)
+        policy = AdaptivePolicy(window=50)
+        cache = BaseCaching(policy, max_items=20)
+        for _ in range(5000):
+            key = rng.randrange(60)
+            if rng.random() < 0.5:
+                cache.put(key, key)
+            else:
+                cache.get(key)
+            if rng.random() < 0.01:
+                policy.switch(rng.randrange(len(policy.candidates)))
+        self.assertEqual(set(policy), set(cache.cache_data))
+        self.assertEqual(len(policy), len(cache.cache_data))
+        self.assertTrue(all(cache.cache_data[key] == key
+                            for key in cache.cache_data))
+
+    def test_switch_seeds_from_the_ghost(self):
+        '''
+        The new live policy takes the state its ghost had.
+        '''
+        policy = AdaptivePolicy(candidates=(policies.LRUPolicy,
+                                            policies.LFUPolicy))
+        cache = BaseCaching(policy, max_items=3)
+        cache.put("A", 1)
+        cache.put("B", 2)
+        for _ in range(3):
+            cache.get("A")
+        cache.get("B")
+        cache.put("C", 3)
+        policy.switch(1)
+        self.assertEqual(policy.live.nodes["A"].freq, 4)
+        self.assertEqual(policy.live.nodes["C"].freq, 1)
+        cache.put("D", 4)
+        self.assertEqual(sorted(cache.cache_data), ["A", "B", "D"])
+
+    def test_sampled_ghosts(self):
+        '''
+        Sampled ghosts are smaller and still pick the right policy.
+        '''
+        policy = AdaptivePolicy(window=2000, sample=4)
+        cache = BaseCaching(policy, max_items=400)
+        replay(cache, cache_simulator.loop_trace(8000, 600))
+        self.assertEqual(policy.ghosts[0].policy.capacity, 100)
+        self.assertLessEqual(max(len(ghost.policy)
+                                 for ghost in policy.ghosts), 100)
+        self.assertEqual(policy.name, "MRUPolicy")
+
+    def test_snapshot(self):
+        '''
+        A snapshot brings the live policy back.
+        '''
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            policy = AdaptivePolicy()
+            cache = BaseCaching(policy, max_items=3)
+            cache.put_many({"A": 1, "B": 2, "C": 3})
+            policy.switch(2)
+            cache.dump(path)
+            reloaded = BaseCaching(AdaptivePolicy(), max_items=3)
+            reloaded.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(reloaded.policy.name, "MRUPolicy")
+        self.assertEqual(list(reloaded.policy), list(policy))
+
+
+if __name__ == "__main__":
+    unittest.main()
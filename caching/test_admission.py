@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+'''
+Tests for the TinyLFU admission filter and its doorkeeper.
+'''
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+TinyLFUAdmission = __import__('admission').TinyLFUAdmission
+Doorkeeper = __import__('frequency_sketch').Doorkeeper
+policies = __import__('policies')
+cache_simulator = __import__('cache_simulator')
+
+
+class TestDoorkeeper(unittest.TestCase):
+    '''
+    Checking the Bloom filter.
+    '''
+
+    def test_add(self):
+        '''
+        A key added is always found, add tells whether it was there.
+        '''
+        doorkeeper = Doorkeeper(1024)
+        self.assertFalse(doorkeeper.add("A"))
+        self.assertTrue(doorkeeper.add("A"))
+        for key in range(100):
+            doorkeeper.add(key)
+        self.assertTrue(all(key in doorkeeper for key in range(100)))
+        false_positives = sum(key in doorkeeper for key in range(100, 1100))
+        self.assertLess(false_positives, 50)
+        doorkeeper.clear()
+        self.assertNotIn("A", doorkeeper)
+
+
+class TestTinyLFUAdmission(unittest.TestCase):
+    '''
+    Making sure one-hit wonders stay out and popular keys get in.
+    '''
+
+    def test_doorkeeper_first(self):
+        '''
+        A key seen once is only in the doorkeeper.
+        '''
+        admission = TinyLFUAdmission(64)
+        admission.record("A")
+        self.assertEqual(admission.sketch.additions, 0)
+        self.assertEqual(admission.frequency("A"), 1)
+        admission.record("A")
+        admission.record("A")
+        self.assertEqual(admission.frequency("A"), 3)
+        self.assertEqual(admission.frequency("B"), 0)
+
+    def test_aging(self):
+        '''
+        After a sample of requests, counts are halved and the
+        doorkeeper forgets the keys seen once.
+        '''
+        admission = TinyLFUAdmission(16)
+        for _ in range(9):
+            admission.record("A")
+        admission.record("B")
+        sample = admission.sketch.sample_size
+        for key in range(sample - admission.requests - 1):
+            admission.record(("other", key % 2))
+        self.assertEqual(admission.frequency("A"), 9)
+        admission.record("C")
+        self.assertEqual(admission.requests, sample // 2)
+        self.assertEqual(admission.frequency("A"), 4)
+        self.assertEqual(admission.frequency("B"), 0)
+
+    def test_one_hit_wonders_stay_out(self):
+        '''
+        Keys seen once do not evict the popular ones.
+        '''
+        cache = BaseCaching(policies.LRUPolicy(), max_items=4,
+                            admission=TinyLFUAdmission())
+        for _ in range(3):
+            for key in "ABCD":
+                if cache.get(key) is None:
+                    cache.put(key, key)
+        for key in range(100):
+            cache.put(key, key)
+        self.assertEqual(sorted(cache.cache_data), ["A", "B", "C", "D"])
+        stats = cache.stats()
+        self.assertEqual((stats["rejected"], stats["admitted"]), (100, 0))
+        self.assertEqual(stats["evictions"], 0)
+
+    def test_popular_key_gets_in(self):
+        '''
+        A new key requested more than the victim replaces it.
+        '''
+        cache = BaseCaching(policies.LRUPolicy(), max_items=2,
+                            admission=TinyLFUAdmission())
+        cache.put("A", 1)
+        cache.put("B", 2)
+        for _ in range(3):
+            cache.get("C")
+        cache.put("C", 3)
+        self.assertEqual(sorted(cache.cache_data), ["B", "C"])
+        self.assertEqual(cache.stats()["admitted"], 1)
+        cache.put_many({"D": 4, "C": 30})
+        self.assertEqual(cache.get("C"), 30)
+        self.assertNotIn("D", cache.cache_data)
+
+    def test_shards(self):
+        '''
+        Every shard of a ConcurrentCache has its own filter.
+        '''
+        cache = ConcurrentCache(shards=2, max_items=16,
+                                admission=TinyLFUAdmission)
+        self.assertIsNot(cache.shards[0].admission,
+                         cache.shards[1].admission)
+        for key in range(36):
+            cache.put(key, key)
+        stats = cache.stats()
+        self.assertEqual(stats["items"], 16)
+        self.assertEqual(stats["rejected"], 20)
+
+    def test_scan_resistance(self):
+        '''
+        The filter raises the hit ratio of LRU on a trace full of
+        one-off keys.
+        '''
+        trace = cache_simulator.scan_trace(20000, 1000)
+        ratios = {}
+        for name in ("LRU", "LRU+TinyLFU"):
+            cache = cache_simulator.POLICIES[name](100)
+            hits = 0
+            for key in trace:
+                if cache.get(key) is None:
+                    cache.put(key, key)
+                else:
+                    hits += 1
+            ratios[name] = hits / len(trace)
+        self.assertGreater(ratios["LRU+TinyLFU"], ratios["LRU"] * 1.2)
+
+
+if __name__ == "__main__":
+    unittest.main()
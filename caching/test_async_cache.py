@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+'''
+Tests for the AsyncCache class.
+'''
+import asyncio
+import functools
+import threading
+import unittest
+AsyncCache = __import__('async_cache').AsyncCache
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+LRUCache = __import__('3-lru_cache').LRUCache
+NOT_FOUND = __import__('base_caching').NOT_FOUND
+
+
+class Loader():
+    ''' Loader counts its calls and returns the key lowered once its
+    gate is open.
+    '''
+
+    def __init__(self, error=None):
+        ''' Initialize a closed gate, bound to the running loop.
+        '''
+        self.calls = 0
+        self.gate = asyncio.Event()
+        self.error = error
+
+    async def __call__(self, key):
+        ''' Wait for the gate, then return the item (or raise error).
+        '''
+        self.calls += 1
+        await self.gate.wait()
+        if self.error is not None:
+            raise self.error
+        return key.lower()
+
+
+def run(test):
+    ''' Run the coroutine function test in a new event loop.
+    '''
+    return asyncio.run(test())
+
+
+class TestAsyncCache(unittest.TestCase):
+    '''
+    Making sure coroutines share loads and never cache stale items.
+    '''
+
+    def test_hits_and_misses(self):
+        '''
+        A miss loads and caches the item, the next call hits.
+        '''
+        async def test():
+            cache = AsyncCache()
+            loader = Loader()
+            loader.gate.set()
+            self.assertEqual(await cache.get_or_load("A", loader), "a")
+            self.assertEqual(await cache.get_or_load("A", loader), "a")
+            self.assertEqual(cache.get("A"), "a")
+            self.assertEqual(loader.calls, 1)
+            self.assertEqual(len(cache), 1)
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["loads"]), (2, 1))
+        run(test)
+
+    def test_misses_coalesce(self):
+        '''
+        Concurrent misses on a key await one load.
+        '''
+        async def test():
+            cache = AsyncCache()
+            loader = Loader()
+            tasks = [asyncio.ensure_future(cache.get_or_load("A", loader))
+                     for _ in range(10)]
+            await asyncio.sleep(0)
+            self.assertEqual(cache.stats()["in_flight"], 1)
+            loader.gate.set()
+            self.assertEqual(await asyncio.gather(*tasks), ["a"] * 10)
+            self.assertEqual(loader.calls, 1)
+            stats = cache.stats()
+            self.assertEqual((stats["coalesced"], stats["in_flight"]),
+                             (9, 0))
+        run(test)
+
+    def test_cancelled_waiter(self):
+        '''
+        Cancelling the coroutine that started a load, or every waiter,
+        leaves the load running: its item is cached.
+        '''
+        async def test():
+            cache = AsyncCache()
+            loader = Loader()
+            first = asyncio.ensure_future(cache.get_or_load("A", loader))
+            second = asyncio.ensure_future(cache.get_or_load("A", loader))
+            await asyncio.sleep(0)
+            first.cancel()
+            await asyncio.sleep(0)
+            loader.gate.set()
+            self.assertEqual(await second, "a")
+            self.assertTrue(first.cancelled())
+            with self.assertRaises(asyncio.TimeoutError):
+                await asyncio.wait_for(
+                    cache.get_or_load("B", Loader()), 0.01)
+            self.assertEqual(cache.stats()["in_flight"], 1)
+            self.assertEqual(loader.calls, 1)
+            await cache.close()
+            self.assertEqual(cache.stats()["in_flight"], 0)
+            self.assertIsNone(cache.get("B"))
+        run(test)
+
+    def test_errors_are_shared(self):
+        '''
+        The waiters get the exception of the load and the next miss
+        loads again.
+        '''
+        async def test():
+            cache = AsyncCache()
+            loader = Loader(KeyError("A"))
+            tasks = [asyncio.ensure_future(cache.get_or_load("A", loader))
+                     for _ in range(3)]
+            await asyncio.sleep(0)
+            loader.gate.set()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            self.assertTrue(all(isinstance(error, KeyError)
+                                for error in results))
+            loader.error = None
+            self.assertEqual(await cache.get_or_load("A", loader), "a")
+            self.assertEqual(loader.calls, 2)
+        run(test)
+
+    def test_stale_loads_are_dropped(self):
+        '''
+        A key written or deleted during its load keeps what was done;
+        the waiters still get the item loaded.
+        '''
+        async def test():
+            cache = AsyncCache()
+            loader = Loader()
+            put = asyncio.ensure_future(cache.get_or_load("A", loader))
+            deleted = asyncio.ensure_future(cache.get_or_load("B", loader))
+            await asyncio.sleep(0)
+            cache.put("A", "fresh")
+            cache.delete("B")
+            # A miss after the delete does not join the stale load
+            reloaded = asyncio.ensure_future(cache.get_or_load("B", loader))
+            await asyncio.sleep(0)
+            loader.gate.set()
+            self.assertEqual(await asyncio.gather(put, deleted, reloaded),
+                             ["a", "b", "b"])
+            self.assertEqual(cache.get("A"), "fresh")
+            self.assertEqual(cache.get("B"), "b")
+            self.assertEqual(loader.calls, 3)
+            self.assertEqual(cache.stats()["stale"], 2)
+        run(test)
+
+    def test_ttl(self):
+        '''
+        The loaded item expires after ttl, the default one of the
+        wrapper or the one of the call.
+        '''
+        now = [0]
+
+        async def test():
+            cache = AsyncCache(LRUCache(clock=lambda: now[0]), ttl=5)
+            loader = Loader()
+            loader.gate.set()
+            await cache.get_or_load("A", loader)
+            await cache.get_or_load("B", loader, ttl=20)
+            now[0] = 10
+            self.assertIsNone(cache.get("A"))
+            self.assertEqual(cache.get("B"), "b")
+            self.assertEqual(await cache.get_or_load("A", loader), "a")
+            self.assertEqual(loader.calls, 3)
+        run(test)
+
+    def test_blocking_loader(self):
+        '''
+        A plain function loads in the executor, not in the event loop,
+        and None items are not cached.
+        '''
+        threads = []
+
+        def loader(key):
+            ''' Load key in whatever thread runs it. '''
+            threads.append(threading.current_thread())
+            return None if key == "N" else key.lower()
+
+        async def test():
+            cache = AsyncCache(ConcurrentCache(shards=4, max_items=8))
+            self.assertEqual(await cache.get_or_load("A", loader), "a")
+            self.assertIsNone(await cache.get_or_load("N", loader))
+            self.assertIsNone(await cache.get_or_load(None, loader))
+            self.assertEqual(len(cache), 1)
+        run(test)
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(threading.main_thread(), threads)
+
+    def test_wrapped_coroutine_loader(self):
+        '''
+        A lambda or partial returning a coroutine has it awaited, and
+        the item it returns is cached, not the coroutine.
+        '''
+        async def fetch(key, suffix=""):
+            ''' Load key. '''
+            return key.lower() + suffix
+
+        async def test():
+            cache = AsyncCache()
+            self.assertEqual(
+                await cache.get_or_load("A", lambda key: fetch(key)), "a")
+            self.assertEqual(await cache.get_or_load(
+                "B", functools.partial(fetch, suffix="!")), "b!")
+            self.assertEqual(cache.cache.cache_data, {"A": "a", "B": "b!"})
+        run(test)
+
+    def test_negative_entries(self):
+        '''
+        With a negative_ttl in the cache, a None loaded is cached as
+        NOT_FOUND for that long, whatever the ttl of the wrapper.
+        '''
+        now = [0]
+        calls = []
+
+        def loader(key):
+            ''' Count the loads, find nothing. '''
+            calls.append(key)
+
+        async def test():
+            for inner in (LRUCache(negative_ttl=5, clock=lambda: now[0]),
+                          ConcurrentCache(shards=2, negative_ttl=5)):
+                cache = AsyncCache(inner, ttl=60)
+                self.assertIs(await cache.get_or_load("A", loader),
+                              NOT_FOUND)
+                self.assertIs(await cache.get_or_load("A", loader),
+                              NOT_FOUND)
+                self.assertEqual(cache.stats()["negative_hits"], 1)
+            self.assertEqual(calls, ["A", "A"])
+            now[0] = 5
+            cache = AsyncCache(LRUCache(negative_ttl=5,
+                                        clock=lambda: now[0]), ttl=60)
+            await cache.get_or_load("A", loader)
+            now[0] = 10
+            self.assertIsNone(cache.get("A"))
+            self.assertEqual(len(calls), 3)
+        run(test)
+
+
+if __name__ == "__main__":
+    unittest.main()
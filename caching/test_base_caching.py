@@ -0,0 +1,565 @@
+#!/usr/bin/env python3
+'''
+Tests for the BaseCaching storage core.
+'''
+import contextlib
+import io
+import pickle
+import random
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+print_discard = __import__('base_caching').print_discard
+NOT_FOUND = __import__('base_caching').NOT_FOUND
+percentile = __import__('latency_histogram').percentile
+LRUCache = __import__('3-lru_cache').LRUCache
+FIFOCache = __import__('1-fifo_cache').FIFOCache
+policies = __import__('policies')
+TinyLFUAdmission = __import__('admission').TinyLFUAdmission
+
+
+class TestBaseCaching(unittest.TestCase):
+    '''
+    Checking the storage core keeps its original contract.
+    '''
+
+    def test_no_policy(self):
+        '''
+        Without a policy put and get still have to be implemented.
+        '''
+        cache = BaseCaching()
+        with self.assertRaises(NotImplementedError):
+            cache.put("A", 1)
+        with self.assertRaises(NotImplementedError):
+            cache.get("A")
+
+    def test_capacity_from_max_items(self):
+        '''
+        A policy created without a capacity gets MAX_ITEMS.
+        '''
+        cache = BaseCaching(policies.ARCPolicy())
+        self.assertEqual(cache.policy.capacity, BaseCaching.MAX_ITEMS)
+
+    def test_none_is_ignored(self):
+        '''
+        None keys and items are neither stored nor tracked.
+        '''
+        cache = BaseCaching(policies.LRUPolicy(), max_items=2)
+        cache.put(None, 1)
+        cache.put("A", None)
+        self.assertIsNone(cache.get(None))
+        self.assertEqual(cache.cache_data, {})
+        self.assertEqual(len(cache.policy), 0)
+
+
+class TestCapacity(unittest.TestCase):
+    '''
+    Checking per-instance item and byte capacities.
+    '''
+
+    def test_max_items_per_instance(self):
+        '''
+        max_items only changes the capacity of its own instance.
+        '''
+        small = LRUCache(max_items=2)
+        default = LRUCache()
+        for key in "ABCDE":
+            small.put(key, key)
+            default.put(key, key)
+        self.assertEqual(sorted(small.cache_data), ["D", "E"])
+        self.assertEqual(len(default.cache_data), BaseCaching.MAX_ITEMS)
+        self.assertEqual(small.policy.capacity, 2)
+        self.assertEqual(BaseCaching.MAX_ITEMS, 4)
+
+    def test_max_bytes(self):
+        '''
+        The total size of the items stays within max_bytes, however
+        many items that means.
+        '''
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        self.assertIsNone(cache.MAX_ITEMS)
+        for key in "ABCDE":
+            cache.put(key, b"xx")
+        self.assertEqual(len(cache.cache_data), 5)
+        cache.put("F", b"xxxxx")
+        self.assertEqual(sorted(cache.cache_data), ["D", "E", "F"])
+        self.assertEqual(cache.current_bytes, 9)
+        self.assertEqual(cache.current_bytes,
+                         sum(len(v) for v in cache.cache_data.values()))
+
+    def test_item_larger_than_budget(self):
+        '''
+        An item that can never fit is not cached and evicts nothing.
+        '''
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put("A", b"x")
+        cache.put("B", b"x" * 11)
+        self.assertEqual(list(cache.cache_data), ["A"])
+
+    def test_oversized_update_drops_the_old_item(self):
+        '''
+        Replacing an item by one that can never fit drops the key, so
+        the old item is not served any more.
+        '''
+        for batched in (False, True):
+            with self.subTest(batched=batched):
+                cache = LRUCache(max_bytes=10, sizeof=len)
+                cache.put("A", b"xxx")
+                cache.put("B", b"xxx")
+                if batched:
+                    cache.put_many({"A": b"x" * 11, "B": b"yyy"})
+                else:
+                    cache.put("A", b"x" * 11)
+                self.assertIsNone(cache.get("A"))
+                self.assertEqual(list(cache.policy), ["B"])
+                self.assertEqual(cache.current_bytes, 3)
+
+    def test_growing_update_evicts(self):
+        '''
+        Replacing an item by a larger one evicts other keys if needed.
+        '''
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        for key in "ABC":
+            cache.put(key, b"xxx")
+        cache.put("C", b"x" * 7)
+        self.assertEqual(sorted(cache.cache_data), ["B", "C"])
+        self.assertEqual(cache.current_bytes, 10)
+
+    def test_items_and_bytes(self):
+        '''
+        With both limits the first one reached triggers evictions.
+        '''
+        cache = LRUCache(max_items=3, max_bytes=100, sizeof=len)
+        for key in "ABCD":
+            cache.put(key, b"x")
+        self.assertEqual(sorted(cache.cache_data), ["B", "C", "D"])
+
+    def test_byte_bounded_policy_capacity(self):
+        '''
+        A byte bounded policy learns how many items fit.
+        '''
+        cache = BaseCaching(policies.WTinyLFUPolicy(), max_bytes=50,
+                            sizeof=len)
+        for key in range(20):
+            cache.put(key, b"x" * 5)
+        self.assertEqual(len(cache.cache_data), 10)
+        self.assertEqual(cache.policy.capacity, 10)
+        self.assertEqual(set(cache.policy), set(cache.cache_data))
+
+
+class FakeClock():
+    ''' FakeClock is a clock that only moves when told to.
+    '''
+
+    def __init__(self):
+        ''' Start at time 0.
+        '''
+        self.now = 0.0
+
+    def __call__(self):
+        ''' Return the current time.
+        '''
+        return self.now
+
+
+class TestTimeToLive(unittest.TestCase):
+    '''
+    Checking items expire lazily on read and through the timing wheel.
+    '''
+
+    def setUp(self):
+        '''
+        Build an LRU cache driven by a fake clock.
+        '''
+        self.clock = FakeClock()
+        self.cache = LRUCache(max_items=100, clock=self.clock)
+
+    def test_lazy_expiry_on_get(self):
+        '''
+        An expired item is reported missing as soon as it is read.
+        '''
+        self.cache.put("A", 1, ttl=10)
+        self.cache.put("B", 2)
+        self.clock.now = 9.9
+        self.assertEqual(self.cache.get("A"), 1)
+        self.clock.now = 10
+        self.assertIsNone(self.cache.get("A"))
+        self.assertEqual(self.cache.get("B"), 2)
+        self.assertNotIn("A", self.cache.policy)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_default_ttl(self):
+        '''
+        The cache's ttl applies to items put without one.
+        '''
+        cache = LRUCache(ttl=5, clock=self.clock)
+        cache.put("A", 1)
+        cache.put("B", 2, ttl=50)
+        self.clock.now = 6
+        self.assertIsNone(cache.get("A"))
+        self.assertEqual(cache.get("B"), 2)
+
+    def test_update_resets_ttl(self):
+        '''
+        Putting a key again replaces its deadline, or drops it.
+        '''
+        self.cache.put("A", 1, ttl=10)
+        self.cache.put("B", 1, ttl=10)
+        self.clock.now = 5
+        self.cache.put("A", 2, ttl=10)
+        self.cache.put("B", 2)
+        self.clock.now = 12
+        self.cache.reap()
+        self.assertEqual(self.cache.get("A"), 2)
+        self.clock.now = 1000
+        self.assertEqual(self.cache.get("B"), 2)
+        self.assertIsNone(self.cache.get("A"))
+
+    def test_reap_without_reads(self):
+        '''
+        Expired items are reaped by the wheel, without being read.
+        '''
+        for key in range(50):
+            self.cache.put(key, key, ttl=key)
+        self.clock.now = 25.5
+        self.cache.put("late", 0)
+        # The wheel works by whole ticks: 25 waits for the next one
+        self.assertEqual(len(self.cache.cache_data), 26)
+        self.assertEqual(len(self.cache.policy), 26)
+        self.assertEqual(self.cache.stats()["expirations"], 25)
+        self.assertEqual(min(k for k in self.cache.cache_data
+                             if k != "late"), 25)
+        self.assertIsNone(self.cache.get(25))
+
+    def test_evicted_key_is_not_expired(self):
+        '''
+        A key evicted before its deadline leaves nothing behind.
+        '''
+        cache = LRUCache(max_items=1, clock=self.clock)
+        cache.put("A", 1, ttl=1)
+        cache.put("B", 2)
+        self.clock.now = 10
+        cache.reap()
+        self.assertEqual(cache.cache_data, {"B": 2})
+        self.assertEqual(cache.stats()["expirations"], 0)
+
+
+class TestStats(unittest.TestCase):
+    '''
+    Checking the eviction listeners and the counters of stats().
+    '''
+
+    def test_counters(self):
+        '''
+        Every get and put is counted by its outcome.
+        '''
+        cache = LRUCache(max_items=2)
+        for key in "ABAC":
+            cache.put(key, key)
+        cache.get("A")
+        cache.get("B")
+        cache.get(None)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+        self.assertEqual((stats["inserts"], stats["updates"]), (3, 1))
+        self.assertEqual(stats["evictions"], 1)
+        self.assertNotIn("get_ns", stats)
+
+    def test_listeners(self):
+        '''
+        Listeners hear about evicted and expired items, nothing is
+        printed by default.
+        '''
+        clock = FakeClock()
+        cache = LRUCache(max_items=2, clock=clock)
+        events = []
+
+        def listener(key, item, reason):
+            ''' Record the event. '''
+            events.append((key, item, reason))
+
+        cache.add_listener(listener)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            cache.put("A", 1, ttl=5)
+            cache.put("B", 2)
+            cache.put("C", 3)
+            clock.now = 10
+            cache.put("C", 4, ttl=1)
+            cache.get("C")
+            clock.now = 20
+            cache.get("C")
+        self.assertEqual(out.getvalue(), "")
+        self.assertEqual(events, [("A", 1, "evicted"), ("C", 4, "expired")])
+        cache.remove_listener(listener)
+        cache.put("D", 5)
+        cache.put("E", 6)
+        self.assertEqual(len(events), 2)
+
+    def test_print_discard(self):
+        '''
+        print_discard prints evictions as the caches used to.
+        '''
+        cache = LRUCache(max_items=1)
+        cache.add_listener(print_discard)
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            cache.put("A", 1)
+            cache.put("B", 2)
+        self.assertEqual(out.getvalue(), "DISCARD: A\n")
+
+    def test_sampled_latencies(self):
+        '''
+        One call out of every sample lands in the histograms.
+        '''
+        cache = LRUCache(max_items=8, sample=10)
+        for key in range(100):
+            cache.put(key, key)
+            cache.get(key)
+        stats = cache.stats()
+        self.assertEqual(sum(stats["get_ns"]), 10)
+        self.assertEqual(sum(stats["put_ns"]), 10)
+        self.assertEqual(stats["hits"], 100)
+        self.assertIsNotNone(percentile(stats["get_ns"], 0.99))
+
+
+class TestBatch(unittest.TestCase):
+    '''
+    Checking get_many, put_many and delete_many.
+    '''
+
+    def test_get_many(self):
+        '''
+        get_many returns the keys found and refreshes them once.
+        '''
+        cache = LRUCache(max_items=3)
+        cache.put_many({"A": 1, "B": 2, "C": 3})
+        self.assertEqual(cache.get_many(["A", "X", "A", None]), {"A": 1})
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        cache.put("D", 4)
+        self.assertEqual(sorted(cache.cache_data), ["A", "C", "D"])
+
+    def test_put_many_matches_put(self):
+        '''
+        For LRU a batch ends up like the same puts made one by one,
+        the cached keys first.
+        '''
+        rng = random.Random(0)
+        batched = LRUCache(max_items=8)
+        single = LRUCache(max_items=8)
+        for _ in range(300):
+            batch = [(rng.randrange(20), rng.randrange(5))
+                     for _ in range(rng.randrange(6))]
+            batched.put_many(batch)
+            batch = dict(batch)
+            for key in sorted(batch, key=lambda k: k not in single.cache_data):
+                single.put(key, batch[key])
+            self.assertEqual(batched.cache_data, single.cache_data)
+            self.assertEqual(list(batched.policy), list(single.policy))
+
+    def test_put_many_keeps_mru_and_lifo_victims(self):
+        '''
+        For MRU and LIFO, whose victims are the keys just put, a batch
+        ends up like the same puts made one by one, in order.
+        '''
+        for policy_class in (policies.MRUPolicy, policies.LIFOPolicy):
+            with self.subTest(policy=policy_class.__name__):
+                cache = BaseCaching(policy_class(), max_items=4)
+                cache.put_many({"A": 1, "B": 2, "C": 3})
+                cache.put_many({"D": 4, "E": 5})
+                self.assertEqual(sorted(cache.cache_data),
+                                 ["A", "B", "C", "E"])
+                rng = random.Random(0)
+                batched = BaseCaching(policy_class(), max_items=8)
+                single = BaseCaching(policy_class(), max_items=8)
+                for _ in range(300):
+                    batch = dict((rng.randrange(20), rng.randrange(5))
+                                 for _ in range(rng.randrange(6)))
+                    batched.put_many(batch)
+                    for key, item in batch.items():
+                        single.put(key, item)
+                    self.assertEqual(batched.cache_data, single.cache_data)
+                    self.assertEqual(list(batched.policy),
+                                     list(single.policy))
+
+    def test_put_many_every_policy(self):
+        '''
+        Batches keep every policy in step with the storage.
+        '''
+        for policy_class in (policies.LRUPolicy, policies.LFUPolicy,
+                             policies.ClockPolicy, policies.SievePolicy,
+                             policies.TwoQueuePolicy, policies.ARCPolicy,
+                             policies.WTinyLFUPolicy):
+            rng = random.Random(1)
+            cache = BaseCaching(policy_class(), max_items=5)
+            with self.subTest(policy=policy_class.__name__):
+                for _ in range(300):
+                    keys = [rng.randrange(15) for _ in range(rng.randrange(9))]
+                    cache.put_many((key, key) for key in keys)
+                    cache.get_many(rng.randrange(15) for _ in range(3))
+                    cache.delete_many(rng.randrange(15) for _ in range(1))
+                    self.assertLessEqual(len(cache.cache_data), 5)
+                    self.assertEqual(set(cache.policy),
+                                     set(cache.cache_data))
+
+    def test_oversized_batch(self):
+        '''
+        A batch larger than the cache keeps its last keys.
+        '''
+        cache = LRUCache(max_items=2)
+        cache.put_many([("A", 1), ("B", 2), ("C", 3), (None, 4)])
+        self.assertEqual(cache.cache_data, {"B": 2, "C": 3})
+        cache = LRUCache(max_bytes=10, sizeof=len)
+        cache.put_many({"A": "xxxx", "B": "xxxx", "C": "xxxx",
+                        "D": "x" * 11})
+        self.assertEqual(sorted(cache.cache_data), ["B", "C"])
+        self.assertEqual(cache.current_bytes, 8)
+
+    def test_delete(self):
+        '''
+        Deleted keys leave the storage and the policy.
+        '''
+        cache = LRUCache()
+        events = []
+        cache.add_listener(lambda key, item, reason: events.append(
+            (key, reason)))
+        cache.put_many({"A": 1, "B": 2, "C": 3})
+        self.assertTrue(cache.delete("A"))
+        self.assertFalse(cache.delete("A"))
+        self.assertEqual(cache.delete_many(["B", "X", "C"]), 2)
+        self.assertEqual(cache.cache_data, {})
+        self.assertEqual(len(cache.policy), 0)
+        self.assertEqual(events, [("A", "deleted"), ("B", "deleted"),
+                                  ("C", "deleted")])
+        self.assertEqual(cache.stats()["deletes"], 3)
+
+    def test_fifo_cache(self):
+        '''
+        FIFOCache batches and deletes through its policy.
+        '''
+        cache = FIFOCache()
+        cache.put_many({"A": 1, "B": 2})
+        self.assertEqual(cache.get_many(["A", "B", "C"]), {"A": 1, "B": 2})
+        self.assertTrue(cache.delete("A"))
+        self.assertEqual(list(cache.cache_data), ["B"])
+        self.assertEqual(len(cache.policy), 1)
+
+
+class TestNegativeEntries(unittest.TestCase):
+    '''
+    Checking keys cached as known to have no item.
+    '''
+
+    def test_not_found_is_a_hit(self):
+        '''
+        NOT_FOUND is stored, returned and counted apart from misses.
+        '''
+        cache = LRUCache(max_items=10)
+        cache.put("A", NOT_FOUND)
+        self.assertIs(cache.get("A"), NOT_FOUND)
+        self.assertIsNone(cache.get("B"))
+        self.assertEqual(cache.get_many(["A", "B"]), {"A": NOT_FOUND})
+        self.assertFalse(NOT_FOUND)
+        self.assertEqual(repr(NOT_FOUND), "NOT_FOUND")
+        self.assertIs(pickle.loads(pickle.dumps(NOT_FOUND)), NOT_FOUND)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+        self.assertEqual((stats["negative"], stats["negative_hits"]),
+                         (1, 2))
+        cache.put("A", 1)
+        self.assertEqual(cache.get("A"), 1)
+        self.assertEqual(cache.stats()["negative"], 0)
+
+    def test_negative_ttl(self):
+        '''
+        Negative entries expire after negative_ttl, items after ttl.
+        '''
+        clock = FakeClock()
+        cache = LRUCache(ttl=60, negative_ttl=5, clock=clock)
+        cache.put("A", 1)
+        cache.put("B", NOT_FOUND)
+        cache.put("C", NOT_FOUND, ttl=30)
+        clock.now = 5
+        self.assertEqual(cache.get("A"), 1)
+        self.assertIsNone(cache.get("B"))
+        self.assertIs(cache.get("C"), NOT_FOUND)
+        self.assertEqual(cache.stats()["negative"], 1)
+
+    def test_negative_share(self):
+        '''
+        Past max_negative, a negative entry evicts the oldest one and
+        never an item.
+        '''
+        cache = LRUCache(max_items=4, max_negative=2)
+        events = []
+        cache.add_listener(lambda key, item, reason: events.append(
+            (key, item, reason)))
+        cache.put_many({"A": 1, "B": 2})
+        cache.put_many({"X": NOT_FOUND, "Y": NOT_FOUND})
+        cache.get("X")
+        cache.put("Z", NOT_FOUND)
+        self.assertEqual(sorted(cache.cache_data), ["A", "B", "Y", "Z"])
+        self.assertEqual(events, [("X", NOT_FOUND, "evicted")])
+        self.assertNotIn("X", cache.policy)
+        # Updating a negative key keeps the share
+        cache.put("Y", NOT_FOUND)
+        cache.put("C", 3)
+        self.assertEqual(cache.stats()["negative"], 2)
+        self.assertTrue(cache.delete("Z"))
+        cache.put_many({"Y": 4, "D": 5})
+        self.assertEqual(cache.stats()["negative"], 0)
+        disabled = LRUCache(max_negative=0)
+        disabled.put("A", NOT_FOUND)
+        self.assertEqual(disabled.cache_data, {})
+        # A key found missing does not keep its old item either
+        disabled.put("A", "alice")
+        disabled.put("A", NOT_FOUND)
+        self.assertIsNone(disabled.get("A"))
+        self.assertEqual(list(disabled.policy), [])
+
+    def test_rejected_negative_keeps_the_others(self):
+        '''
+        A negative entry too large, or rejected by the admission filter,
+        does not evict the oldest negative one.
+        '''
+        cache = BaseCaching(policies.LRUPolicy(), max_bytes=10,
+                            sizeof=lambda item: 1 if item is NOT_FOUND
+                            else 9, max_negative=1,
+                            admission=TinyLFUAdmission(1024))
+        cache.put("A", 1)
+        for _ in range(5):
+            cache.get("A")
+        cache.put("X", NOT_FOUND)
+        cache.put("Y", NOT_FOUND, size=11)
+        cache.put("Y", NOT_FOUND, size=5)
+        self.assertEqual(cache.stats()["rejected"], 1)
+        self.assertEqual(sorted(cache.cache_data), ["A", "X"])
+        self.assertEqual(cache.stats()["evictions"], 0)
+
+    def test_get_or_load_caches_none(self):
+        '''
+        With negative_ttl, a None loaded is cached as NOT_FOUND until
+        it expires; without it, None is not cached.
+        '''
+        clock = FakeClock()
+        calls = []
+
+        def loader(key):
+            ''' Count the loads, find nothing. '''
+            calls.append(key)
+
+        cache = LRUCache(negative_ttl=10, clock=clock)
+        self.assertIs(cache.get_or_load("A", loader), NOT_FOUND)
+        self.assertIs(cache.get_or_load("A", loader), NOT_FOUND)
+        self.assertEqual(calls, ["A"])
+        clock.now = 10
+        cache.get_or_load("A", loader)
+        self.assertEqual(calls, ["A", "A"])
+        plain = LRUCache()
+        self.assertIsNone(plain.get_or_load("A", loader))
+        self.assertIsNone(plain.get_or_load("A", loader))
+        self.assertEqual(len(calls), 4)
+        self.assertEqual(plain.cache_data, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
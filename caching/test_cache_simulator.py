@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+'''
+Tests for the trace-driven cache simulator.
+'''
+import os
+import tempfile
+import unittest
+cache_simulator = __import__('cache_simulator')
+
+
+class TestTraces(unittest.TestCase):
+    '''
+    Checking the synthetic traces and the trace file loader.
+    '''
+
+    def test_zipf_is_skewed_and_reproducible(self):
+        '''
+        The most popular key shows up far more often than the median.
+        '''
+        trace = cache_simulator.zipf_trace(10000, 1000)
+        self.assertEqual(trace, cache_simulator.zipf_trace(10000, 1000))
+        self.assertGreater(trace.count(0), 20 * trace.count(500) + 1)
+
+    def test_scan_keys_are_one_off(self):
+        '''
+        Scan keys are never seen twice.
+        '''
+        trace = cache_simulator.scan_trace(5000, 100)
+        scans = [key for key in trace if key >= 100]
+        self.assertEqual(len(scans), len(set(scans)))
+        self.assertTrue(2000 < len(scans) < 3000)
+
+    def test_load_trace(self):
+        '''
+        The first field of every non-empty line is a key.
+        '''
+        with tempfile.NamedTemporaryFile("w", delete=False) as trace_file:
+            trace_file.write("a 10\n\nb\n  a\n")
+        try:
+            self.assertEqual(cache_simulator.load_trace(trace_file.name),
+                             ["a", "b", "a"])
+        finally:
+            os.remove(trace_file.name)
+
+    def test_load_weights(self):
+        '''
+        The second and third fields are the size and the cost.
+        '''
+        with tempfile.NamedTemporaryFile("w", delete=False) as trace_file:
+            trace_file.write("a 10 2.5\nb\nc 7\n")
+        try:
+            self.assertEqual(cache_simulator.load_weights(trace_file.name),
+                             {"a": (10, 2.5), "c": (7, 1)})
+        finally:
+            os.remove(trace_file.name)
+
+    def test_synthetic_weights_are_heavy_tailed(self):
+        '''
+        Every key gets a weight, a few of them much larger than most.
+        '''
+        trace = cache_simulator.zipf_trace(10000, 1000)
+        weights = cache_simulator.synthetic_weights(trace)
+        self.assertEqual(set(weights), set(trace))
+        sizes = sorted(size for size, _ in weights.values())
+        self.assertGreater(sizes[-1], 20 * sizes[len(sizes) // 2])
+
+
+class TestSimulate(unittest.TestCase):
+    '''
+    Checking the simulator replays every policy and reports its numbers.
+    '''
+
+    def test_every_policy_reports(self):
+        '''
+        Each policy and capacity gets a complete result.
+        '''
+        trace = cache_simulator.zipf_trace(2000, 300)
+        results = cache_simulator.simulate(trace, [10, 50])
+        self.assertEqual(len(results), 2 * len(cache_simulator.POLICIES))
+        for result in results:
+            with self.subTest(policy=result["policy"],
+                              capacity=result["capacity"]):
+                self.assertTrue(0 < result["hit_ratio"] < 1)
+                self.assertGreater(result["ops_per_sec"], 0)
+                self.assertLessEqual(result["p50_ns"], result["p99_ns"])
+                self.assertGreater(result["peak_bytes"], 0)
+        self.assertIn("W-TinyLFU", cache_simulator.format_results(results))
+
+    def test_loop_defeats_lru(self):
+        '''
+        A loop one key larger than the cache never hits with LRU or
+        FIFO, while MRU keeps most of it.
+        '''
+        trace = cache_simulator.loop_trace(1000, 11)
+        results = cache_simulator.simulate(trace, [10], ["LRU", "FIFO", "MRU"],
+                                           memory=False)
+        ratios = {result["policy"]: result["hit_ratio"] for result in results}
+        self.assertEqual(ratios["LRU"], 0)
+        self.assertEqual(ratios["FIFO"], 0)
+        self.assertGreater(ratios["MRU"], 0.5)
+        self.assertIsNone(results[0]["peak_bytes"])
+
+    def test_byte_budget(self):
+        '''
+        Under a byte budget GDSF saves more of the cost than LRU.
+        '''
+        trace = cache_simulator.zipf_trace(20000, 2000)
+        weights = cache_simulator.synthetic_weights(trace)
+        results = cache_simulator.simulate(
+            trace, [50000], ["LRU", "FIFO", "GDSF", "GDSF-bytes"],
+            memory=False, weights=weights, in_bytes=True)
+        ratios = {result["policy"]: result for result in results}
+        self.assertEqual(set(ratios),
+                         {"LRU", "FIFO", "GDSF", "GDSF-bytes"})
+        self.assertGreater(ratios["GDSF"]["cost_hit_ratio"],
+                           ratios["LRU"]["cost_hit_ratio"] + 0.05)
+        self.assertGreater(ratios["GDSF-bytes"]["byte_hit_ratio"],
+                           ratios["LRU"]["byte_hit_ratio"])
+        self.assertIn("GDSF-bytes", cache_simulator.format_results(results))
+        with self.assertRaises(ValueError):
+            cache_simulator.simulate(trace, [100], in_bytes=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+'''
+Tests for the cached memoization decorator.
+'''
+import asyncio
+import threading
+import time
+import unittest
+cached = __import__('cached').cached
+policies = __import__('policies')
+
+
+class TestCached(unittest.TestCase):
+    '''
+    Making sure memoized functions are bounded, keyed and counted.
+    '''
+
+    def test_memoizes(self):
+        '''
+        The function runs once per distinct call.
+        '''
+        calls = []
+
+        @cached()
+        def double(x, times=2):
+            ''' Record the call and double x. '''
+            calls.append((x, times))
+            return x * times
+
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(2), 4)
+        self.assertEqual(double(2, times=3), 6)
+        self.assertEqual(double((1,)), (1, 1))
+        self.assertEqual(double((1,)), (1, 1))
+        self.assertEqual(calls, [(2, 2), (2, 3), ((1,), 2)])
+        self.assertEqual(double.__name__, "double")
+        stats = double.cache_stats()
+        self.assertEqual((stats["hits"], stats["loads"]), (2, 3))
+
+    def test_bounded(self):
+        '''
+        The cache never holds more than capacity results.
+        '''
+        @cached(policy=policies.LFUPolicy, capacity=3)
+        def square(x):
+            ''' Square x. '''
+            return x * x
+
+        for x in range(10):
+            square(x)
+        self.assertEqual(len(square.cache), 3)
+        self.assertEqual(square.cache_stats()["evictions"], 7)
+        square.cache_clear()
+        self.assertEqual(len(square.cache), 0)
+
+    def test_none_results(self):
+        '''
+        A None result is cached like any other.
+        '''
+        calls = []
+
+        @cached()
+        def nothing(x):
+            ''' Record the call. '''
+            calls.append(x)
+
+        self.assertIsNone(nothing(1))
+        self.assertIsNone(nothing(1))
+        self.assertEqual(calls, [1])
+
+    def test_unhashable_arguments(self):
+        '''
+        Unhashable arguments need a key function.
+        '''
+        @cached()
+        def total(values):
+            ''' Sum values. '''
+            return sum(values)
+
+        with self.assertRaises(TypeError):
+            total([1, 2])
+
+        @cached(key=lambda values: tuple(values))
+        def keyed_total(values):
+            ''' Sum values. '''
+            return sum(values)
+
+        self.assertEqual(keyed_total([1, 2]), 3)
+        self.assertEqual(keyed_total([1, 2]), 3)
+        self.assertEqual(keyed_total.cache_stats()["hits"], 1)
+
+    def test_stats_per_function(self):
+        '''
+        Each decorated function has its own cache.
+        '''
+        @cached()
+        def first(x):
+            ''' Return x. '''
+            return x
+
+        @cached()
+        def second(x):
+            ''' Return x. '''
+            return x
+
+        first(1)
+        first(1)
+        second(1)
+        self.assertEqual(first.cache_stats()["hits"], 1)
+        self.assertEqual(second.cache_stats()["hits"], 0)
+
+    def test_threads_call_once(self):
+        '''
+        Threads calling with the same arguments at once share a call.
+        '''
+        calls = []
+
+        @cached()
+        def slow(x):
+            ''' Take a while. '''
+            calls.append(x)
+            time.sleep(0.1)
+            return x
+
+        workers = [threading.Thread(target=slow, args=(1,))
+                   for _ in range(8)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        self.assertEqual(calls, [1])
+
+    def test_coroutines(self):
+        '''
+        Coroutine functions are awaited once per distinct call.
+        '''
+        calls = []
+
+        @cached(capacity=2)
+        async def fetch(x):
+            ''' Take a while. '''
+            calls.append(x)
+            await asyncio.sleep(0.01)
+            return -x
+
+        async def main():
+            ''' Call fetch concurrently. '''
+            return await asyncio.gather(*(fetch(x) for x in (1, 1, 2, 1)))
+
+        self.assertEqual(asyncio.run(main()), [-1, -1, -2, -1])
+        self.assertEqual(calls, [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
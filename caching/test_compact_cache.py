@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+'''
+Tests for the CompactCache class.
+'''
+import random
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+CompactCache = __import__('compact_cache').CompactCache
+policies = __import__('policies')
+
+
+class Collider():
+    ''' Key whose hash is chosen, to force collisions in the table.
+    '''
+
+    def __init__(self, name, key_hash):
+        ''' Name the key and pick its hash.
+        '''
+        self.name = name
+        self.key_hash = key_hash
+
+    def __hash__(self):
+        ''' Return the chosen hash.
+        '''
+        return self.key_hash
+
+    def __eq__(self, other):
+        ''' Compare by name.
+        '''
+        return isinstance(other, Collider) and self.name == other.name
+
+
+def play(cache, seed, length=3000, keys=60):
+    ''' Run a reproducible mix of puts and gets against cache.
+    Returns what get returned and the keys evicted.
+    '''
+    evicted = []
+    cache.add_listener(lambda key, item, reason: evicted.append(key))
+    rng = random.Random(seed)
+    results = []
+    for _ in range(length):
+        key = rng.randrange(keys)
+        if rng.random() < 0.5:
+            cache.put(key, key * 10)
+        else:
+            results.append(cache.get(key))
+    return results, evicted
+
+
+class TestCompactCache(unittest.TestCase):
+    '''
+    Making sure the compact storage behaves like the policies it copies.
+    '''
+
+    def test_same_as_policies(self):
+        '''
+        Both policies evict exactly like LRUPolicy and ClockPolicy.
+        '''
+        for name, policy_class in (("lru", policies.LRUPolicy),
+                                   ("clock", policies.ClockPolicy)):
+            with self.subTest(policy=name):
+                for seed in range(5):
+                    compact = CompactCache(20, name)
+                    reference = BaseCaching(policy_class(), max_items=20)
+                    self.assertEqual(play(compact, seed),
+                                     play(reference, seed))
+                    self.assertEqual(compact.stats(), {
+                        key: value
+                        for key, value in reference.stats().items()
+                        if key in compact.stats()})
+                    self.assertEqual(set(compact), set(reference.cache_data))
+
+    def test_deletes_keep_keys_reachable(self):
+        '''
+        Removing colliding keys shifts the others back correctly.
+        '''
+        for name in ("lru", "clock"):
+            with self.subTest(policy=name):
+                rng = random.Random(0)
+                cache = CompactCache(40, name)
+                model = {}
+                cache.add_listener(
+                    lambda key, item, reason: reason == "evicted" and
+                    model.pop(key))
+                for step in range(5000):
+                    key = Collider(rng.randrange(50), rng.randrange(6) * 31)
+                    if rng.random() < 0.4:
+                        self.assertEqual(cache.delete(key), key in model)
+                        model.pop(key, None)
+                    else:
+                        cache.put(key, step)
+                        model[key] = step
+                    self.assertEqual(len(cache), len(model))
+                for key, item in model.items():
+                    self.assertEqual(cache.get(key), item)
+                self.assertEqual(cache.table.count(-1),
+                                 len(cache.table) - len(model))
+
+    def test_listeners_and_clear(self):
+        '''
+        Listeners hear evictions and deletes; clear empties the cache.
+        '''
+        cache = CompactCache(2)
+        heard = []
+        cache.add_listener(lambda *event: heard.append(event))
+        cache.put("A", 1)
+        cache.put("B", 2)
+        cache.get("A")
+        cache.put("C", 3)
+        self.assertTrue(cache.delete("A"))
+        self.assertFalse(cache.delete("A"))
+        self.assertEqual(heard, [("B", 2, "evicted"), ("A", 1, "deleted")])
+        cache.put(None, 1)
+        cache.put("D", None)
+        self.assertEqual(sorted(cache), ["C"])
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get("C"))
+        cache.put("E", 5)
+        self.assertEqual(cache.get("E"), 5)
+
+    def test_bad_arguments(self):
+        '''
+        Unknown policies and empty caches are refused.
+        '''
+        with self.assertRaises(ValueError):
+            CompactCache(4, "lfu")
+        with self.assertRaises(ValueError):
+            CompactCache(0)
+
+
+if __name__ == "__main__":
+    unittest.main()
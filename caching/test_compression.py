@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+'''
+Tests for the compressor of large items and its trained dictionaries.
+'''
+import json
+import os
+import random
+import tempfile
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+compression = __import__('compression')
+policies = __import__('policies')
+Compressor = compression.Compressor
+
+
+def user(number, rng):
+    ''' Return the JSON document of a user, like an API returns it.
+    '''
+    return json.dumps({
+        "login": "user{}".format(number),
+        "id": number,
+        "avatar_url": "https://avatars.example.com/u/{}?v=4".format(number),
+        "url": "https://api.example.com/users/user{}".format(number),
+        "repos_url": "https://api.example.com/users/user{}/repos".format(
+            number),
+        "type": "User",
+        "site_admin": False,
+        "public_repos": rng.randrange(100),
+    })
+
+
+class TestCompressor(unittest.TestCase):
+    '''
+    Checking what gets compressed and that it comes back the same.
+    '''
+
+    def test_round_trip(self):
+        '''
+        Large str, bytes and bytearray items come back with their type.
+        '''
+        compressor = Compressor(threshold=100)
+        for item in ("é" * 500, b"b" * 500, bytearray(b"c" * 500)):
+            with self.subTest(kind=type(item).__name__):
+                packed = compressor.pack(item)
+                self.assertIsInstance(packed, compression.Compressed)
+                self.assertLess(len(packed), 100)
+                unpacked = compressor.unpack(packed)
+                self.assertEqual(unpacked, item)
+                self.assertIs(type(unpacked), type(item))
+
+    def test_left_alone(self):
+        '''
+        Small, incompressible and other items are returned as they are.
+        '''
+        compressor = Compressor(threshold=100)
+        rng = random.Random(0)
+        noise = bytes(rng.randrange(256) for _ in range(500))
+        for item in ("a" * 99, noise, ["a"] * 500, 12):
+            self.assertIs(compressor.pack(item), item)
+
+    def test_dictionary(self):
+        '''
+        A trained dictionary compresses small documents much better,
+        and only the compressor holding it decompresses them.
+        '''
+        rng = random.Random(0)
+        dictionary = compression.train(user(n, rng) for n in range(200))
+        documents = [user(n, rng) for n in range(1000, 1100)]
+        plain = Compressor(threshold=0)
+        primed = Compressor(threshold=0, dictionary=dictionary)
+        plain_size = sum(len(plain.pack(doc)) for doc in documents)
+        primed_size = sum(len(primed.pack(doc)) for doc in documents)
+        self.assertLess(primed_size, 0.7 * plain_size)
+        packed = primed.pack(documents[0])
+        self.assertEqual(primed.unpack(packed), documents[0])
+        with self.assertRaises(ValueError):
+            plain.unpack(packed)
+        with self.assertRaises(ValueError):
+            Compressor(level=10)
+
+
+class TestCompressedCache(unittest.TestCase):
+    '''
+    Making sure a cache with a compressor holds more and hands the
+    items back unchanged.
+    '''
+
+    def test_effective_capacity(self):
+        '''
+        A byte bounded cache holds more compressed items, and reports
+        the capacity it has in uncompressed bytes.
+        '''
+        documents = {n: "[" + ",".join([user(n, random.Random(n))] * 8) + "]"
+                     for n in range(100)}
+        plain = BaseCaching(policies.LRUPolicy(), max_bytes=50000)
+        packed = BaseCaching(policies.LRUPolicy(), max_bytes=50000,
+                             compressor=Compressor())
+        for cache in (plain, packed):
+            cache.put_many(documents)
+        self.assertGreater(len(packed.cache_data),
+                           3 * len(plain.cache_data))
+        self.assertTrue(all(packed.get(n) == documents[n]
+                            for n in packed.cache_data))
+        stats = packed.stats()
+        self.assertEqual(stats["compressed"], len(packed.cache_data))
+        self.assertGreater(stats["effective_bytes"], 3 * 50000)
+        self.assertNotIn("compressed", plain.stats())
+
+    def test_hot_items_are_promoted(self):
+        '''
+        After promote hits an item is stored uncompressed, and the
+        bytes and counters follow.
+        '''
+        cache = BaseCaching(policies.LRUPolicy(), max_bytes=20000,
+                            sizeof=len, compressor=Compressor(promote=3))
+        cache.put("hot", "h" * 5000)
+        cache.put("cold", "c" * 5000)
+        self.assertLess(cache.current_bytes, 200)
+        for _ in range(2):
+            self.assertEqual(cache.get("hot"), "h" * 5000)
+        self.assertEqual(cache.get_many(["hot"]), {"hot": "h" * 5000})
+        self.assertEqual(cache.cache_data["hot"], "h" * 5000)
+        self.assertEqual(cache.current_bytes, sum(cache.sizes.values()))
+        self.assertEqual(cache.stats()["compressed"], 1)
+        cache.put("cold", "c")
+        self.assertEqual(cache.stats()["saved_bytes"], 0)
+        self.assertEqual(cache.current_bytes, 5001)
+
+    def test_promotions_in_a_batch(self):
+        '''
+        Promoting an item of a batch may evict another one of it, which
+        is still handed back and not promoted.
+        '''
+        cache = BaseCaching(policies.FIFOPolicy(), max_bytes=5005,
+                            sizeof=len, compressor=Compressor(promote=1))
+        cache.put("B", "b" * 5000)
+        cache.put("A", "a" * 5000)
+        self.assertEqual(cache.get_many(["A", "B"]),
+                         {"A": "a" * 5000, "B": "b" * 5000})
+        self.assertEqual(cache.cache_data, {"A": "a" * 5000})
+        self.assertEqual(cache.current_bytes, 5000)
+        self.assertEqual(cache.stats()["compressed"], 0)
+
+    def test_listeners_and_snapshots(self):
+        '''
+        Listeners and reloaded caches see the items, not their
+        compressed form.
+        '''
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            cache = BaseCaching(policies.LRUPolicy(), max_items=2,
+                                compressor=Compressor())
+            cache.put_many({"A": "a" * 2000, "B": "b" * 2000})
+            cache.dump(path)
+            reloaded = BaseCaching(policies.LRUPolicy(), max_items=2,
+                                   compressor=Compressor())
+            reloaded.load(path)
+        finally:
+            os.remove(path)
+        self.assertEqual(reloaded.get("A"), "a" * 2000)
+        self.assertEqual(reloaded.stats()["saved_bytes"],
+                         cache.cache_data["A"].saved)
+        evicted = []
+        cache.add_listener(lambda key, item, reason: evicted.append(item))
+        cache.put("C", "c")
+        self.assertEqual(evicted, ["a" * 2000])
+
+
+if __name__ == "__main__":
+    unittest.main()
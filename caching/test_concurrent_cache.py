@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+'''
+Multi-threaded stress tests for the ConcurrentCache class.
+'''
+import contextlib
+import io
+import random
+import sys
+import threading
+import unittest
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+Compressor = __import__('compression').Compressor
+policies = __import__('policies')
+
+
+def hammer(cache, threads, ops, keys):
+    ''' Run threads threads each doing ops random puts and gets.
+    Returns the exceptions raised by the threads.
+    '''
+    errors = []
+
+    def worker(seed):
+        ''' Mix puts and gets over keys. '''
+        rng = random.Random(seed)
+        try:
+            for _ in range(ops):
+                key = rng.randrange(keys)
+                if rng.random() < 0.5:
+                    cache.put(key, key)
+                else:
+                    item = cache.get(key)
+                    if item is not None and item != key:
+                        raise AssertionError("{} -> {}".format(key, item))
+        except Exception as error:
+            errors.append(error)
+
+    workers = [threading.Thread(target=worker, args=(seed,))
+               for seed in range(threads)]
+    interval = sys.getswitchinterval()
+    # Switch threads as often as possible to shake out races
+    sys.setswitchinterval(1e-6)
+    try:
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return errors
+
+
+class TestConcurrentCache(unittest.TestCase):
+    '''
+    Making sure shards stay consistent when many threads share them.
+    '''
+
+    def test_put_get(self):
+        '''
+        The cache keeps the put / get contract of BaseCaching.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=8)
+        cache.put("A", "Hello")
+        cache.put(None, "x")
+        cache.put("B", None)
+        self.assertEqual(cache.get("A"), "Hello")
+        self.assertIsNone(cache.get("B"))
+        self.assertIsNone(cache.get(None))
+        self.assertEqual(cache.cache_data, {"A": "Hello"})
+        self.assertEqual(len(cache), 1)
+
+    def test_capacity_is_split(self):
+        '''
+        Each shard gets its slice of the capacity.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=50)
+        self.assertEqual([s.MAX_ITEMS for s in cache.shards],
+                         [13, 13, 12, 12])
+        cache = ConcurrentCache(shards=4, max_bytes=1000)
+        self.assertEqual([s.max_bytes for s in cache.shards], [250] * 4)
+        # Small caches get fewer shards, of MIN_SHARD_ITEMS items at least
+        cache = ConcurrentCache(max_items=10)
+        self.assertEqual([s.MAX_ITEMS for s in cache.shards], [10])
+        cache = ConcurrentCache(max_items=100)
+        self.assertEqual([s.MAX_ITEMS for s in cache.shards],
+                         [9] * 4 + [8] * 8)
+        cache = ConcurrentCache(shards=4, max_items=64, max_negative=8)
+        self.assertEqual([s.max_negative for s in cache.shards], [2] * 4)
+
+    def test_capacity_is_not_exceeded(self):
+        '''
+        However the keys spread over the shards, the cache never holds
+        more than max_items items.
+        '''
+        for max_items in (1, 10, 100, 1000):
+            with self.subTest(max_items=max_items):
+                cache = ConcurrentCache(max_items=max_items)
+                self.assertEqual(sum(s.MAX_ITEMS for s in cache.shards),
+                                 max_items)
+                for key in range(5 * max_items):
+                    cache.put(key, key)
+                    self.assertLessEqual(len(cache), max_items)
+
+    def test_largest_items_fit(self):
+        '''
+        With max_item_bytes, every shard can hold an item that large.
+        '''
+        page = b"x" * (2 << 20)
+        cache = ConcurrentCache(max_bytes=16 << 20, sizeof=len)
+        cache.put("page", page)
+        self.assertIsNone(cache.get("page"))
+        cache = ConcurrentCache(max_bytes=16 << 20, sizeof=len,
+                                max_item_bytes=len(page))
+        self.assertEqual(len(cache.shards), 8)
+        for key in range(20):
+            cache.put(key, page)
+            self.assertIs(cache.get(key), page)
+        self.assertLessEqual(sum(map(len, cache.cache_data.values())),
+                             16 << 20)
+        with self.assertRaises(ValueError):
+            ConcurrentCache(max_bytes=100, max_item_bytes=101)
+
+    def test_stats_add_up(self):
+        '''
+        stats() adds the counters and histograms of the shards.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=8, sample=1)
+        evicted = []
+        cache.add_listener(lambda key, item, reason: evicted.append(key))
+        for key in range(20):
+            cache.put(key, key)
+            cache.get(key)
+        stats = cache.stats()
+        self.assertEqual(stats["items"], len(cache))
+        self.assertEqual(stats["hits"], 20)
+        self.assertEqual(stats["evictions"], len(evicted))
+        self.assertEqual(stats["items"] + len(evicted), 20)
+        self.assertEqual(sum(stats["get_ns"]), 20)
+
+    def test_batches(self):
+        '''
+        Batches reach every shard and keep the put / get contract.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=64)
+        cache.put_many((key, -key) for key in range(40))
+        found = cache.get_many(range(50))
+        self.assertEqual(found, {key: -key for key in range(40)})
+        self.assertEqual(cache.delete_many(range(0, 50, 2)), 20)
+        self.assertFalse(cache.delete(0))
+        self.assertTrue(cache.delete(1))
+        self.assertEqual(len(cache), 19)
+
+    def test_compressed_items(self):
+        '''
+        cache_data and print_cache show the items, not their compressed
+        form.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=8,
+                                compressor=Compressor(threshold=16))
+        cache.put("A", "a" * 1000)
+        cache.put("B", "b")
+        self.assertEqual(cache.stats()["compressed"], 1)
+        self.assertEqual(cache.cache_data, {"A": "a" * 1000, "B": "b"})
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            cache.print_cache()
+        self.assertEqual(output.getvalue(), "Current cache:\nA: {}\nB: b\n"
+                         .format("a" * 1000))
+
+    def test_stress(self):
+        '''
+        Concurrent puts and gets never corrupt a shard: each policy
+        tracks exactly the keys of its shard, within its capacity.
+        '''
+        for policy in (policies.LRUPolicy, policies.LFUPolicy,
+                       policies.ARCPolicy, policies.WTinyLFUPolicy):
+            cache = ConcurrentCache(policy, shards=4, max_items=64)
+            with self.subTest(policy=policy.__name__):
+                self.assertEqual(hammer(cache, 8, 3000, 256), [])
+                for shard in cache.shards:
+                    self.assertLessEqual(len(shard.cache_data), 16)
+                    self.assertEqual(set(shard.policy),
+                                     set(shard.cache_data))
+                for key, item in cache.cache_data.items():
+                    self.assertEqual(key, item)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+'''
+Tests for the DistributedCache, CacheServer and RemoteNode classes.
+'''
+import socket
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+LRUPolicy = __import__('policies').LRUPolicy
+ReadMostlyCache = __import__('read_mostly_cache').ReadMostlyCache
+distributed_cache = __import__('distributed_cache')
+CacheServer = distributed_cache.CacheServer
+DistributedCache = distributed_cache.DistributedCache
+RemoteNode = distributed_cache.RemoteNode
+
+
+def lru(max_items=1000):
+    ''' Build an LRU BaseCaching of max_items items.
+    '''
+    return BaseCaching(LRUPolicy(), max_items=max_items)
+
+
+def free_address():
+    ''' Return a loopback address nothing listens on.
+    '''
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()
+
+
+class TestDistributedCache(unittest.TestCase):
+    '''
+    Making sure keys live on their node and few of them move.
+    '''
+
+    def test_keys_go_to_their_node(self):
+        '''
+        Every key is cached by the node the ring gives it only.
+        '''
+        nodes = {name: lru() for name in "abc"}
+        cache = DistributedCache(nodes)
+        cache.put_many({key: key * 2 for key in range(300)})
+        cache.put(None, 1)
+        for key in range(300):
+            with self.subTest(key=key):
+                self.assertIn(key, nodes[cache.node(key)].cache_data)
+        self.assertEqual(len(cache), 300)
+        self.assertEqual(cache.get(7), 14)
+        self.assertIsNone(cache.get(None))
+        self.assertEqual(cache.get_many([1, 2, 1000]), {1: 2, 2: 4})
+        self.assertTrue(cache.delete(1))
+        self.assertEqual(cache.delete_many([2, 3, 1000]), 2)
+        stats = cache.stats()
+        self.assertEqual(sum(stats["nodes"].values()), 297)
+        self.assertEqual(stats["deletes"], 3)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+    def test_node_types(self):
+        '''
+        Every kind of node in the process keeps the put / get contract,
+        with or without a ttl, and gives its items up on rebalancing.
+        '''
+        factories = {
+            "BaseCaching": lru,
+            "ConcurrentCache": lambda: ConcurrentCache(max_items=1000),
+            "ReadMostlyCache": lambda: ReadMostlyCache(max_items=1000),
+        }
+        for name, factory in factories.items():
+            with self.subTest(node=name):
+                cache = DistributedCache({"a": factory(), "b": factory()})
+                for key in range(50):
+                    cache.put(key, -key)
+                cache.put("T", 1, ttl=60)
+                self.assertEqual(cache.get(7), -7)
+                self.assertEqual(cache.get("T"), 1)
+                self.assertEqual(cache.add_node("c", factory()),
+                                 len(cache.nodes["c"].cache_data))
+                self.assertEqual(cache.get_many(range(50)),
+                                 {key: -key for key in range(50)})
+                self.assertEqual(len(cache), 51)
+
+    def test_capacity_adds_up(self):
+        '''
+        n nodes of m items hold close to n * m keys.
+        '''
+        cache = DistributedCache({name: lru(100) for name in "abcd"})
+        cache.put_many({key: key for key in range(1000)})
+        self.assertGreater(len(cache), 360)
+        self.assertLessEqual(len(cache), 400)
+
+    def test_add_node_moves_its_keys(self):
+        '''
+        The new node gets about 1/n of the items, and every key is still
+        found.
+        '''
+        cache = DistributedCache({name: lru() for name in "abcd"})
+        cache.put_many({key: key for key in range(2000)})
+        moved = cache.add_node("e", lru())
+        self.assertAlmostEqual(moved / 2000, 0.2, delta=0.05)
+        self.assertEqual(len(cache.nodes["e"].cache_data), moved)
+        self.assertEqual(len(cache), 2000)
+        self.assertEqual(cache.get_many(range(2000)),
+                         {key: key for key in range(2000)})
+        self.assertEqual(cache.stats()["moved"], moved)
+        with self.assertRaises(ValueError):
+            cache.add_node("e", lru())
+
+    def test_remove_node_moves_its_keys(self):
+        '''
+        The items of a removed node go to the others; without
+        rebalance they are dropped with it.
+        '''
+        cache = DistributedCache({name: lru() for name in "abcd"})
+        cache.put_many({key: key for key in range(2000)})
+        held = len(cache.nodes["a"].cache_data)
+        node, moved = cache.remove_node("a")
+        self.assertEqual(moved, held)
+        self.assertEqual(node.cache_data, {})
+        self.assertEqual(len(cache), 2000)
+        node, moved = cache.remove_node("b", rebalance=False)
+        self.assertEqual(moved, 0)
+        self.assertEqual(len(cache), 2000 - len(node.cache_data))
+
+
+class TestRemoteNodes(unittest.TestCase):
+    '''
+    Making sure nodes served on sockets behave like local ones.
+    '''
+
+    def setUp(self):
+        ''' Serve three LRU caches.
+        '''
+        self.servers = [CacheServer(lru()).start() for _ in range(3)]
+        self.cache = DistributedCache({
+            str(index): RemoteNode(server.address)
+            for index, server in enumerate(self.servers)})
+
+    def tearDown(self):
+        ''' Stop the servers.
+        '''
+        for node in self.cache.nodes.values():
+            node.close()
+        for server in self.servers:
+            server.close()
+
+    def test_round_trip(self):
+        '''
+        Items go through the sockets and back, batches too.
+        '''
+        self.cache.put("A", {"name": "A"}, ttl=60)
+        self.cache.put_many({key: [key] for key in range(100)})
+        self.assertEqual(self.cache.get("A"), {"name": "A"})
+        self.assertEqual(self.cache.get_many([1, 2, "X"]), {1: [1], 2: [2]})
+        self.assertEqual(len(self.cache), 101)
+        self.assertEqual(self.cache.stats()["hits"], 3)
+        server = self.servers[int(self.cache.node("A"))]
+        self.assertEqual(server.cache.get("A"), {"name": "A"})
+
+    def test_rebalance(self):
+        '''
+        A node served by a new server takes its share of the items.
+        '''
+        self.cache.put_many({key: key for key in range(600)})
+        self.servers.append(CacheServer(lru()).start())
+        moved = self.cache.add_node("3", RemoteNode(self.servers[3].address))
+        self.assertGreater(moved, 80)
+        self.assertEqual(len(self.servers[3].cache.cache_data), moved)
+        self.assertEqual(len(self.cache.get_many(range(600))), 600)
+
+    def test_unreachable_node(self):
+        '''
+        The keys of a node gone miss and count as errors, the others
+        are still served.
+        '''
+        self.cache.put_many({key: key for key in range(30)})
+        self.servers[0].close()
+        found = {key: self.cache.get(key) for key in range(30)}
+        for key, item in found.items():
+            with self.subTest(key=key):
+                if self.cache.node(key) == "0":
+                    self.assertIsNone(item)
+                else:
+                    self.assertEqual(item, key)
+        self.assertGreater(self.cache.stats()["errors"], 0)
+        node = RemoteNode(free_address())
+        with self.assertRaises(OSError):
+            node.get("A")
+
+    def test_errors_come_back(self):
+        '''
+        An exception raised by the server is raised by the client, and
+        only the cache methods can be called.
+        '''
+        node = self.cache.nodes["0"]
+        with self.assertRaises(ValueError):
+            node._call("__class__")
+        with self.assertRaises(TypeError):
+            node._call("get")
+        self.assertIsNone(node.get("A"))
+
+
+if __name__ == "__main__":
+    unittest.main()
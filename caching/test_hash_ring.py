@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+'''
+Tests for the HashRing class.
+'''
+import os
+import subprocess
+import sys
+import unittest
+hash_ring = __import__('hash_ring')
+HashRing = hash_ring.HashRing
+
+KEYS = ["user:{}".format(i) for i in range(20000)]
+
+
+def owners(ring):
+    ''' Return the node of every key of KEYS.
+    '''
+    return [ring.node(key) for key in KEYS]
+
+
+class TestHashRing(unittest.TestCase):
+    '''
+    Making sure keys spread evenly and stay put when nodes change.
+    '''
+
+    def test_keys_spread_evenly(self):
+        '''
+        With virtual nodes, every node gets close to 1/n of the keys.
+        '''
+        ring = HashRing()
+        for node in ("a", "b", "c", "d", "e"):
+            ring.add(node)
+        counts = {node: 0 for node in ring}
+        for node in owners(ring):
+            counts[node] += 1
+        for node, count in counts.items():
+            with self.subTest(node=node):
+                self.assertAlmostEqual(count / len(KEYS), 0.2, delta=0.04)
+        self.assertAlmostEqual(sum(ring.shares().values()), 1)
+
+    def test_adding_a_node_moves_its_share(self):
+        '''
+        Only the keys the new node takes change owner: about 1/n.
+        '''
+        ring = HashRing()
+        for node in "abcd":
+            ring.add(node)
+        before = owners(ring)
+        ring.add("e")
+        after = owners(ring)
+        moved = [new for old, new in zip(before, after) if old != new]
+        self.assertEqual(set(moved), {"e"})
+        self.assertAlmostEqual(len(moved) / len(KEYS), 0.2, delta=0.04)
+
+    def test_removing_a_node_moves_its_keys_only(self):
+        '''
+        The keys of the removed node spread over the others, the rest
+        stay where they were.
+        '''
+        ring = HashRing()
+        for node in "abcde":
+            ring.add(node)
+        before = owners(ring)
+        ring.remove("c")
+        after = owners(ring)
+        moved = [(old, new) for old, new in zip(before, after) if old != new]
+        self.assertEqual({old for old, _ in moved}, {"c"})
+        self.assertEqual({new for _, new in moved}, {"a", "b", "d", "e"})
+        self.assertNotIn("c", ring)
+        with self.assertRaises(KeyError):
+            ring.remove("c")
+
+    def test_weights(self):
+        '''
+        A node of weight 2 owns about twice the share of the others.
+        '''
+        ring = HashRing()
+        ring.add("a")
+        ring.add("b")
+        ring.add("big", 2)
+        shares = ring.shares()
+        self.assertAlmostEqual(shares["big"], 0.5, delta=0.06)
+        self.assertEqual(len(ring), 3)
+
+    def test_empty_ring(self):
+        '''
+        An empty ring owns no key.
+        '''
+        with self.assertRaises(LookupError):
+            HashRing().node("A")
+
+    def test_same_owner_in_every_process(self):
+        '''
+        The hash is not salted: another process routes keys alike.
+        '''
+        code = ("import hash_ring; print(hash_ring.stable_hash('A'), "
+                "hash_ring.stable_hash(b'A'), hash_ring.stable_hash(1))")
+        output = subprocess.run([sys.executable, "-c", code],
+                                capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(
+                                    os.path.abspath(hash_ring.__file__)))
+        self.assertEqual(output.stdout.split(), [
+            str(hash_ring.stable_hash(key)) for key in ("A", b"A", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
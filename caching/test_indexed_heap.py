@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+'''
+Tests for the IndexedHeap class.
+'''
+import random
+import unittest
+IndexedHeap = __import__('indexed_heap').IndexedHeap
+
+
+class TestIndexedHeap(unittest.TestCase):
+    '''
+    Making sure the heap pops the lowest priority whatever was pushed,
+    reprioritized or removed before.
+    '''
+
+    def test_pop_in_priority_order(self):
+        '''
+        Keys come out by priority, ties in the order they were pushed.
+        '''
+        heap = IndexedHeap()
+        for key, priority in (("A", 3), ("B", 1), ("C", 3), ("D", 2)):
+            heap.push(key, priority)
+        self.assertEqual(list(heap), ["B", "D", "A", "C"])
+        self.assertEqual(heap.peek(), ("B", 1))
+        self.assertEqual([heap.pop() for _ in range(4)],
+                         [("B", 1), ("D", 2), ("A", 3), ("C", 3)])
+        with self.assertRaises(IndexError):
+            heap.pop()
+
+    def test_reprioritize_and_remove(self):
+        '''
+        A key pushed again moves, a removed key is gone.
+        '''
+        heap = IndexedHeap()
+        for key in range(5):
+            heap.push(key, key)
+        heap.push(0, 10)
+        heap.push(4, -1)
+        heap.remove(2)
+        self.assertNotIn(2, heap)
+        self.assertEqual(heap.priority(0), 10)
+        self.assertEqual(list(heap), [4, 1, 3, 0])
+        heap.clear()
+        self.assertEqual(len(heap), 0)
+
+    def test_random_operations(self):
+        '''
+        The heap agrees with a plain dictionary, and every position it
+        records is right.
+        '''
+        rng = random.Random(0)
+        heap = IndexedHeap()
+        model = {}
+        for _ in range(5000):
+            key = rng.randrange(100)
+            roll = rng.random()
+            if roll < 0.6:
+                model[key] = rng.randrange(20)
+                heap.push(key, model[key])
+            elif roll < 0.8 and key in model:
+                del model[key]
+                heap.remove(key)
+            elif model:
+                key, priority = heap.pop()
+                self.assertEqual(priority, min(model.values()))
+                del model[key]
+            self.assertEqual(len(heap), len(model))
+        for key, position in heap.positions.items():
+            self.assertEqual(heap.heap[position][2], key)
+            self.assertEqual(heap.priority(key), model[key])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+'''
+Trace-replay tests for the LFUCache class.
+Every trace is played against LFUCache and against the original
+list-based implementation; both must discard the same keys in the
+same order and end up holding the same data.
+'''
+import random
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+LFUCache = __import__('100-lfu_cache').LFUCache
+
+
+class ReferenceLFUCache(BaseCaching):
+    ''' The list-based LFUCache the O(1) version replaced.
+    '''
+
+    def __init__(self):
+        ''' Initialize the frequency map and the usage order list.
+        '''
+        super().__init__()
+        self.usage_frequency = {}
+        self.usage_order = []
+
+    def put(self, key, item):
+        ''' Add an item, discarding the LFU key (LRU tie-break).
+        '''
+        if key is None or item is None:
+            return
+        if key in self.cache_data:
+            self.cache_data[key] = item
+            self.usage_frequency[key] += 1
+            self.usage_order.remove(key)
+            self.usage_order.append(key)
+        else:
+            if len(self.cache_data) >= self.MAX_ITEMS:
+                min_freq = min(self.usage_frequency.values())
+                lfu_key = [k for k in self.usage_order
+                           if self.usage_frequency[k] == min_freq][0]
+                del self.usage_frequency[lfu_key]
+                self.usage_order.remove(lfu_key)
+                self.discard(lfu_key)
+            self.cache_data[key] = item
+            self.usage_frequency[key] = 1
+            self.usage_order.append(key)
+
+    def get(self, key):
+        ''' Retrieve an item and bump its frequency.
+        '''
+        if key is None or key not in self.cache_data:
+            return None
+        self.usage_frequency[key] += 1
+        self.usage_order.remove(key)
+        self.usage_order.append(key)
+        return self.cache_data[key]
+
+
+def replay(cache, trace):
+    ''' Play trace against cache.
+    Returns the list of evicted keys and the values returned by get.
+    '''
+    evicted = []
+    results = []
+    cache.add_listener(lambda key, item, reason: evicted.append(key))
+    for op, key, item in trace:
+        if op == "put":
+            cache.put(key, item)
+        else:
+            results.append(cache.get(key))
+    return evicted, results
+
+
+def random_trace(seed, length, keys):
+    ''' Build a reproducible mix of puts and gets over a few keys.
+    '''
+    rng = random.Random(seed)
+    trace = []
+    for i in range(length):
+        key = rng.choice(keys)
+        if rng.random() < 0.5:
+            trace.append(("put", key, i))
+        else:
+            trace.append(("get", key, None))
+    return trace
+
+
+class TestLFUCacheReplay(unittest.TestCase):
+    '''
+    Making sure the O(1) LFUCache evicts exactly like the original.
+    '''
+
+    def assertSameReplay(self, trace, max_items=None):
+        '''
+        Replay trace on both caches and compare everything observable.
+        '''
+        caches = LFUCache(), ReferenceLFUCache()
+        if max_items is not None:
+            for cache in caches:
+                cache.MAX_ITEMS = max_items
+        fast, ref = (replay(cache, trace) for cache in caches)
+        self.assertEqual(fast, ref)
+        self.assertEqual(caches[0].cache_data, caches[1].cache_data)
+
+    def test_main_trace(self):
+        '''
+        Replay the sequence used by 100-main.py.
+        '''
+        trace = [("put", k, k) for k in "ABCD"] + [
+            ("get", "B", None), ("put", "E", "E"), ("put", "C", "C"),
+            ("get", "A", None), ("get", "B", None), ("get", "C", None),
+            ("put", "F", "F"), ("put", "G", "G"), ("put", "H", "H"),
+            ("put", "I", "I")] + [
+            ("get", k, None) for k in "IHIHIH"] + [
+            ("put", k, k) for k in "JKLM"]
+        self.assertSameReplay(trace)
+
+    def test_random_traces(self):
+        '''
+        Replay random traces on small caches of several sizes.
+        '''
+        for seed in range(50):
+            for max_items in (1, 2, 4, 7):
+                trace = random_trace(seed, 300, list(range(12)))
+                with self.subTest(seed=seed, max_items=max_items):
+                    self.assertSameReplay(trace, max_items)
+
+    def test_none_is_ignored(self):
+        '''
+        None keys and items are neither stored nor counted.
+        '''
+        trace = [("put", None, 1), ("put", "A", None), ("get", None, None),
+                 ("put", "A", 1), ("get", "A", None)]
+        self.assertSameReplay(trace)
+
+
+if __name__ == "__main__":
+    unittest.main()
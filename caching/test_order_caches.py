@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+'''
+Trace-replay tests for the FIFOCache, LIFOCache and MRUCache classes.
+Every trace is played against the cache and against a list-based
+model of its policy; both must discard the same keys in the same order
+and end up holding the same data. Update-heavy traces make sure the
+ordering kept by the policies stays as large as the cache.
+'''
+import random
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+FIFOCache = __import__('1-fifo_cache').FIFOCache
+LIFOCache = __import__('2-lifo_cache').LIFOCache
+MRUCache = __import__('4-mru_cache').MRUCache
+
+
+class ReferenceCache(BaseCaching):
+    ''' A list-based cache discarding the key at index VICTIM of its
+    order list; moved keys go to the end of the list.
+    '''
+    VICTIM = 0
+    MOVE_ON_UPDATE = False
+    MOVE_ON_GET = False
+
+    def __init__(self):
+        ''' Initialize the order list.
+        '''
+        super().__init__()
+        self.order = []
+
+    def put(self, key, item):
+        ''' Add an item, discarding the victim if the cache is full.
+        '''
+        if key is None or item is None:
+            return
+        if key in self.cache_data:
+            if self.MOVE_ON_UPDATE:
+                self.order.remove(key)
+                self.order.append(key)
+        else:
+            if len(self.cache_data) >= self.MAX_ITEMS:
+                self.discard(self.order.pop(self.VICTIM))
+            self.order.append(key)
+        self.cache_data[key] = item
+
+    def get(self, key):
+        ''' Retrieve an item, moving its key if a use counts.
+        '''
+        if key is None or key not in self.cache_data:
+            return None
+        if self.MOVE_ON_GET:
+            self.order.remove(key)
+            self.order.append(key)
+        return self.cache_data[key]
+
+
+class ReferenceFIFOCache(ReferenceCache):
+    ''' The first key inserted goes first.
+    '''
+
+
+class ReferenceLIFOCache(ReferenceCache):
+    ''' The last key inserted or updated goes first.
+    '''
+    VICTIM = -1
+    MOVE_ON_UPDATE = True
+
+
+class ReferenceMRUCache(ReferenceCache):
+    ''' The last key used goes first.
+    '''
+    VICTIM = -1
+    MOVE_ON_UPDATE = True
+    MOVE_ON_GET = True
+
+
+PAIRS = (
+    (FIFOCache, ReferenceFIFOCache),
+    (LIFOCache, ReferenceLIFOCache),
+    (MRUCache, ReferenceMRUCache),
+)
+
+
+def replay(cache, trace):
+    ''' Play trace against cache.
+    Returns the list of evicted keys and the values returned by get.
+    '''
+    evicted = []
+    results = []
+    cache.add_listener(lambda key, item, reason: evicted.append(key))
+    for op, key, item in trace:
+        if op == "put":
+            cache.put(key, item)
+        else:
+            results.append(cache.get(key))
+    return evicted, results
+
+
+def random_trace(seed, length, keys, puts=0.5):
+    ''' Build a reproducible mix of puts, a puts share of them, and
+    gets over a few keys.
+    '''
+    rng = random.Random(seed)
+    trace = []
+    for i in range(length):
+        key = rng.choice(keys)
+        if rng.random() < puts:
+            trace.append(("put", key, i))
+        else:
+            trace.append(("get", key, None))
+    return trace
+
+
+class TestOrderCachesReplay(unittest.TestCase):
+    '''
+    Making sure the caches evict exactly like their list-based models.
+    '''
+
+    def assertSameReplay(self, trace, max_items=None):
+        '''
+        Replay trace on every pair of caches and compare everything
+        observable.
+        '''
+        for cache_class, reference_class in PAIRS:
+            caches = cache_class(), reference_class()
+            if max_items is not None:
+                for cache in caches:
+                    cache.MAX_ITEMS = max_items
+            with self.subTest(cache=cache_class.__name__):
+                fast, ref = (replay(cache, trace) for cache in caches)
+                self.assertEqual(fast, ref)
+                self.assertEqual(caches[0].cache_data, caches[1].cache_data)
+
+    def test_main_trace(self):
+        '''
+        Replay a trace updating and reading held keys.
+        '''
+        trace = [("put", k, k) for k in "ABCD"] + [
+            ("put", "B", "b"), ("get", "A", None), ("put", "E", "E"),
+            ("put", "C", "c"), ("get", "B", None), ("put", "F", "F"),
+            ("put", "G", "G")]
+        self.assertSameReplay(trace)
+
+    def test_random_traces(self):
+        '''
+        Replay random traces on small caches of several sizes.
+        '''
+        for seed in range(30):
+            for max_items in (1, 2, 4, 7):
+                trace = random_trace(seed, 300, list(range(12)))
+                with self.subTest(seed=seed, max_items=max_items):
+                    self.assertSameReplay(trace, max_items)
+
+    def test_update_heavy_traces(self):
+        '''
+        Replay traces made mostly of updates to the keys held.
+        '''
+        for seed in range(30):
+            for max_items in (2, 4):
+                trace = random_trace(seed, 300, list(range(5)), puts=0.9)
+                with self.subTest(seed=seed, max_items=max_items):
+                    self.assertSameReplay(trace, max_items)
+
+    def test_none_is_ignored(self):
+        '''
+        None keys and items are neither stored nor ordered.
+        '''
+        trace = [("put", None, 1), ("put", "A", None), ("get", None, None),
+                 ("put", "A", 1), ("get", "A", None)]
+        self.assertSameReplay(trace)
+
+
+class TestOrderCachesMemory(unittest.TestCase):
+    '''
+    Making sure the ordering holds one entry per cached key.
+    '''
+
+    def test_updates_do_not_grow_the_order(self):
+        '''
+        Updating the held keys over and over keeps one node per key.
+        '''
+        for cache_class, _ in PAIRS:
+            cache = cache_class()
+            for i in range(10000):
+                cache.put(i % 3, i)
+            with self.subTest(cache=cache_class.__name__):
+                self.assertEqual(len(cache.policy), len(cache.cache_data))
+                self.assertEqual(len(cache.cache_data), 3)
+
+    def test_lifo_discards_a_held_key_after_a_delete(self):
+        '''
+        A deleted key is no longer a candidate for eviction.
+        '''
+        cache = LIFOCache()
+        for key in "ABCD":
+            cache.put(key, key)
+        cache.delete("D")
+        cache.put("E", "E")
+        evicted = []
+        cache.add_listener(lambda key, item, reason: evicted.append(key))
+        cache.put("F", "F")
+        self.assertEqual(evicted, ["E"])
+        self.assertEqual(sorted(cache.cache_data), ["A", "B", "C", "F"])
+        self.assertEqual(len(cache.policy), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+'''
+Tests for the PartitionedCache class and its namespaces.
+'''
+import os
+import random
+import tempfile
+import unittest
+PartitionedCache = __import__('partitioned_cache').PartitionedCache
+policies = __import__('policies')
+
+
+def items(cache):
+    ''' Return the number of items of every namespace of cache.
+    '''
+    return {name: counters["items"]
+            for name, counters in cache.stats()["namespaces"].items()}
+
+
+class TestPartitionedCache(unittest.TestCase):
+    '''
+    Making sure namespaces keep their minimum, stay under their
+    maximum and lend the capacity they leave idle.
+    '''
+
+    def test_noisy_tenant_keeps_out(self):
+        '''
+        A namespace missing on every request never takes the share of
+        the others.
+        '''
+        cache = PartitionedCache(max_items=100)
+        quiet = cache.add_namespace("quiet", minimum=30)
+        late = cache.add_namespace("late", minimum=30, maximum=60)
+        noisy = cache.add_namespace("noisy", maximum=80)
+        for key in range(30):
+            quiet.put(key, key)
+        for key in range(1000):
+            noisy.put(key, key)
+        self.assertEqual(items(cache),
+                         {"quiet": 30, "late": 0, "noisy": 70})
+        for key in range(30):
+            late.put(key, key)
+        for key in range(1000, 3000):
+            noisy.put(key, key)
+        self.assertEqual(items(cache),
+                         {"quiet": 30, "late": 30, "noisy": 40})
+        self.assertTrue(all(quiet.get(key) == key for key in range(30)))
+        self.assertEqual(quiet.stats()["hits"], 30)
+        self.assertEqual(quiet.stats()["evictions"], 0)
+
+    def test_borrowers_give_room_back_in_turn(self):
+        '''
+        Idle capacity is borrowed; a namespace at its minimum takes
+        it back from every borrower in turn.
+        '''
+        cache = PartitionedCache(max_items=10)
+        first = cache.add_namespace("first", minimum=2)
+        second = cache.add_namespace("second", minimum=2)
+        third = cache.add_namespace("third", minimum=2)
+        for key in range(5):
+            first.put(key, key)
+            second.put(key, key)
+        self.assertEqual(items(cache), {"first": 5, "second": 5, "third": 0})
+        for key in range(4):
+            third.put(key, key)
+        self.assertEqual(items(cache), {"first": 3, "second": 3, "third": 4})
+        self.assertNotIn(0, first)
+        self.assertIn(4, first)
+
+    def test_maximum(self):
+        '''
+        A namespace evicts its own keys at its maximum, and an item
+        larger than the maximum is not cached.
+        '''
+        cache = PartitionedCache(max_bytes=1000, sizeof=len)
+        pages = cache.add_namespace("pages", minimum=300, maximum=600)
+        other = cache.add_namespace("other")
+        for key in range(20):
+            pages.put(key, "p" * 50)
+        self.assertEqual(pages.stats()["used"], 600)
+        self.assertEqual(list(range(8, 20)),
+                         [key for key in range(20) if key in pages])
+        pages.put("huge", "h" * 700)
+        self.assertNotIn("huge", pages)
+        for key in range(100):
+            other.put(key, "o" * 60)
+        self.assertEqual(pages.stats()["used"], 300)
+        pages.put(19, "p" * 400)
+        self.assertIn(19, pages)
+        self.assertLessEqual(pages.stats()["used"], 600)
+        self.assertLessEqual(cache.current_bytes, 1000)
+        self.assertEqual(cache.current_bytes, sum(
+            counters["used"]
+            for counters in cache.stats()["namespaces"].values()))
+
+    def test_byte_bounded_policy_capacity(self):
+        '''
+        In byte mode, the namespace policies are sized on the number of
+        items that fit, like the policy of a BaseCaching.
+        '''
+        for policy in (policies.ARCPolicy, policies.TwoQueuePolicy,
+                       policies.WTinyLFUPolicy):
+            with self.subTest(policy=policy.__name__):
+                cache = PartitionedCache(max_bytes=1000, sizeof=len,
+                                         policy=policy)
+                tenant = cache.add_namespace("a")
+                other = cache.add_namespace("b", minimum=200)
+                for key in range(100):
+                    tenant.put(key, "x" * 10)
+                other.put(0, "x" * 10)
+                partitions = cache.policy.partitions
+                self.assertEqual(partitions["a"].policy.capacity, 100)
+                self.assertEqual(partitions["b"].policy.capacity, 100)
+                late = cache.add_namespace("c")
+                late.put(0, "x" * 10)
+                self.assertEqual(partitions["c"].policy.capacity, 100)
+
+    def test_random_traces_stay_consistent(self):
+        '''
+        The namespaces always track exactly the cached keys, within
+        their bounds.
+        '''
+        for max_items, max_bytes in ((50, None), (None, 5000)):
+            rng = random.Random(0)
+            cache = PartitionedCache(max_items=max_items,
+                                     max_bytes=max_bytes, sizeof=len)
+            bounds = {"a": (10, None), "b": (0, 20), "c": (5, 30)}
+            if max_bytes:
+                bounds = {"a": (1000, None), "b": (0, 2000),
+                          "c": (500, 3000)}
+            for name, (minimum, maximum) in bounds.items():
+                cache.add_namespace(name, minimum, maximum)
+            with self.subTest(max_items=max_items, max_bytes=max_bytes):
+                for _ in range(5000):
+                    space = cache.namespace(rng.choice("abc"))
+                    key = rng.randrange(60)
+                    roll = rng.random()
+                    if roll < 0.5:
+                        space.put(key, "x" * rng.randrange(1, 200))
+                    elif roll < 0.9:
+                        space.get(key)
+                    else:
+                        space.delete(key)
+                    for name, counters in cache.stats()[
+                            "namespaces"].items():
+                        maximum = bounds[name][1]
+                        self.assertTrue(maximum is None or
+                                        counters["used"] <= maximum)
+                self.assertEqual(set(cache.policy), set(cache.cache_data))
+                used = sum(partition.used for partition in
+                           cache.policy.partitions.values())
+                self.assertEqual(used, len(cache.cache_data)
+                                 if max_items else cache.current_bytes)
+
+    def test_snapshot(self):
+        '''
+        A reloaded cache puts the keys back in their namespaces.
+        '''
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            cache = PartitionedCache(max_bytes=100, sizeof=len,
+                                     policy=policies.LFUPolicy)
+            for name in ("a", "b"):
+                space = cache.add_namespace(name, minimum=20)
+                space.put(1, name * 10)
+                space.put(2, name * 20)
+            cache.namespace("a").get(1)
+            cache.dump(path)
+            reloaded = PartitionedCache(max_bytes=100, sizeof=len,
+                                        policy=policies.LFUPolicy)
+            reloaded.add_namespace("a", minimum=20)
+            reloaded.add_namespace("b", minimum=20)
+            self.assertEqual(reloaded.load(path), 4)
+        finally:
+            os.remove(path)
+        self.assertEqual(reloaded.namespace("a").stats()["used"], 30)
+        self.assertEqual(reloaded.policy.partitions["a"].policy.dump(),
+                         cache.policy.partitions["a"].policy.dump())
+        self.assertEqual(reloaded.namespace("b").get(2), "b" * 20)
+
+    def test_bad_namespaces(self):
+        '''
+        Bounds that cannot hold are refused, unknown names raise.
+        '''
+        cache = PartitionedCache(max_items=10)
+        cache.add_namespace("a", minimum=6)
+        with self.assertRaises(ValueError):
+            cache.add_namespace("a")
+        with self.assertRaises(ValueError):
+            cache.add_namespace("b", minimum=5)
+        with self.assertRaises(ValueError):
+            cache.add_namespace("b", minimum=3, maximum=2)
+        with self.assertRaises(KeyError):
+            cache.namespace("b")
+        with self.assertRaises(KeyError):
+            cache.put(("b", 1), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+'''
+Tests for the eviction policies plugged into BaseCaching.
+'''
+import random
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+policies = __import__('policies')
+
+ALL_POLICIES = (
+    policies.FIFOPolicy, policies.LIFOPolicy, policies.LRUPolicy,
+    policies.MRUPolicy,
+    policies.LFUPolicy, policies.ClockPolicy,
+    policies.SievePolicy, policies.TwoQueuePolicy, policies.ARCPolicy,
+    policies.WTinyLFUPolicy, policies.GDSFPolicy,
+)
+
+
+def make_cache(policy_class, capacity):
+    ''' Build a BaseCaching of capacity items using policy_class.
+    '''
+    cache = BaseCaching(policy_class(capacity))
+    cache.MAX_ITEMS = capacity
+    return cache
+
+
+def discards(cache, ops):
+    ''' Run ops against cache and return the keys it discarded.
+    '''
+    evicted = []
+    cache.add_listener(lambda key, item, reason: evicted.append(key))
+    for op, key in ops:
+        if op == "put":
+            cache.put(key, key)
+        else:
+            cache.get(key)
+    cache.listeners.clear()
+    return evicted
+
+
+def hit_ratio(cache, keys):
+    ''' Look every key up, caching it on a miss, and return the hit ratio.
+    '''
+    hits = 0
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.put(key, key)
+    return hits / len(keys)
+
+
+class TestPolicies(unittest.TestCase):
+    '''
+    Behaviour shared by every policy and the specifics of each one.
+    '''
+
+    def test_random_traces_stay_consistent(self):
+        '''
+        The policy always tracks exactly the cached keys.
+        '''
+        for policy_class in ALL_POLICIES:
+            for capacity in (1, 3, 8):
+                rng = random.Random(capacity)
+                cache = make_cache(policy_class, capacity)
+                with self.subTest(policy=policy_class.__name__,
+                                  capacity=capacity):
+                    for _ in range(2000):
+                        key = rng.randrange(3 * capacity)
+                        if rng.random() < 0.5:
+                            cache.put(key, key)
+                        else:
+                            cache.get(key)
+                        self.assertLessEqual(len(cache.cache_data),
+                                             capacity)
+                    self.assertEqual(set(cache.policy),
+                                     set(cache.cache_data))
+                    self.assertEqual(len(cache.policy),
+                                     len(cache.cache_data))
+
+    def test_fifo_ignores_hits(self):
+        '''
+        The key inserted first goes first, even if it was just used.
+        '''
+        cache = make_cache(policies.FIFOPolicy, 2)
+        ops = [("put", "A"), ("put", "B"), ("get", "A"), ("put", "A"),
+               ("put", "C")]
+        self.assertEqual(discards(cache, ops), ["A"])
+
+    def test_lifo_discards_the_last_put(self):
+        '''
+        The key put last goes first, an update counts as a put.
+        '''
+        cache = make_cache(policies.LIFOPolicy, 3)
+        ops = [("put", "A"), ("put", "B"), ("put", "C"), ("put", "A"),
+               ("get", "B"), ("put", "D"), ("put", "E")]
+        self.assertEqual(discards(cache, ops), ["A", "D"])
+
+    def test_mru_discards_the_last_used(self):
+        '''
+        The most recently used key goes first.
+        '''
+        cache = make_cache(policies.MRUPolicy, 3)
+        ops = [("put", "A"), ("put", "B"), ("put", "C"), ("get", "A"),
+               ("put", "D"), ("get", "B"), ("put", "E")]
+        self.assertEqual(discards(cache, ops), ["A", "B"])
+
+    def test_clock_second_chance(self):
+        '''
+        A referenced key survives one sweep of the hand.
+        '''
+        cache = make_cache(policies.ClockPolicy, 3)
+        ops = [("put", "A"), ("put", "B"), ("put", "C"), ("get", "A"),
+               ("put", "D"), ("put", "E")]
+        self.assertEqual(discards(cache, ops), ["B", "C"])
+
+    def test_sieve_keeps_visited_in_place(self):
+        '''
+        The hand skips visited keys and resumes where it stopped.
+        '''
+        cache = make_cache(policies.SievePolicy, 3)
+        ops = [("put", "A"), ("put", "B"), ("put", "C"), ("get", "A"),
+               ("get", "C"), ("put", "D"), ("put", "E"), ("put", "F")]
+        self.assertEqual(discards(cache, ops), ["B", "D", "A"])
+        self.assertEqual(sorted(cache.cache_data), ["C", "E", "F"])
+
+    def test_two_queue_promotes_ghosts(self):
+        '''
+        A key coming back from a1out lands in the main LRU.
+        '''
+        cache = make_cache(policies.TwoQueuePolicy, 4)
+        discards(cache, [("put", k) for k in "ABCDE"])
+        self.assertIn("A", cache.policy.a1out)
+        discards(cache, [("put", "A")])
+        self.assertIs(cache.policy.nodes["A"].queue, cache.policy.am)
+
+    def test_arc_adapts_on_ghost_hits(self):
+        '''
+        A hit in b1 grows the target size of t1.
+        '''
+        cache = make_cache(policies.ARCPolicy, 4)
+        ops = [("put", "A"), ("put", "B"), ("get", "A"), ("get", "B"),
+               ("put", "C"), ("put", "D"), ("put", "E")]
+        self.assertEqual(discards(cache, ops), ["C"])
+        self.assertIn("C", cache.policy.b1)
+        discards(cache, [("put", "C")])
+        self.assertGreater(cache.policy.p, 0)
+        self.assertIs(cache.policy.nodes["C"].queue, cache.policy.t2)
+
+    def test_w_tinylfu_rejects_cold_candidates(self):
+        '''
+        A key seen once loses its duel against a popular key.
+        '''
+        cache = make_cache(policies.WTinyLFUPolicy, 4)
+        ops = [("put", k) for k in "ABCD"]
+        ops += [("get", k) for k in "ABC" * 5]
+        ops += [("put", "X"), ("put", "Y")]
+        self.assertEqual(discards(cache, ops)[-1], "X")
+        self.assertTrue({"A", "B", "C"} <= set(cache.cache_data))
+
+    def test_gdsf_weighs_size_and_cost(self):
+        '''
+        A large cheap item goes before small or expensive ones, and
+        the keys left behind age.
+        '''
+        cache = BaseCaching(policies.GDSFPolicy(), max_bytes=1000,
+                            sizeof=len)
+        cache.put("small", "s" * 100)
+        cache.put("large", "l" * 500)
+        cache.put("costly", "c" * 300, cost=50)
+        evicted = discards(cache, [("put", "new")])
+        self.assertEqual(evicted, [])
+        cache.put("more", "m" * 200)
+        self.assertNotIn("large", cache.cache_data)
+        self.assertAlmostEqual(cache.policy.inflation, 1 / 500)
+        self.assertEqual(cache.current_bytes, 603)
+        self.assertGreater(cache.policy.heap.priority("more"),
+                           1 / 200)
+
+    def test_gdsf_bytes_objective(self):
+        '''
+        Weighing by bytes ignores the size: the least used key goes.
+        '''
+        cache = BaseCaching(policies.GDSFPolicy(objective="bytes"),
+                            max_items=2)
+        cache.put("large", "large", size=1000)
+        cache.put("small", "small", size=10, cost=99)
+        cache.get("large")
+        evicted = discards(cache, [("put", "other")])
+        self.assertEqual(evicted, ["small"])
+        self.assertEqual(cache.policy.inflation, 1)
+        cache.put("large", "larger", size=2000)
+        self.assertEqual(cache.policy.nodes["large"].size, 2000)
+        self.assertEqual(cache.policy.nodes["large"].freq, 3)
+        with self.assertRaises(ValueError):
+            policies.GDSFPolicy(objective="hits")
+
+    def test_scan_resistance(self):
+        '''
+        On a hot set mixed with one-off scans the scan resistant
+        policies keep a much higher hit ratio than LRU.
+        '''
+        rng = random.Random(1)
+        keys = [rng.randrange(50) if rng.random() < 0.5 else 1000 + i
+                for i in range(20000)]
+        lru = hit_ratio(make_cache(policies.LRUPolicy, 60), keys)
+        for policy_class in (policies.SievePolicy, policies.TwoQueuePolicy,
+                             policies.ARCPolicy, policies.WTinyLFUPolicy):
+            with self.subTest(policy=policy_class.__name__):
+                ratio = hit_ratio(make_cache(policy_class, 60), keys)
+                self.assertGreater(ratio, lru + 0.15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+'''
+Tests for the ReadMostlyCache class.
+'''
+import sys
+import threading
+import unittest
+ReadMostlyCache = __import__('read_mostly_cache').ReadMostlyCache
+
+
+class TestReadMostlyCache(unittest.TestCase):
+    '''
+    Making sure readers see every write and writers publish in batches.
+    '''
+
+    def test_put_get(self):
+        '''
+        Items are read back, None keys and items are ignored.
+        '''
+        cache = ReadMostlyCache(max_items=10)
+        cache.put("A", 1)
+        cache.put(None, 2)
+        cache.put("B", None)
+        self.assertEqual(cache.get("A"), 1)
+        self.assertIsNone(cache.get("B"))
+        self.assertIsNone(cache.get(None))
+        cache.put("A", 10)
+        self.assertEqual(cache.get("A"), 10)
+        self.assertEqual(cache.cache_data, {"A": 10})
+        # The put contract of BaseCaching: size and cost are ignored
+        cache.put("C", 3, None, 8, 2)
+        cache.put("D", 4, size=8, cost=2)
+        self.assertEqual(cache.cache_data, {"A": 10, "C": 3, "D": 4})
+        self.assertEqual(cache.delete_many(["C", "D"]), 2)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (2, 2))
+
+    def test_writes_are_published_in_batches(self):
+        '''
+        Writes are seen at once, and copied into the snapshot every
+        batch writes or on flush.
+        '''
+        cache = ReadMostlyCache(max_items=100, batch=4)
+        snapshot = cache.data
+        cache.put_many({"A": 1, "B": 2, "C": 3})
+        self.assertIs(cache.data, snapshot)
+        self.assertEqual(cache.get_many(["A", "B", "C", "D"]),
+                         {"A": 1, "B": 2, "C": 3})
+        self.assertEqual(len(cache), 3)
+        # Deleting a pending write replaces it
+        self.assertTrue(cache.delete("A"))
+        self.assertFalse(cache.delete("A"))
+        self.assertIs(cache.data, snapshot)
+        cache.put("D", 4)
+        self.assertIsNot(cache.data, snapshot)
+        self.assertEqual(snapshot, {})
+        self.assertEqual(sorted(cache.data), ["B", "C", "D"])
+        cache.put("E", 5)
+        self.assertEqual(cache.stats()["unpublished"], 1)
+        cache.flush()
+        self.assertEqual(cache.stats()["unpublished"], 0)
+        self.assertEqual(cache.cache_data, {"B": 2, "C": 3, "D": 4, "E": 5})
+        self.assertEqual(cache.delete_many(["B", "C", "X"]), 2)
+        self.assertEqual(len(cache), 2)
+        stats = cache.stats()
+        self.assertEqual((stats["inserts"], stats["publications"]), (4, 2))
+        cache.clear()
+        self.assertEqual(cache.cache_data, {})
+
+    def test_sampled_eviction_keeps_read_keys(self):
+        '''
+        With every key drawn as a candidate, the keys read since the
+        last publications outlive the others.
+        '''
+        cache = ReadMostlyCache(max_items=10, batch=1, samples=20)
+        for key in range(10):
+            cache.put(key, key)
+        for key in range(5):
+            cache.get(key)
+        for key in range(10, 15):
+            cache.put(key, key)
+        self.assertEqual(sorted(cache.data), list(range(15)[:5]) +
+                         list(range(10, 15)))
+        self.assertEqual(cache.stats()["evictions"], 5)
+
+    def test_ttl(self):
+        '''
+        An expired item misses, and is dropped by reap or before
+        anything is evicted.
+        '''
+        now = [0]
+        cache = ReadMostlyCache(max_items=2, ttl=10, batch=1,
+                                clock=lambda: now[0])
+        cache.put("A", 1)
+        cache.put("B", 2, ttl=100)
+        now[0] = 10
+        self.assertIsNone(cache.get("A"))
+        self.assertEqual(cache.get("B"), 2)
+        cache.put("C", 3)
+        self.assertEqual(sorted(cache.data), ["B", "C"])
+        self.assertEqual(cache.stats()["expirations"], 1)
+        now[0] = 50
+        cache.reap()
+        self.assertEqual(sorted(cache.data), ["B"])
+        self.assertEqual(cache.stats()["evictions"], 0)
+
+    def test_get_or_load(self):
+        '''
+        A miss loads the item once, the next call hits.
+        '''
+        cache = ReadMostlyCache()
+        calls = []
+
+        def loader(key):
+            ''' Count the loads. '''
+            calls.append(key)
+            return key.lower()
+
+        self.assertEqual(cache.get_or_load("A", loader), "a")
+        self.assertEqual(cache.get_or_load("A", loader), "a")
+        self.assertEqual(calls, ["A"])
+        self.assertEqual(cache.stats()["loads"], 1)
+
+    def test_threads(self):
+        '''
+        Readers running while writers publish always find the keys
+        written before they started, with one of their written items.
+        '''
+        cache = ReadMostlyCache(max_items=1000, batch=8)
+        for key in range(100):
+            cache.put(key, (key, 0))
+        errors = []
+
+        def writer(seed):
+            ''' Rewrite every key a few times. '''
+            for version in range(1, 20):
+                for key in range(seed, 100, 4):
+                    cache.put(key, (key, version))
+
+        def reader():
+            ''' Check every key over and over. '''
+            for _ in range(50):
+                for key in range(100):
+                    item = cache.get(key)
+                    if item is None or item[0] != key:
+                        errors.append((key, item))
+
+        threads = [threading.Thread(target=writer, args=(seed,))
+                   for seed in range(4)]
+        threads += [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        cache.flush()
+        self.assertEqual(cache.cache_data,
+                         {key: (key, 19) for key in range(100)})
+
+    def test_size_under_writers(self):
+        '''
+        len and cache_data can be read while writers add keys.
+        '''
+        cache = ReadMostlyCache(max_items=2000, batch=1000)
+        errors = []
+        done = threading.Event()
+
+        def writer():
+            ''' Add new keys until told to stop. '''
+            key = 0
+            while not done.is_set():
+                cache.put(key, key)
+                key += 1
+
+        def reader():
+            ''' Count the keys over and over. '''
+            try:
+                for _ in range(300):
+                    len(cache)
+                    cache.cache_data
+            except RuntimeError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=writer),
+                   threading.Thread(target=reader)]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            for thread in threads:
+                thread.start()
+            threads[1].join()
+            done.set()
+            threads[0].join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
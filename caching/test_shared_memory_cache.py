@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+'''
+Tests for the SharedMemoryCache class, within one process and across
+several.
+'''
+import multiprocessing
+import os
+import unittest
+SharedMemoryCache = __import__('shared_memory_cache').SharedMemoryCache
+
+
+def worker(name, start, count):
+    ''' Attach to the cache called name and fill keys start onwards.
+    '''
+    with SharedMemoryCache(name, create=False) as cache:
+        for key in range(start, start + count):
+            cache.put("key-{}".format(key), str(key).encode() * 8)
+            item = cache.get("key-{}".format(key), copy=True)
+            if item is not None and item != str(key).encode() * 8:
+                raise AssertionError(key)
+
+
+def dying_writer(name, key):
+    ''' Attach to the cache called name and get killed while writing
+    the set of key.
+    '''
+    cache = SharedMemoryCache(name, create=False)
+    cache._write(cache._encode(key)[2]).__enter__()
+    os._exit(1)
+
+
+class TestSharedMemoryCache(unittest.TestCase):
+    '''
+    Making sure processes see one consistent table.
+    '''
+
+    def setUp(self):
+        '''
+        Create a small cache.
+        '''
+        self.cache = SharedMemoryCache(slots=64, ways=4, key_size=16,
+                                       value_size=64)
+
+    def tearDown(self):
+        '''
+        Destroy the cache.
+        '''
+        self.cache.close()
+        self.cache.unlink()
+
+    def test_put_get(self):
+        '''
+        Items come back as views of the segment.
+        '''
+        cache = self.cache
+        cache.put("A", b"Hello")
+        cache.put(b"B", bytearray(b"World"))
+        cache.put(None, b"x")
+        cache.put("C", None)
+        cache.put("D", b"x" * 65)
+        item = cache.get("A")
+        self.assertIsInstance(item, memoryview)
+        self.assertEqual(bytes(item), b"Hello")
+        self.assertEqual(bytes(cache.get("B")), b"World")
+        self.assertIsNone(cache.get("C"))
+        self.assertIsNone(cache.get("D"))
+        self.assertIsNone(cache.get(None))
+        cache.put("A", b"Bye")
+        self.assertEqual(bytes(cache.get("A")), b"Bye")
+        self.assertEqual(len(cache), 2)
+        self.assertTrue(cache.delete("A"))
+        self.assertFalse(cache.delete("A"))
+        self.assertIsNone(cache.get("A"))
+        del item
+        with self.assertRaises(ValueError):
+            cache.put("x" * 17, b"x")
+
+    def test_clock_within_a_set(self):
+        '''
+        A full set evicts an unreferenced slot, the referenced ones get
+        a second chance.
+        '''
+        cache = SharedMemoryCache(slots=2, ways=2, key_size=4,
+                                  value_size=4)
+        try:
+            cache.put("A", b"A")
+            cache.put("B", b"B")
+            cache.get("A")
+            cache.put("C", b"C")
+            self.assertIsNotNone(cache.get("A"))
+            self.assertIsNone(cache.get("B"))
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertEqual(len(cache), 2)
+        finally:
+            cache.close()
+            cache.unlink()
+
+    def test_delete_while_reading(self):
+        '''
+        A key deleted between the last check of a reader and its
+        reference write stays deleted.
+        '''
+        self.cache.put("A", b"a")
+        reader = SharedMemoryCache(self.cache.name, create=False)
+        versions = []
+        read_version = reader._version
+
+        def version(index):
+            ''' Delete A once the reader has checked the version. '''
+            versions.append(read_version(index))
+            if len(versions) == 2:
+                self.cache.delete("A")
+            return versions[-1]
+
+        reader._version = version
+        try:
+            self.assertEqual(reader.get("A", copy=True), b"a")
+        finally:
+            reader.close()
+        self.assertIsNone(self.cache.get("A"))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_processes_share_entries(self):
+        '''
+        Entries written by attached processes are read by the others.
+        '''
+        cache = SharedMemoryCache(slots=4096, ways=8, key_size=16,
+                                  value_size=64)
+        try:
+            processes = [multiprocessing.Process(
+                target=worker, args=(cache.name, start, 300))
+                for start in range(0, 1200, 300)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            self.assertEqual([p.exitcode for p in processes], [0] * 4)
+            for key in range(1200):
+                item = cache.get("key-{}".format(key))
+                if item is not None:
+                    self.assertEqual(bytes(item), str(key).encode() * 8)
+            # Views keep the segment from being closed
+            item = None
+            self.assertGreater(len(cache), 1000)
+            attached = SharedMemoryCache(cache.name, create=False)
+            self.assertEqual(attached.value_size, 64)
+            self.assertEqual(bytes(attached.get("key-0")), b"0" * 8)
+            attached.close()
+        finally:
+            cache.close()
+            cache.unlink()
+
+    def test_writer_killed_at_work(self):
+        '''
+        A set left odd by a writer killed at work is emptied by the next
+        one to lock it, be it a reader tired of waiting or a writer.
+        '''
+        cache = self.cache
+        for key in ("A", "B"):
+            cache.put(key, b"old")
+            index = cache._encode(key)[2]
+            process = multiprocessing.Process(
+                target=dying_writer, args=(cache.name, key))
+            process.start()
+            process.join()
+            self.assertEqual(process.exitcode, 1)
+            self.assertEqual(cache._version(index) & 1, 1)
+            if key == "A":
+                self.assertIsNone(cache.get("A"))
+            cache.put(key, b"new")
+            self.assertEqual(cache._version(index) & 1, 0)
+            self.assertEqual(bytes(cache.get(key)), b"new")
+        self.assertEqual(cache.stats()["recoveries"], 2)
+
+    def test_contended_sets(self):
+        '''
+        Processes writing the same few sets never leave a torn slot.
+        '''
+        cache = SharedMemoryCache(slots=8, ways=4, key_size=16,
+                                  value_size=64)
+        try:
+            processes = [multiprocessing.Process(
+                target=worker, args=(cache.name, start % 2 * 50, 500))
+                for start in range(4)]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join()
+            self.assertEqual([p.exitcode for p in processes], [0] * 4)
+            self.assertEqual(len(cache), 8)
+        finally:
+            cache.close()
+            cache.unlink()
+
+
+if __name__ == "__main__":
+    unittest.main()
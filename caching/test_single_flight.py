@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+'''
+Tests for get_or_load and the single-flight request coalescing.
+'''
+import asyncio
+import threading
+import time
+import unittest
+ConcurrentCache = __import__('concurrent_cache').ConcurrentCache
+LRUCache = __import__('3-lru_cache').LRUCache
+SingleFlight = __import__('single_flight').SingleFlight
+AsyncSingleFlight = __import__('single_flight').AsyncSingleFlight
+
+
+class SlowLoader():
+    ''' SlowLoader counts its calls and blocks until released.
+    '''
+
+    def __init__(self):
+        ''' Initialize a closed gate.
+        '''
+        self.calls = 0
+        self.gate = threading.Event()
+
+    def __call__(self, key):
+        ''' Wait for the gate, then return the loaded item.
+        '''
+        self.calls += 1
+        self.gate.wait(5)
+        return "item-{}".format(key)
+
+
+def herd(get_or_load, loader, threads=16):
+    ''' Have threads threads miss on the same key at once.
+    Returns the items each of them got.
+    '''
+    results = []
+    workers = [threading.Thread(
+        target=lambda: results.append(get_or_load("A", loader)))
+        for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    # Let every thread reach the flight before the load completes
+    time.sleep(0.1)
+    loader.gate.set()
+    for thread in workers:
+        thread.join()
+    return results
+
+
+class TestSingleFlight(unittest.TestCase):
+    '''
+    Making sure a herd of misses runs the loader once.
+    '''
+
+    def test_threads_coalesce(self):
+        '''
+        Every thread gets the item of a single load.
+        '''
+        cache = ConcurrentCache(shards=4, max_items=8)
+        loader = SlowLoader()
+        results = herd(cache.get_or_load, loader)
+        self.assertEqual(results, ["item-A"] * 16)
+        self.assertEqual(loader.calls, 1)
+        self.assertEqual(cache.get("A"), "item-A")
+        self.assertEqual(cache.stats()["loads"], 1)
+        self.assertEqual(cache.get_or_load("A", loader), "item-A")
+        self.assertEqual(loader.calls, 1)
+
+    def test_errors_are_shared(self):
+        '''
+        The waiters get the exception of the load, nothing is cached
+        and the next miss loads again.
+        '''
+        flights = SingleFlight()
+        started = threading.Event()
+        errors = []
+
+        def failing():
+            ''' Fail once the waiter is queued. '''
+            started.set()
+            time.sleep(0.1)
+            raise KeyError("A")
+
+        def waiter():
+            ''' Join the flight in progress. '''
+            started.wait()
+            try:
+                flights.do("A", lambda: "never")
+            except KeyError as error:
+                errors.append(error)
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        with self.assertRaises(KeyError):
+            flights.do("A", failing)
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(flights.calls, {})
+        self.assertEqual(flights.do("A", lambda: 1), 1)
+
+    def test_none_is_not_cached(self):
+        '''
+        A loader returning None caches nothing.
+        '''
+        cache = LRUCache()
+        self.assertIsNone(cache.get_or_load("A", lambda key: None))
+        self.assertIsNone(cache.get_or_load(None, lambda key: 1))
+        self.assertEqual(cache.cache_data, {})
+
+    def test_ttl(self):
+        '''
+        The loaded item expires after ttl.
+        '''
+        now = [0]
+        cache = LRUCache(clock=lambda: now[0])
+        cache.get_or_load("A", lambda key: 1, ttl=5)
+        now[0] = 5
+        self.assertEqual(cache.get_or_load("A", lambda key: 2), 2)
+
+    def test_coroutines_coalesce(self):
+        '''
+        Concurrent coroutines await a single load, even when one of
+        the waiters is cancelled.
+        '''
+        cache = LRUCache()
+        calls = []
+
+        async def loader(key):
+            ''' Take a while to load key. '''
+            calls.append(key)
+            await asyncio.sleep(0.05)
+            return key.lower()
+
+        async def main():
+            ''' Run a herd of coroutines, cancel one of them. '''
+            tasks = [asyncio.ensure_future(
+                cache.get_or_load_async("A", loader)) for _ in range(10)]
+            await asyncio.sleep(0.01)
+            tasks[0].cancel()
+            return await asyncio.gather(*tasks[1:])
+
+        self.assertEqual(asyncio.run(main()), ["a"] * 9)
+        self.assertEqual(calls, ["A"])
+        self.assertEqual(cache.get("A"), "a")
+
+    def test_forgotten_coroutine_calls(self):
+        '''
+        A forgotten call runs on for its waiters, knows it is no longer
+        current, and the next caller starts a new one; close cancels
+        the calls in flight.
+        '''
+        flights = AsyncSingleFlight()
+
+        async def call(gate):
+            ''' Wait for gate, then tell whether the call is current. '''
+            await gate.wait()
+            return flights.current("A")
+
+        async def main():
+            ''' Forget a call in flight, then close a hanging one. '''
+            gate = asyncio.Event()
+            first = asyncio.ensure_future(flights.do("A", lambda: call(gate)))
+            await asyncio.sleep(0)
+            flights.forget("A")
+            second = asyncio.ensure_future(flights.do("A", lambda: call(gate)))
+            await asyncio.sleep(0)
+            self.assertEqual(len(flights), 1)
+            gate.set()
+            self.assertEqual(await asyncio.gather(first, second),
+                             [False, True])
+            self.assertEqual(len(flights), 0)
+            hanging = asyncio.ensure_future(
+                flights.do("B", lambda: call(asyncio.Event())))
+            await asyncio.sleep(0)
+            await flights.close()
+            with self.assertRaises(asyncio.CancelledError):
+                await hanging
+
+        asyncio.run(main())
+
+
+if __name__ == "__main__":
+    unittest.main()
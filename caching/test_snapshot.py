@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+'''
+Tests for the snapshots taken by BaseCaching.dump and reloaded by
+BaseCaching.load.
+'''
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import unittest
+BaseCaching = __import__('base_caching').BaseCaching
+NOT_FOUND = __import__('base_caching').NOT_FOUND
+PENDING = __import__('snapshot').PENDING
+policies = __import__('policies')
+
+ALL_POLICIES = (
+    policies.FIFOPolicy, policies.LIFOPolicy, policies.LRUPolicy,
+    policies.MRUPolicy,
+    policies.LFUPolicy, policies.ClockPolicy,
+    policies.SievePolicy, policies.TwoQueuePolicy, policies.ARCPolicy,
+    policies.WTinyLFUPolicy, policies.GDSFPolicy,
+)
+
+
+def play(cache, seed, length=500, keys=30):
+    ''' Run a reproducible mix of puts and gets against cache.
+    Returns the keys it evicted.
+    '''
+    evicted = []
+    cache.add_listener(lambda key, item, reason: evicted.append(key))
+    rng = random.Random(seed)
+    for _ in range(length):
+        key = rng.randrange(keys)
+        if rng.random() < 0.5:
+            cache.put(key, [key])
+        else:
+            cache.get(key)
+    cache.listeners.clear()
+    return evicted
+
+
+class TestSnapshot(unittest.TestCase):
+    '''
+    Making sure a reloaded cache behaves like the one that was saved.
+    '''
+
+    def setUp(self):
+        '''
+        Pick a path for the snapshot.
+        '''
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+
+    def tearDown(self):
+        '''
+        Remove the snapshot.
+        '''
+        os.remove(self.path)
+
+    def test_policy_state_survives(self):
+        '''
+        After a reload every policy evicts exactly like the original.
+        '''
+        for policy_class in ALL_POLICIES:
+            with self.subTest(policy=policy_class.__name__):
+                original = BaseCaching(policy_class(), max_items=10)
+                play(original, 0)
+                original.dump(self.path)
+                reloaded = BaseCaching(policy_class(), max_items=10)
+                self.assertEqual(reloaded.load(self.path), 10)
+                self.assertEqual(reloaded.policy.dump(),
+                                 original.policy.dump())
+                self.assertEqual(play(reloaded, 1), play(original, 1))
+                reloaded.thaw()
+                self.assertEqual(reloaded.cache_data, original.cache_data)
+
+    def test_sketch_from_another_process(self):
+        '''
+        A W-TinyLFU snapshot of str keys taken by a process hashing
+        them differently loads with a new sketch, and evicts.
+        '''
+        seed = "2" if os.environ.get("PYTHONHASHSEED") == "1" else "1"
+        subprocess.run([sys.executable, "-c", (
+            "BaseCaching = __import__('base_caching').BaseCaching\n"
+            "policies = __import__('policies')\n"
+            "cache = BaseCaching(policies.WTinyLFUPolicy(), max_items=4)\n"
+            "for key in 'ABCDEF':\n"
+            "    cache.put(key, key)\n"
+            "    cache.get(key)\n"
+            "cache.dump({!r})\n".format(self.path))],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, PYTHONHASHSEED=seed), check=True)
+        reloaded = BaseCaching(policies.WTinyLFUPolicy(), max_items=4)
+        self.assertEqual(reloaded.load(self.path), 4)
+        self.assertIsNotNone(reloaded.policy.sketch)
+        for key in "XYZ":
+            reloaded.put(key, key)
+        self.assertEqual(len(reloaded.cache_data), 4)
+        self.assertEqual(set(reloaded.policy), set(reloaded.cache_data))
+
+    def test_items_load_lazily(self):
+        '''
+        Items stay in the mapped file until they are read.
+        '''
+        original = BaseCaching(policies.LRUPolicy(), max_items=3)
+        original.put_many({"A": 1, "B": 2, "C": 3})
+        original.dump(self.path)
+        cache = BaseCaching(policies.LRUPolicy(), max_items=3)
+        cache.load(self.path)
+        self.assertTrue(all(item is PENDING
+                            for item in cache.cache_data.values()))
+        self.assertEqual(cache.get("B"), 2)
+        self.assertEqual(cache.get_many(["A", "X"]), {"A": 1})
+        self.assertIsNotNone(cache.snapshot)
+        cache.put("C", 30)
+        self.assertIsNone(cache.snapshot)
+        self.assertEqual(cache.cache_data, {"A": 1, "B": 2, "C": 30})
+
+    def test_dump_pending_items(self):
+        '''
+        A cache dumped before its items were read writes them as is.
+        '''
+        original = BaseCaching(policies.LFUPolicy(), max_items=4)
+        original.put_many({"A": "a", "B": "b"})
+        original.get("A")
+        original.dump(self.path)
+        middle = BaseCaching(policies.LFUPolicy(), max_items=4)
+        middle.load(self.path)
+        second = self.path + ".second"
+        try:
+            middle.dump(second)
+            cache = BaseCaching(policies.LFUPolicy(), max_items=4)
+            cache.load(second)
+        finally:
+            os.remove(second)
+        self.assertEqual(cache.get("A"), "a")
+        self.assertEqual(cache.policy.nodes["A"].freq, 3)
+
+    def test_negative_entries(self):
+        '''
+        The negative entries count against max_negative as soon as they
+        are loaded, the ones the policy discards first going over it.
+        '''
+        original = BaseCaching(policies.LRUPolicy(), max_items=8)
+        original.put_many({"A": 1, "B": 2})
+        for key in "WXYZ":
+            original.put(key, NOT_FOUND)
+        original.dump(self.path)
+        cache = BaseCaching(policies.LRUPolicy(), max_items=8,
+                            max_negative=2)
+        self.assertEqual(cache.load(self.path), 4)
+        self.assertEqual(list(cache.policy), ["A", "B", "Y", "Z"])
+        self.assertEqual(cache.stats()["negative"], 2)
+        cache.put("V", NOT_FOUND)
+        self.assertEqual(sorted(cache.cache_data), ["A", "B", "V", "Z"])
+        self.assertIs(cache.get("Z"), NOT_FOUND)
+        self.assertEqual(cache.stats()["negative"], 2)
+
+    def test_smaller_cache_keeps_the_safest_keys(self):
+        '''
+        A smaller cache keeps the keys its policy would discard last.
+        '''
+        original = BaseCaching(policies.LRUPolicy(), max_items=5)
+        original.put_many((key, key) for key in "ABCDE")
+        original.get("A")
+        original.dump(self.path)
+        cache = BaseCaching(policies.LRUPolicy(), max_items=2)
+        self.assertEqual(cache.load(self.path), 2)
+        self.assertEqual(list(cache.policy), ["E", "A"])
+        cache = BaseCaching(policies.LRUPolicy(), max_bytes=100,
+                            sizeof=lambda item: 40)
+        cache.load(self.path)
+        self.assertEqual(list(cache.policy), ["E", "A"])
+        self.assertEqual(cache.current_bytes, 80)
+
+    def test_listeners_hear_about_trimmed_keys(self):
+        '''
+        The keys that do not fit in a smaller byte budget are evicted
+        like any other, their items unpickled for the listeners.
+        '''
+        original = BaseCaching(policies.LRUPolicy(), max_items=5)
+        original.put_many((key, key.lower()) for key in "ABCDE")
+        original.dump(self.path)
+        cache = BaseCaching(policies.LRUPolicy(), max_bytes=100,
+                            sizeof=lambda item: 40)
+        events = []
+        cache.add_listener(lambda key, item, reason: events.append(
+            (key, item, reason)))
+        self.assertEqual(cache.load(self.path), 2)
+        self.assertEqual(events, [("A", "a", "evicted"),
+                                  ("B", "b", "evicted"),
+                                  ("C", "c", "evicted")])
+        self.assertEqual(cache.stats()["evictions"], 3)
+        self.assertEqual(cache.get_many("DE"), {"D": "d", "E": "e"})
+        self.assertIsNone(cache.snapshot)
+
+    def test_time_to_live(self):
+        '''
+        Items keep what was left of their time to live.
+        '''
+        now = [100.0]
+        original = BaseCaching(policies.LRUPolicy(), clock=lambda: now[0])
+        original.put("A", 1, ttl=10)
+        original.put("B", 2, ttl=50)
+        original.put("C", 3)
+        now[0] = 105
+        original.dump(self.path)
+        now[0] = 120
+        original.get("A")
+        later = [0.0]
+        cache = BaseCaching(policies.LRUPolicy(), clock=lambda: later[0])
+        cache.load(self.path)
+        later[0] = 4.5
+        self.assertEqual(cache.get("A"), 1)
+        later[0] = 5
+        self.assertIsNone(cache.get("A"))
+        later[0] = 1000
+        self.assertIsNone(cache.get("B"))
+        self.assertEqual(cache.get("C"), 3)
+
+    def test_other_policy(self):
+        '''
+        A snapshot loads into another policy in the same order.
+        '''
+        original = BaseCaching(policies.LRUPolicy(), max_items=3)
+        original.put_many((key, key) for key in "ABC")
+        original.get("A")
+        original.dump(self.path)
+        cache = BaseCaching(policies.ClockPolicy(), max_items=3)
+        cache.load(self.path)
+        self.assertEqual(list(cache.policy), ["B", "C", "A"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+'''
+Tests for the hierarchical TimingWheel.
+'''
+import random
+import unittest
+TimingWheel = __import__('timing_wheel').TimingWheel
+
+
+class TestTimingWheel(unittest.TestCase):
+    '''
+    Making sure every entry is handed out once, on time.
+    '''
+
+    def test_never_early_never_lost(self):
+        '''
+        Entries spread over every level and the overflow list come out
+        after their deadline, within one tick of it.
+        '''
+        rng = random.Random(0)
+        wheel = TimingWheel(resolution=1.0, slots=4, levels=3)
+        deadlines = {key: rng.uniform(0, 300) for key in range(2000)}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+        fired = {}
+        now = 0.0
+        while now < 310:
+            now += rng.uniform(0, 3)
+            for deadline, key in wheel.advance(now):
+                self.assertNotIn(key, fired)
+                self.assertLessEqual(deadline, now)
+                fired[key] = now
+            for key, deadline in deadlines.items():
+                if int(deadline) + 1 <= int(now):
+                    self.assertIn(key, fired)
+        self.assertEqual(len(fired), len(deadlines))
+        self.assertEqual(len(wheel), 0)
+
+    def test_past_deadline_fires_next_tick(self):
+        '''
+        A deadline already passed comes out on the next tick.
+        '''
+        wheel = TimingWheel(resolution=0.5, start=10.0)
+        wheel.schedule("A", 3.0)
+        self.assertEqual(wheel.advance(10.4), [])
+        self.assertEqual(wheel.advance(10.5), [(3.0, "A")])
+
+    def test_idle_wheel_jumps(self):
+        '''
+        An empty wheel jumps straight to the new time.
+        '''
+        wheel = TimingWheel(resolution=1.0)
+        self.assertEqual(wheel.advance(10 ** 9), [])
+        self.assertEqual(wheel.tick, 10 ** 9)
+        wheel.schedule("A", 10 ** 9 + 5)
+        self.assertEqual(wheel.advance(10 ** 9 + 6), [(10 ** 9 + 5, "A")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+'''
+This module contains the TimingWheel class, a hierarchical timing
+wheel used by BaseCaching to reap expired keys.
+Scheduling a deadline is O(1) and advancing the wheel costs O(1) per
+elapsed tick plus O(1) per entry it hands out (each entry cascades at
+most once per level), so a million expiring keys never need a scan.
+'''
+
+
+class TimingWheel():
+    ''' TimingWheel keeps (deadline, key) entries in levels of slots.
+    A slot of level 0 spans one tick of resolution seconds, a slot of
+    level n spans slots ** n ticks. Entries too far away for the top
+    level wait in an overflow list until it comes around.
+    '''
+
+    def __init__(self, resolution=1.0, slots=64, levels=4, start=0.0):
+        ''' Initialize an empty wheel whose current time is start.
+        '''
+        self.resolution = resolution
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[[] for _ in range(slots)] for _ in range(levels)]
+        self.overflow = []
+        self.tick = int(start // resolution)
+        self.count = 0
+
+    def __len__(self):
+        ''' Return the number of scheduled entries.
+        '''
+        return self.count
+
+    def _place(self, entry, earliest):
+        ''' Put entry in the slot matching its distance from now,
+        no earlier than the tick earliest.
+        '''
+        # Round up: an entry is never handed out before its deadline
+        tick = max(int(entry[0] // self.resolution) + 1, earliest)
+        delta = tick - self.tick
+        span = 1
+        for wheel in self.wheels:
+            if delta < span * self.slots:
+                wheel[(tick // span) % self.slots].append(entry)
+                return
+            span *= self.slots
+        self.overflow.append(entry)
+
+    def schedule(self, key, deadline):
+        ''' Schedule key to be handed out once deadline has passed.
+        A deadline already passed is handed out on the next tick.
+        '''
+        self.count += 1
+        self._place((deadline, key), self.tick + 1)
+
+    def _cascade(self, level):
+        ''' Move the entries of the current slot of level one level down.
+        '''
+        span = self.slots ** level
+        wheel = self.wheels[level]
+        index = (self.tick // span) % self.slots
+        entries, wheel[index] = wheel[index], []
+        for entry in entries:
+            self._place(entry, self.tick)
+
+    def advance(self, now):
+        ''' Move the wheel to the time now.
+        Returns the (deadline, key) entries whose tick has passed.
+        '''
+        target = int(now // self.resolution)
+        due = []
+        while self.tick < target:
+            if not self.count:
+                self.tick = target
+                break
+            self.tick += 1
+            # Find the levels whose slot boundary was just crossed
+            level = 1
+            span = self.slots
+            while level < self.levels and self.tick % span == 0:
+                level += 1
+                span *= self.slots
+            if level == self.levels and self.tick % span == 0:
+                entries, self.overflow = self.overflow, []
+                for entry in entries:
+                    self._place(entry, self.tick)
+            for crossed in range(level - 1, 0, -1):
+                self._cascade(crossed)
+            wheel = self.wheels[0]
+            index = self.tick % self.slots
+            if wheel[index]:
+                due.extend(wheel[index])
+                self.count -= len(wheel[index])
+                wheel[index] = []
+        return due
+
+    def clear(self):
+        ''' Drop every scheduled entry.
+        '''
+        for wheel in self.wheels:
+            for index in range(self.slots):
+                wheel[index] = []
+        self.overflow = []
+        self.count = 0